@@ -0,0 +1,102 @@
+import numpy as np
+
+
+"""
+共用動畫時鐘：取代每個物件各自呼叫 pyganim 的 blit (每次都用牆上時間重算目前幀)。
+- FrameAnimation 保存一組幀與每幀毫秒數，依「時間 + 相位」查出幀索引，可整批查詢。
+- AnimationSet 把多個動畫 (依 type_code) 放進同一張幀表；每個 tick 以模擬時間 update() 一次，
+  之後 frames_for() 以 NumPy 一次算出所有物件該畫哪一幀，交給 Surface.blits() 整批繪製。
+相位 phase 是 0..1 的循環比例，讓同種物件不會同步拍翅。時間用模擬時間 (秒)，
+遊戲暫停或放慢時動畫也跟著停或變慢。
+"""
+
+
+class FrameAnimation:
+    def __init__(self, frames):
+        # frames: [(Surface, 毫秒), ...]，與 assets.load_gif_frames 的回傳值相同
+        if not frames:
+            raise ValueError("動畫至少需要一幀")
+        self.surfaces = [surface for surface, _ in frames]
+        durations = np.array([max(int(ms), 1) for _, ms in frames], dtype=np.int64)
+        self.ends = np.cumsum(durations)  # 每一幀結束的時間 (ms)
+        self.total_ms = int(self.ends[-1])
+        self.size = self.surfaces[0].get_size()
+
+    def __len__(self):
+        return len(self.surfaces)
+
+    def frame_index(self, time, phase=0.0):
+        ms = (time * 1000.0 + phase * self.total_ms) % self.total_ms
+        return int(np.searchsorted(self.ends, ms, side='right'))
+
+    def frame_indices(self, time, phases):
+        ms = (time * 1000.0 + phases * self.total_ms) % self.total_ms
+        return np.searchsorted(self.ends, ms, side='right')
+
+    def get_frame(self, time, phase=0.0):
+        return self.surfaces[self.frame_index(time, phase)]
+
+    def blit(self, surface, dest, time=0.0, phase=0.0):
+        return surface.blit(self.get_frame(time, phase), dest)
+
+
+class AnimationSet:
+    def __init__(self, animations=None):
+        self.animations = {}
+        self.time = 0.0
+        self._surfaces = []          # 所有動畫的幀攤平成一張表
+        self._offsets = np.zeros(0, dtype=np.int64)  # type_code -> 在表中的起始位置
+        self._totals = np.ones(0, dtype=np.float64)  # type_code -> 一個循環的毫秒數
+        self._base_ms = np.zeros(0, dtype=np.float64)
+        self._ends = {}
+        for code, anim in (animations or {}).items():
+            self.add(code, anim)
+
+    def add(self, code, anim):
+        if not isinstance(anim, FrameAnimation):
+            anim = FrameAnimation(anim)
+        self.animations[code] = anim
+        self._rebuild()
+        return anim
+
+    def get(self, code):
+        return self.animations.get(code)
+
+    def __contains__(self, code):
+        return code in self.animations
+
+    def _rebuild(self):
+        size = max(self.animations) + 1
+        self._offsets = np.zeros(size, dtype=np.int64)
+        self._totals = np.ones(size, dtype=np.float64)
+        self._base_ms = np.zeros(size, dtype=np.float64)
+        self._surfaces = []
+        self._ends = {}
+        for code in sorted(self.animations):
+            anim = self.animations[code]
+            self._offsets[code] = len(self._surfaces)
+            self._totals[code] = anim.total_ms
+            self._surfaces.extend(anim.surfaces)
+            self._ends[code] = anim.ends
+        self.update(self.time)
+
+    def update(self, time):
+        # 每個 tick 一次：算出各動畫在目前時間的循環位置 (ms)
+        self.time = time
+        self._base_ms = (time * 1000.0) % self._totals
+
+    def frames_for(self, codes, phases):
+        # 回傳每個物件目前該畫的 Surface (與 codes 同順序)
+        index = np.empty(len(codes), dtype=np.int64)
+        for code, ends in self._ends.items():
+            mine = codes == code
+            if not mine.any():
+                continue
+            total = self._totals[code]
+            ms = (self._base_ms[code] + phases[mine] * total) % total
+            index[mine] = np.searchsorted(ends, ms, side='right') + self._offsets[code]
+        surfaces = self._surfaces
+        return [surfaces[i] for i in index.tolist()]
+
+    def frame(self, code, phase=0.0):
+        return self.animations[code].get_frame(self.time, phase)
@@ -0,0 +1,143 @@
+import hashlib
+import os
+import struct
+
+import numpy as np
+import pygame
+
+
+"""
+GIF 幀圖集快取：第一次載入時用 PIL 解碼、縮放、翻轉，把所有幀的原始 RGBA 與每幀時間
+寫成一個圖集檔放在來源檔旁邊 (檔名含來源內容的雜湊)。之後啟動直接 memory-map 圖集，
+不複製地切出每一幀再轉成顯示格式。來源 GIF 改變時雜湊不同，會自動重建並清掉舊圖集。
+"""
+
+ATLAS_MAGIC = b'MPAT'
+ATLAS_VERSION = 1
+# magic, version, 寬, 高, 幀數
+ATLAS_HEADER = struct.Struct('<4sIIII')
+DEFAULT_DURATION_MS = 100
+
+
+def source_digest(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+def atlas_path(path, digest, scale, flip_x):
+    flip = '-flip' if flip_x else ''
+    return f"{path}.{digest}-{scale[0]}x{scale[1]}{flip}.atlas"
+
+def _remove_stale_atlases(path, keep):
+    # 同一個來源、同樣縮放與翻轉參數，但雜湊不同的舊圖集
+    directory = os.path.dirname(path) or '.'
+    prefix = os.path.basename(path) + '.'
+    suffix = keep[len(path) + 1 + 16:]
+    for name in os.listdir(directory):
+        full = os.path.join(directory, name)
+        if name.startswith(prefix) and name.endswith(suffix) and full != keep:
+            try:
+                os.remove(full)
+            except OSError:
+                pass
+
+
+# --- 解碼 (慢速路徑) ---
+def decode_gif(path, scale, flip_x=False):
+    # 回傳 ([每幀 RGBA bytes], [每幀毫秒])，處理方式與原本 load_gif_animation 相同
+    # PIL 只有圖集不存在時才需要，延後到這裡才 import，一般啟動不必載入
+    from PIL import Image
+    pil_img = Image.open(path)
+    pixels = []
+    durations = []
+    try:
+        while True:
+            frame = pil_img.convert('RGBA')
+            surface = pygame.image.fromstring(frame.tobytes(), frame.size, frame.mode)
+            surface = pygame.transform.scale(surface, scale)
+            if flip_x:
+                surface = pygame.transform.flip(surface, True, False)
+            pixels.append(pygame.image.tostring(surface, 'RGBA'))
+            duration_ms = pil_img.info.get('duration', DEFAULT_DURATION_MS)
+            durations.append(max(int(duration_ms), 10))
+            pil_img.seek(pil_img.tell() + 1)
+    except EOFError:
+        pass
+    return pixels, durations
+
+def write_atlas(target, scale, pixels, durations):
+    tmp = f"{target}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(ATLAS_HEADER.pack(ATLAS_MAGIC, ATLAS_VERSION, scale[0], scale[1], len(pixels)))
+        f.write(np.asarray(durations, dtype='<u4').tobytes())
+        for data in pixels:
+            f.write(data)
+    os.replace(tmp, target)
+
+
+# --- 讀取 (快速路徑) ---
+class FrameAtlas:
+    def __init__(self, path):
+        self.path = path
+        self._map = np.memmap(path, dtype=np.uint8, mode='r')
+        magic, version, width, height, count = ATLAS_HEADER.unpack_from(self._map[:ATLAS_HEADER.size].tobytes())
+        if magic != ATLAS_MAGIC or version != ATLAS_VERSION:
+            raise ValueError(f"不是有效的圖集檔：{path}")
+        self.size = (width, height)
+        self.count = count
+        index_start = ATLAS_HEADER.size
+        self.durations = np.frombuffer(self._map, dtype='<u4', count=count, offset=index_start).tolist()
+        self._pixels_start = index_start + 4 * count
+        self._frame_bytes = width * height * 4
+        if len(self._map) != self._pixels_start + count * self._frame_bytes:
+            raise ValueError(f"圖集檔長度不符：{path}")
+
+    def frame_buffer(self, i):
+        start = self._pixels_start + i * self._frame_bytes
+        return self._map[start:start + self._frame_bytes]  # memmap 的切片，不複製
+
+    def surfaces(self, convert=True):
+        frames = []
+        for i in range(self.count):
+            surface = pygame.image.frombuffer(self.frame_buffer(i), self.size, 'RGBA')
+            if convert and pygame.display.get_surface() is not None:
+                surface = surface.convert_alpha()  # 轉成顯示格式時才真正複製
+            else:
+                surface = surface.copy()  # 不轉換時也複製一份，讓圖集檔可以關閉
+            frames.append(surface)
+        return frames
+
+
+def _surfaces_from_pixels(pixels, durations, scale):
+    frames = []
+    for data, duration in zip(pixels, durations):
+        surface = pygame.image.fromstring(data, scale, 'RGBA')
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert_alpha()
+        frames.append((surface, duration))
+    return frames
+
+def load_gif_frames(path, scale, flip_x=False, use_cache=True):
+    # 回傳 [(Surface, 毫秒), ...]，可直接交給 animation.FrameAnimation
+    scale = (int(scale[0]), int(scale[1]))
+    if not use_cache:
+        return _surfaces_from_pixels(*decode_gif(path, scale, flip_x), scale)
+
+    target = atlas_path(path, source_digest(path), scale, flip_x)
+    if os.path.exists(target):
+        try:
+            atlas = FrameAtlas(target)
+            return list(zip(atlas.surfaces(), atlas.durations))
+        except (OSError, ValueError):
+            pass  # 圖集損壞時重新解碼
+
+    pixels, durations = decode_gif(path, scale, flip_x)
+    if pixels:
+        try:
+            write_atlas(target, scale, pixels, durations)
+            _remove_stale_atlases(path, target)
+        except OSError:
+            pass  # 來源目錄不可寫 (例如打包後的唯讀目錄) 時只用這次解碼的結果
+    return _surfaces_from_pixels(pixels, durations, scale)
@@ -0,0 +1,469 @@
+import heapq
+import itertools
+import math
+import threading
+import time
+import wave
+from collections import deque
+
+import numpy as np
+
+from synth import get_synth, NUM_OCTAVES
+
+try:
+    import sounddevice
+except (ImportError, OSError):  # 沒有安裝，或找不到 PortAudio 函式庫
+    sounddevice = None
+
+
+"""
+串流軟體混音器：取代「每換一個音就停掉循環的 pygame.Sound、再播一個新的 1 秒音檔」。
+輸出裝置 (sounddevice 的 OutputStream) 每次要一小塊 (block_size 個取樣) 時，
+在回呼中以 NumPy 整塊算出並混合：
+- 主旋律：相位連續的波表振盪器，換音時在 glide 秒內以對數頻率滑到新音高，不會爆音；
+- 和聲：數個獨立的振盪器，各自在指定秒數後淡出；
+- 單次取樣 (鼓聲等)：預先轉成 float32，播放時只做切片相加。
+主執行緒只把指令放進 deque (append/popleft 為原子操作)，回呼開頭一次取完，不需要鎖。
+指令可以帶取樣時間 at (與 frame 同一個時鐘，見 scheduler.py)：回呼把區塊在這些時間點切開，
+音符從指定的取樣開始；太晚送到的指令在區塊開頭生效，延遲記入 onset 誤差統計。
+回呼負載 (計算時間 / 區塊時間) 與斷音 (underrun) 次數由 stats() 回報。
+設定 tap 後每個區塊的混音結果也會寫一份到 tap (頻譜圖用，見 visualizer.py)。
+沒有音效卡時可以用 NullSink (丟棄) 或 FileSink (寫 WAV) 以同樣的節奏拉出區塊。
+"""
+
+SAMPLE_RATE = 44100
+BLOCK_SIZE = 256                # 約 5.8ms；越小延遲越低，但回呼次數越多
+CHANNELS = 2
+GLIDE_SECONDS = 0.03            # 主旋律換音時的滑音長度
+ATTACK_SECONDS = 0.005          # 起音與收音的淡入淡出，避免爆音
+RELEASE_SECONDS = 0.03
+MAX_HARMONY_VOICES = 4
+MAX_SAMPLE_VOICES = 16
+MELODY_GAIN = 0.2               # 與 offline.py 相同的混音比例
+HARMONY_GAIN = 0.12
+SAMPLE_GAIN = 0.5
+LOAD_WINDOW = 512               # 回呼負載保留最近幾次，用來算百分位數
+ONSET_WINDOW = 1024             # 排程指令的 onset 誤差保留最近幾筆
+
+_CMD_NOTE = 0
+_CMD_NOTE_OFF = 1
+_CMD_HARMONY = 2
+_CMD_SAMPLE = 3
+_CMD_STOP = 4
+_CMD_RELEASE = 5                # 和聲到時間自動淡出 (內部排程)
+
+
+def stream_available():
+    return sounddevice is not None
+
+
+# --- 振盪器：相位 (以週期為單位) 跨區塊延續 ---
+class Voice:
+    __slots__ = ('phase', 'freq', 'target', 'log_step', 'glide_left', 'gain', 'gain_target', 'started')
+
+    def __init__(self):
+        self.phase = 0.0
+        self.freq = 0.0
+        self.target = 0.0
+        self.log_step = 0.0     # 滑音時每個取樣的 log(頻率) 增量
+        self.glide_left = 0     # 滑音還剩幾個取樣
+        self.gain = 0.0
+        self.gain_target = 0.0
+        self.started = 0        # 開始的取樣時間，搶用聲部時挑最舊的，也用來辨認排程的淡出
+
+    @property
+    def active(self):
+        return self.gain > 0.0 or self.gain_target > 0.0
+
+    def start(self, freq, at):
+        self.freq = self.target = freq
+        self.glide_left = 0
+        self.gain_target = 1.0
+        self.started = at
+
+    def glide_to(self, freq, samples):
+        if not self.active or samples <= 0 or self.freq <= 0.0:
+            self.start(freq, self.started)
+            return
+        self.target = freq
+        self.glide_left = samples
+        self.log_step = (math.log(freq) - math.log(self.freq)) / samples
+        self.gain_target = 1.0
+
+
+class AudioEngine:
+    def __init__(self, sample_rate=SAMPLE_RATE, block_size=BLOCK_SIZE, channels=CHANNELS,
+                 harmonics=6, timbre='additive', glide=GLIDE_SECONDS):
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.channels = channels
+        synth = get_synth(sample_rate)
+        self.synth = synth
+        # 每個八度一張限頻波表 (與 simple.py 的 generate_sound 相同音色)
+        self.tables = [synth.table(timbre, harmonics, octave) for octave in range(NUM_OCTAVES)]
+        self.table_size = synth.table_size
+        self.glide_samples = int(glide * sample_rate)
+        self.attack_step = 1.0 / max(1, int(ATTACK_SECONDS * sample_rate))
+        self.release_step = 1.0 / max(1, int(RELEASE_SECONDS * sample_rate))
+        self.melody = Voice()
+        self.harmony_voices = [Voice() for _ in range(MAX_HARMONY_VOICES)]
+        self.samples = {}           # 名稱 -> float32 單聲道
+        self._playing = []          # [資料, 位置, 音量]
+        self._commands = deque()
+        self._pending = []          # (取樣時間, 序號, 指令)：還沒到時間的排程指令
+        self._seq = itertools.count()
+        self.frame = 0              # 已輸出的取樣數 (音訊時鐘)
+        self.tap = None             # 有 write(block) 的物件 (visualizer.SampleTap)，每個區塊收到一份混音結果
+        # 統計
+        self.callbacks = 0
+        self.underruns = 0
+        self.stolen = 0             # 聲部不夠時被搶走的和聲/取樣
+        self.load = 0.0
+        self.max_load = 0.0
+        self._loads = deque(maxlen=LOAD_WINDOW)
+        self.scheduled = 0
+        self.late = 0               # 送到時已經過了指定取樣時間的指令
+        self._onset_errors = deque(maxlen=ONSET_WINDOW)  # 實際開始 - 指定開始 (取樣數)
+        self._grow(block_size)
+
+    def _grow(self, size):
+        # 回呼中用到的暫存陣列都預先配置，回呼本身不配置記憶體
+        self._capacity = size
+        self._ramp = np.arange(1, size + 1, dtype=np.float64)
+        self._freq = np.empty(size, dtype=np.float64)
+        self._cycles = np.empty(size, dtype=np.float64)
+        self._env = np.empty(size, dtype=np.float64)
+        self._index = np.empty(size, dtype=np.int64)
+        self._wave = np.empty(size, dtype=np.float32)
+        self._voice_mix = np.empty(size, dtype=np.float64)
+        self._mix = np.empty(size, dtype=np.float64)
+
+    # --- 主執行緒端：只放指令 ---
+    def add_sample(self, name, data):
+        # data：int16 (單聲道或立體聲，取第一聲道) 或 -1..1 的浮點數
+        data = np.asarray(data)
+        if data.ndim == 2:
+            data = data[:, 0]
+        if data.dtype.kind == 'i':
+            data = data.astype(np.float32) / 32767.0
+        self.samples[name] = np.ascontiguousarray(data, dtype=np.float32)
+
+    # at：開始的取樣時間 (None 表示下一個區塊開頭)
+    def note_on(self, freq, at=None):
+        self._commands.append((at, _CMD_NOTE, float(freq)))
+
+    def note_off(self, at=None):
+        self._commands.append((at, _CMD_NOTE_OFF))
+
+    def harmony(self, freq, duration, at=None):
+        self._commands.append((at, _CMD_HARMONY, float(freq), int(duration * self.sample_rate)))
+
+    def play(self, name, gain=1.0, at=None):
+        self._commands.append((at, _CMD_SAMPLE, self.samples[name], gain))
+
+    def stop_all(self):
+        # 立即淡出所有聲音，並取消還沒到時間的排程 (重新開始、重播跳轉時用)
+        self._commands.append((None, _CMD_STOP))
+
+    # --- 音訊執行緒端 ---
+    def _apply(self, command, now):
+        # now：指令生效的取樣時間
+        kind = command[1]
+        if kind == _CMD_NOTE:
+            self.melody.glide_to(command[2], self.glide_samples)
+        elif kind == _CMD_NOTE_OFF:
+            self.melody.gain_target = 0.0
+        elif kind == _CMD_HARMONY:
+            voice = self._free_voice()
+            voice.start(command[2], now)
+            self._schedule((now + command[3], _CMD_RELEASE, voice, now))
+        elif kind == _CMD_RELEASE:
+            voice = command[2]
+            if voice.started == command[3]:  # 聲部沒有被別的和聲搶走
+                voice.gain_target = 0.0
+        elif kind == _CMD_SAMPLE:
+            if len(self._playing) >= MAX_SAMPLE_VOICES:
+                self._playing.pop(0)
+                self.stolen += 1
+            self._playing.append([command[2], 0, command[3]])
+        elif kind == _CMD_STOP:
+            # 全部淡出 (不直接歸零，避免爆音)
+            self.melody.gain_target = 0.0
+            for voice in self.harmony_voices:
+                voice.gain_target = 0.0
+            self._playing.clear()
+            self._pending.clear()
+
+    def _schedule(self, command):
+        heapq.heappush(self._pending, (command[0], next(self._seq), command))
+
+    def _free_voice(self):
+        for voice in self.harmony_voices:
+            if not voice.active:
+                return voice
+        self.stolen += 1
+        return min(self.harmony_voices, key=lambda v: v.started)
+
+    def _render_voice(self, voice, n, gain, out):
+        # 把一個振盪器的 n 個取樣乘上音量後加到 out
+        cycles = self._cycles[:n]
+        if voice.glide_left > 0:
+            # 滑音中：逐取樣頻率 (對數線性) 累加成相位
+            freq = self._freq[:n]
+            k = min(n, voice.glide_left)
+            top = max(voice.freq, voice.target)
+            head = freq[:k]
+            np.multiply(self._ramp[:k], voice.log_step, out=head)
+            head += math.log(voice.freq)
+            np.exp(head, out=head)
+            freq[k:] = voice.target
+            voice.glide_left -= k
+            voice.freq = voice.target if voice.glide_left == 0 else float(head[-1])
+            np.cumsum(freq, out=cycles)
+            cycles *= 1.0 / self.sample_rate
+        else:
+            # 固定音高：相位是等差數列，不必 cumsum
+            top = voice.freq
+            np.multiply(self._ramp[:n], voice.freq / self.sample_rate, out=cycles)
+        cycles += voice.phase
+        voice.phase = float(cycles[-1]) % 1.0
+        cycles *= self.table_size
+        index = self._index[:n]
+        np.copyto(index, cycles, casting='unsafe')
+        np.bitwise_and(index, self.table_size - 1, out=index)
+        wave = self._wave[:n]
+        # 滑音跨八度時用較高音的波表，確保不會超過奈奎斯特頻率
+        np.take(self.tables[self.synth.octave_of(top)], index, out=wave)
+
+        if voice.gain == voice.gain_target:
+            np.multiply(wave, gain * voice.gain, out=self._voice_mix[:n])
+        else:
+            env = self._env[:n]
+            if voice.gain_target > voice.gain:
+                np.multiply(self._ramp[:n], self.attack_step, out=env)
+                env += voice.gain
+                np.minimum(env, voice.gain_target, out=env)
+            else:
+                np.multiply(self._ramp[:n], -self.release_step, out=env)
+                env += voice.gain
+                np.maximum(env, voice.gain_target, out=env)
+            voice.gain = float(env[-1])
+            env *= gain
+            np.multiply(wave, env, out=self._voice_mix[:n])
+        out += self._voice_mix[:n]
+
+    def _render_segment(self, lo, hi):
+        # 把所有發聲中的聲部加到 mix[lo:hi]
+        n = hi - lo
+        out = self._mix[lo:hi]
+        if self.melody.active:
+            self._render_voice(self.melody, n, MELODY_GAIN, out)
+        for voice in self.harmony_voices:
+            if voice.active:
+                self._render_voice(voice, n, HARMONY_GAIN, out)
+        self._render_samples(n, out)
+
+    def _render_samples(self, n, out):
+        playing = self._playing
+        for voice in playing:
+            data, pos, gain = voice
+            count = min(n, len(data) - pos)
+            scaled = self._voice_mix[:count]
+            np.multiply(data[pos:pos + count], SAMPLE_GAIN * gain, out=scaled)
+            out[:count] += scaled
+            voice[1] = pos + count
+        if playing:
+            self._playing = [voice for voice in playing if voice[1] < len(voice[0])]
+
+    def render_into(self, out):
+        # 填滿 out (形狀 (n, channels) 的 float32)；sounddevice 回呼與各種 sink 都呼叫這裡
+        start = time.perf_counter()
+        n = len(out)
+        if n > self._capacity:
+            self._grow(n)
+        frame = self.frame
+        commands = self._commands
+        while commands:
+            command = commands.popleft()
+            if command[0] is None:
+                self._apply(command, frame)
+            else:
+                self.scheduled += 1
+                self._schedule(command)
+        mix = self._mix[:n]
+        mix.fill(0.0)
+        # 依排程時間把區塊切段：每段先算聲音，再讓下一個指令生效
+        pending = self._pending
+        end = frame + n
+        pos = 0
+        while pending and pending[0][0] < end:
+            at, _, command = heapq.heappop(pending)
+            offset = at - frame
+            if offset > pos:
+                self._render_segment(pos, offset)
+                pos = offset
+            self._apply(command, frame + pos)
+            if command[1] != _CMD_RELEASE:
+                error = frame + pos - at
+                if error > 0:
+                    self.late += 1
+                self._onset_errors.append(error)
+        if pos < n:
+            self._render_segment(pos, n)
+        np.clip(mix, -1.0, 1.0, out=mix)
+        np.copyto(out, mix[:, None], casting='same_kind')
+        if self.tap is not None:
+            self.tap.write(mix)
+        self.frame = end
+        self.callbacks += 1
+        load = (time.perf_counter() - start) * self.sample_rate / n
+        self.load = load
+        if load > self.max_load:
+            self.max_load = load
+        self._loads.append(load)
+
+    def render(self, frames):
+        # 不經過輸出裝置直接算出 frames 個取樣 (測試與離線用)；回傳新的陣列
+        out = np.empty((frames, self.channels), dtype=np.float32)
+        for start in range(0, frames, self.block_size):
+            self.render_into(out[start:start + self.block_size])
+        return out
+
+    # --- 統計 ---
+    def load_percent(self, q=50):
+        if not self._loads:
+            return 0.0
+        return float(np.percentile(np.asarray(self._loads), q)) * 100.0
+
+    def onset_error_ms(self, q=50):
+        if not self._onset_errors:
+            return 0.0
+        return float(np.percentile(np.asarray(self._onset_errors), q)) * 1000.0 / self.sample_rate
+
+    def stats(self):
+        return {
+            'sample_rate': self.sample_rate,
+            'block_size': self.block_size,
+            'block_ms': self.block_size * 1000.0 / self.sample_rate,
+            'callbacks': self.callbacks,
+            'seconds': self.frame / self.sample_rate,
+            'underruns': self.underruns,
+            'load_p50_pct': self.load_percent(50),
+            'load_p99_pct': self.load_percent(99),
+            'load_max_pct': self.max_load * 100.0,
+            'stolen_voices': self.stolen,
+            'scheduled': self.scheduled,
+            'late': self.late,
+            'onset_err_p50_ms': self.onset_error_ms(50),
+            'onset_err_p99_ms': self.onset_error_ms(99),
+            'onset_err_max_ms': self.onset_error_ms(100),
+        }
+
+
+# --- 輸出端 ---
+class StreamSink:
+    # sounddevice 的輸出串流；回呼在 PortAudio 的執行緒上執行
+    def __init__(self, engine, device=None, latency='low'):
+        if sounddevice is None:
+            raise RuntimeError("sounddevice is not installed (pip install sounddevice)")
+        self.engine = engine
+        self.stream = sounddevice.OutputStream(
+            samplerate=engine.sample_rate, blocksize=engine.block_size, channels=engine.channels,
+            dtype='float32', latency=latency, device=device, callback=self._callback)
+
+    def _callback(self, outdata, frames, time_info, status):
+        if status.output_underflow:
+            self.engine.underruns += 1
+        self.engine.render_into(outdata)
+
+    @property
+    def latency(self):
+        return self.stream.latency
+
+    def start(self):
+        self.stream.start()
+        return self
+
+    def close(self):
+        self.stream.stop()
+        self.stream.close()
+
+
+class NullSink:
+    # 沒有音效卡時使用：背景執行緒依實際時間 (realtime=True) 或盡快拉出區塊後丟棄
+    def __init__(self, engine, realtime=True):
+        self.engine = engine
+        self.realtime = realtime
+        self.latency = engine.block_size / engine.sample_rate
+        self._block = np.zeros((engine.block_size, engine.channels), dtype=np.float32)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='audio-output', daemon=True)
+
+    def consume(self, block):
+        pass
+
+    def _run(self):
+        block_seconds = self.engine.block_size / self.engine.sample_rate
+        deadline = time.perf_counter()
+        while not self._stop.is_set():
+            self.engine.render_into(self._block)
+            self.consume(self._block)
+            if not self.realtime:
+                continue
+            deadline += block_seconds
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                self._stop.wait(delay)
+            elif delay < -block_seconds:
+                # 落後超過一個區塊：真的音效卡在這裡已經斷音了
+                self.engine.underruns += 1
+                deadline = time.perf_counter()
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+
+class FileSink(NullSink):
+    # 把輸出寫成 16-bit WAV (.wav) 或原始 PCM (其他副檔名)
+    def __init__(self, engine, path, realtime=True):
+        super().__init__(engine, realtime)
+        self.path = path
+        self._scaled = np.empty(self._block.shape, dtype=np.float32)
+        self._pcm = np.empty(self._block.shape, dtype='<i2')
+        if path.endswith('.wav'):
+            self._out = wave.open(path, 'wb')
+            self._out.setnchannels(engine.channels)
+            self._out.setsampwidth(2)
+            self._out.setframerate(engine.sample_rate)
+            self._write = self._out.writeframesraw
+        else:
+            self._out = open(path, 'wb')
+            self._write = self._out.write
+
+    def consume(self, block):
+        np.multiply(block, 32767.0, out=self._scaled)
+        np.copyto(self._pcm, self._scaled, casting='unsafe')
+        self._write(self._pcm.tobytes())
+
+    def close(self):
+        super().close()
+        self._out.close()
+
+
+def open_output(engine, target='auto', realtime=True):
+    # target：'auto' (有 sounddevice 就用)、'stream'、'null'，或輸出檔路徑
+    if target == 'auto':
+        target = 'stream' if sounddevice is not None else 'null'
+    if target == 'stream':
+        sink = StreamSink(engine)
+    elif target == 'null':
+        sink = NullSink(engine, realtime)
+    else:
+        sink = FileSink(engine, target, realtime)
+    return sink.start()
@@ -0,0 +1,188 @@
+import numpy as np
+import pygame
+
+
+"""
+視差捲動背景：把 image/background.jpg 拆成遠近幾層，各層以不同比例跟著世界水平捲動
+(world_x，即軌跡已捲動的像素) 與鏡頭垂直移動 (camera_offset)，讓上下飛行有參考。
+- 圖片只解碼一次；每層在載入時就縮放、轉成顯示格式，並左右鏡像鋪成寬度 >= 畫面寬的環狀圖，
+  接縫處左右相同，不會看到斷層。
+- 各層先合成到一張畫面大小的 composed (常駐，不每幀建立)：只有移動的層蓋到的橫條重新合成，
+  每幀每層最多兩次 blit (環狀圖繞回時分成兩段)，不縮放；畫到畫面上時每個矩形只要從 composed 一次 blit。
+- 遠景以 FAR_STEP 像素為單位跳動 (約每 8 幀水平移一次)，遠景不動的幀只有近景的橫條需要更新。
+- 垂直方向不繞回 (天空下面不該接著天空)，位置夾在該層的範圍內；近景下方露出的部分填地面色。
+- 第一層是不透明、永遠蓋滿畫面的遠景，所以不需要先清成黑色。
+DirtyRectRenderer 可以直接把 ParallaxBackground 當背景 (見 render.py)：
+捲動時只重畫 composed 中改變的橫條 (dirty)，其他地方仍只清除上一幀畫過的區域；
+蓋滿畫面的遠景跳動時才整個畫面重畫。
+貼圖後端 (texture_render.TextureScreen) 有 refresh() 時，composed 改變的橫條也只更新貼圖的那一段。
+"""
+
+BACKGROUND_PATH = './image/background.jpg'
+
+# 遠景：天空、山與神廟 (原圖上方)；近景：下方的暗色地面與樹影，亮的部分透明
+SKY_ROWS = (0.0, 0.68)
+GROUND_ROWS = (0.60, 0.995)  # 原圖最下面幾列是較亮的邊，不取
+GROUND_COLUMNS = (0.2, 1.0)  # 原圖左緣的大樹一路暗到底，切進近景會變成硬邊，所以略過
+FAR_TRAVEL = 60           # 遠景上下可移動的像素 (縮放時多留的高度)
+FAR_SPEED = (0.1, 0.15)   # (水平, 垂直) 相對世界移動的比例
+FAR_STEP = (4, 4)         # 遠景位置的量化 (像素)
+NEAR_SPEED = (0.5, 0.6)
+NEAR_VISIBLE = 160        # 鏡頭在中央時近景露出的高度
+SILHOUETTE_LUMA = (35, 90)  # 亮度低於此值的像素保留為剪影 (近景頂端, 底端)；頂端較嚴，霧不會變成硬邊
+COLORKEY = (255, 0, 255)
+
+
+class ParallaxLayer:
+    def __init__(self, surface, speed_x, speed_y, base_y, y_range, below=None, step=(1, 1)):
+        # surface：已轉換、鋪好的環狀圖；base_y：鏡頭在中央時的螢幕 y；y_range：螢幕 y 的上下限
+        # below：圖下方露出時填的顏色 (None 表示不會露出)；step：位置以幾個像素為單位跳動
+        self.surface = surface
+        self.speed_x = speed_x
+        self.speed_y = speed_y
+        self.step = step
+        self.base_y = base_y
+        self.y_range = y_range
+        self.below = below
+        self.tile_width, self.height = surface.get_size()
+        self.x = 0   # 環狀圖中對應畫面左緣的位置
+        self.y = base_y
+
+    def rows(self, screen_height):
+        # 這一層在畫面上蓋到的列範圍 [top, bottom)；下方填色的部分也算
+        top = max(self.y, 0)
+        bottom = screen_height if self.below is not None else min(self.y + self.height, screen_height)
+        return top, max(top, bottom)
+
+    def scroll_to(self, world_x, camera_offset):
+        # 回傳這一層的整數位置是否改變
+        step_x, step_y = self.step
+        x = int(world_x * self.speed_x) // step_x * step_x % self.tile_width
+        y = min(max(self.base_y - int(camera_offset * self.speed_y) // step_y * step_y, self.y_range[0]), self.y_range[1])
+        moved = x != self.x or y != self.y
+        self.x, self.y = x, y
+        return moved
+
+    def draw(self, screen, screen_width, screen_height):
+        x, y = self.x, self.y
+        first = self.tile_width - x
+        screen.blit(self.surface, (0, y), (x, 0, min(first, screen_width), self.height))
+        if first < screen_width:
+            screen.blit(self.surface, (first, y), (0, 0, screen_width - first, self.height))
+        bottom = y + self.height
+        if self.below is not None and bottom < screen_height:
+            screen.fill(self.below, (0, bottom, screen_width, screen_height - bottom))
+
+
+class ParallaxBackground:
+    def __init__(self, size, layers):
+        # layers 由遠到近；第一層必須不透明且蓋滿畫面
+        self.size = size
+        self.layers = layers
+        self.composed = pygame.Surface(size, 0, layers[0].surface)
+        self.dirty = [self.composed.get_rect()]  # 上一次整個畫面重畫之後，composed 改變的橫條
+        self._stale = []                         # 還沒通知畫面 (貼圖後端) 的 composed 改變區域
+        self._compose(self.composed.get_rect())
+
+    @property
+    def moved(self):
+        return bool(self.dirty)
+
+    def _compose(self, area):
+        # 只在 area 內重新合成各層 (以 clip 限制 blit 範圍)
+        width, height = self.size
+        composed = self.composed
+        composed.set_clip(area)
+        for layer in self.layers:
+            layer.draw(composed, width, height)
+        composed.set_clip(None)
+        self._stale.append(area)
+
+    def scroll_to(self, world_x, camera_offset):
+        # 移動的層的新舊位置蓋到的列 (整個寬度) 合併成一條，重新合成後記進 dirty
+        width, height = self.size
+        top, bottom = height, 0
+        for layer in self.layers:
+            before = layer.rows(height)
+            if layer.scroll_to(world_x, camera_offset):
+                after = layer.rows(height)
+                top = min(top, before[0], after[0])
+                bottom = max(bottom, before[1], after[1])
+        if bottom > top:
+            band = pygame.Rect(0, top, width, bottom - top)
+            self._compose(band)
+            self.dirty.append(band)
+        return self.moved
+
+    def take_dirty(self):
+        # 取出並清空 dirty (呼叫端負責重畫這些區域)
+        rects, self.dirty = self.dirty, []
+        return rects
+
+    def draw(self, screen, area=None):
+        # area：只重畫這個矩形；None 時整個畫面重畫。都只從 composed 一次 blit
+        if self._stale:
+            refresh = getattr(screen, 'refresh', None)
+            if refresh is not None:
+                for rect in self._stale:
+                    refresh(self.composed, rect)
+            self._stale = []
+        if area is None:
+            screen.blit(self.composed, (0, 0))
+            self.dirty = []
+        else:
+            area = pygame.Rect(area)
+            screen.blit(self.composed, area.topleft, area)
+
+
+# --- 載入：解碼一次，各層縮放、去背、鏡像鋪排後轉成顯示格式 ---
+def mirror_tile(surface, min_width):
+    # 原圖 + 左右翻轉的原圖，接縫兩側相同；不夠寬時再重複
+    width, height = surface.get_size()
+    pair = 2
+    while pair * width < min_width:
+        pair += 2
+    tiled = pygame.Surface((pair * width, height), 0, surface)
+    flipped = pygame.transform.flip(surface, True, False)
+    for i in range(pair):
+        tiled.blit(flipped if i % 2 else surface, (i * width, 0))
+    return tiled
+
+def silhouette(surface, luma, colorkey):
+    # 亮度高於門檻的像素換成 colorkey；門檻由上到下從 luma[0] 漸變到 luma[1]
+    # 回傳地面 (最下面一列) 的平均顏色
+    rgb = pygame.surfarray.pixels3d(surface)
+    ground = tuple(int(c) for c in rgb[:, -1].mean(axis=0))
+    y = rgb[..., 0] * 0.299 + rgb[..., 1] * 0.587 + rgb[..., 2] * 0.114
+    rgb[y >= np.linspace(luma[0], luma[1], y.shape[1])] = colorkey
+    del rgb
+    return ground
+
+def load_parallax(size, path=BACKGROUND_PATH):
+    screen_width, screen_height = size
+    image = pygame.image.load(path)
+    image_width, image_height = image.get_size()
+    # 遠景高度 = 畫面高度 + 上下各 FAR_TRAVEL，寬度等比例
+    sky_top, sky_bottom = (int(r * image_height) for r in SKY_ROWS)
+    scale = (screen_height + 2 * FAR_TRAVEL) / (sky_bottom - sky_top)
+    scaled_width = max(1, int(image_width * scale))
+
+    sky = image.subsurface((0, sky_top, image_width, sky_bottom - sky_top))
+    sky = pygame.transform.smoothscale(sky.convert(), (scaled_width, screen_height + 2 * FAR_TRAVEL))
+    far = ParallaxLayer(mirror_tile(sky, screen_width).convert(), *FAR_SPEED,
+                        base_y=-FAR_TRAVEL, y_range=(-2 * FAR_TRAVEL, 0), step=FAR_STEP)
+
+    ground_top, ground_bottom = (int(r * image_height) for r in GROUND_ROWS)
+    ground_left, ground_right = (int(r * image_width) for r in GROUND_COLUMNS)
+    ground = image.subsurface((ground_left, ground_top, ground_right - ground_left, ground_bottom - ground_top))
+    ground = pygame.transform.smoothscale(ground.convert(), (max(1, int((ground_right - ground_left) * scale)),
+                                                             max(1, int((ground_bottom - ground_top) * scale))))
+    ground_color = silhouette(ground, SILHOUETTE_LUMA, COLORKEY)
+    ground = mirror_tile(ground, screen_width).convert()
+    # RLE：大片透明的剪影層 blit 時可以整段略過
+    ground.set_colorkey(COLORKEY, pygame.RLEACCEL)
+    near_height = ground.get_height()
+    # 鏡頭往上時近景最多整個沉到畫面下方，往下時最多整個升到畫面上方 (下方填地面色)
+    near = ParallaxLayer(ground, *NEAR_SPEED, base_y=screen_height - NEAR_VISIBLE,
+                         y_range=(-near_height, screen_height), below=ground_color)
+    return ParallaxBackground(size, [far, near])
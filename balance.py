@@ -0,0 +1,383 @@
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from simulation import (
+    GAME_STATE, OWL_SCORE, BIRD_SCORE, WIN_SCORE, LOSE_SCORE, SPAWN_INTERVAL, DETECTION_RADIUS,
+    REPEL_RADIUS, REPEL_FORCE, energy_max, semitone_jump, energy_cost, energy_increase_rate,
+    space_energy_cost, screen_width, screen_height, center_x, BIRD_SCALE, OWL_SCALE,
+    BIRD_RATIO, BIRD_SPEED_RANGE, OWL_SPEED_RANGE, TICK_DT,
+    INPUT_UP, INPUT_DOWN, INPUT_HOLD, INPUT_JUMP_UP, INPUT_JUMP_DOWN, INPUT_DRUM,
+)
+
+
+"""
+平衡測試：一次模擬很多局，每一局是陣列中的一列 (飛機 y、能量、物件位置...)，
+以 NumPy 整批推進，規則與 simulation.GameSimulation 相同：
+生成 (每 SPAWN_INTERVAL+1 個 tick 一個，鳥的比例 BIRD_RATIO，速度範圍)、移動與離開畫面、
+偵測半徑內的加減分、跳躍扣能量、SPACE 暫停偵測扣能量、D 推開物件、勝負判定。
+亂數改用 NumPy (與 GameSimulation 的 random.Random 序列不同)，比較的是分布而不是單局。
+- 玩家由 bot 代替 (POLICIES)：idle 不操作、scripted 固定節奏上下擺動、random 隨機操作、greedy 追鳥躲貓頭鷹。
+- 參數掃描：每組參數拆成多個批次交給 process pool，彙整成勝率與通關時間分布。
+- 物件放在每局固定數量的槽位 (環狀使用)，槽位數由最慢的物件多久離開畫面推算。
+  物件陣列是 (槽位, 局) 排列：每局的加總只是把十幾列連續的陣列相加，比沿著很短的最後一軸 reduce 快得多。
+用法:
+  python balance.py --games 100000 --policy greedy
+  python balance.py --games 1000000 --policy greedy --set owl_score=-0.4,-0.3 --set spawn_interval=30,40 --out sweep.json
+  python balance.py --set bird_speed=3:5,2:4   (速度範圍寫成 lo:hi)
+"""
+
+# 可以掃描的參數與預設值 (預設值就是遊戲目前的設定)
+DEFAULT_PARAMS = {
+    'owl_score': OWL_SCORE,
+    'bird_score': BIRD_SCORE,
+    'spawn_interval': SPAWN_INTERVAL,
+    'energy_cost': energy_cost,
+    'energy_increase_rate': energy_increase_rate,
+    'bird_ratio': BIRD_RATIO,
+    'bird_speed': BIRD_SPEED_RANGE,
+    'owl_speed': OWL_SPEED_RANGE,
+    'space_energy_cost': space_energy_cost,
+    'win_score': WIN_SCORE,
+    'start_energy': 200.0,
+}
+RANGE_PARAMS = ('bird_speed', 'owl_speed')
+INT_PARAMS = ('spawn_interval',)
+
+BATCH_GAMES = 20000         # 每個 process pool 工作的局數
+MAX_SECONDS = 600.0         # 超過這個時間還沒結束的局算逾時
+COMPACT_EVERY = 120         # 每隔幾個 tick 檢查一次，結束的局太多時把陣列縮小
+COMPACT_FRACTION = 0.75
+DRUM_COOLDOWN = 12          # bot 打鼓的最短間隔 (tick)，大約是人手連按的速度
+LOOKAHEAD_PIXELS = 400      # greedy bot 只追這個距離內、還在前方的鳥
+HISTOGRAM_SECONDS = 10.0    # 通關時間直方圖的寬度
+PERCENTILES = (10, 25, 50, 75, 90)
+
+JUMP_PIXELS = semitone_jump * 10
+OBJECT_HEIGHT = max(BIRD_SCALE[1], OWL_SCALE[1])
+
+
+def slot_count(params):
+    # 同一局同時存在的物件上限：最慢的物件從最右邊生成到離開畫面需要的 tick 數 / 生成間隔
+    # 推開 (D) 可能讓物件多留一陣子，所以多留幾個槽；真的用完時覆蓋最舊的槽並計數
+    slowest = min(params['bird_speed'][0], params['owl_speed'][0])
+    travel = screen_width + 200 + max(BIRD_SCALE[0], OWL_SCALE[0])
+    return int(np.ceil(travel / max(slowest, 1) / (params['spawn_interval'] + 1))) + 3
+
+
+class BatchSimulation:
+    def __init__(self, games, params=None, policy='greedy', seed=None, max_seconds=MAX_SECONDS, dt=TICK_DT):
+        self.params = dict(DEFAULT_PARAMS, **(params or {}))
+        self.policy = POLICIES[policy]
+        self.rng = np.random.default_rng(seed)
+        self.dt = dt
+        self.max_ticks = int(max_seconds / dt)
+        self.slots = slot_count(self.params)
+        self.games = games
+        # 每局的結果 (以原始列號索引)
+        self.outcome = np.full(games, GAME_STATE['RUNNING'], dtype=np.uint8)
+        self.end_time = np.full(games, np.nan, dtype=np.float32)
+        self.overwritten = 0   # 槽位不夠而覆蓋掉的物件數
+        self.tick = 0
+        # 所有局同時開始，所以飛機 x 與生成計時器對每一局都一樣
+        self.plane_cx = 100
+        self.spawn_timer = 0
+        self.spawn_count = 0
+
+        n, k = games, self.slots
+        self.rows = np.arange(games)
+        self.plane_cy = np.full(n, screen_height // 2, dtype=np.int32)
+        self.energy = np.full(n, float(self.params['start_energy']))
+        self.last_delta = np.zeros(n)
+        self.last_drum = np.full(n, -DRUM_COOLDOWN, dtype=np.int32)
+        self.state = np.zeros(n, dtype=np.int32)   # 給 bot 用的每局暫存 (例如 random 目前按住的方向)
+        self.running = np.ones(n, dtype=bool)
+        # 物件 (槽位, 局)：中心座標、速度、分數、是否為鳥、是否存在
+        self.obj_cx = np.zeros((k, n), dtype=np.int32)
+        self.obj_cy = np.zeros((k, n), dtype=np.int32)
+        self.obj_speed = np.zeros((k, n), dtype=np.int32)
+        self.obj_score = np.zeros((k, n))
+        self.obj_bird = np.zeros((k, n), dtype=bool)
+        self.obj_alive = np.zeros((k, n), dtype=bool)
+
+    GAME_FIELDS = ('rows', 'plane_cy', 'energy', 'last_delta', 'last_drum', 'state', 'running')
+    OBJECT_FIELDS = ('obj_cx', 'obj_cy', 'obj_speed', 'obj_score', 'obj_bird', 'obj_alive')
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _compact(self):
+        keep = np.flatnonzero(self.running)
+        for name in self.GAME_FIELDS:
+            setattr(self, name, getattr(self, name)[keep])
+        for name in self.OBJECT_FIELDS:
+            setattr(self, name, np.ascontiguousarray(getattr(self, name)[:, keep]))
+
+    # --- 一個 tick：順序與 GameSimulation.step 相同 ---
+    def step(self):
+        p = self.params
+        inputs = self.policy(self)
+        energy = self.energy
+
+        # 跳躍 (能量足夠才生效)，鼓聲推開
+        cost = p['energy_cost']
+        jump = ((inputs & INPUT_JUMP_UP) != 0) & (energy >= cost)
+        self.plane_cy -= jump * JUMP_PIXELS
+        energy -= jump * cost
+        jump = ((inputs & INPUT_JUMP_DOWN) != 0) & (energy >= cost)
+        self.plane_cy += jump * JUMP_PIXELS
+        energy -= jump * cost
+        drum = np.flatnonzero(inputs & INPUT_DRUM)
+        if len(drum):
+            self._repel(drum)
+
+        # 上下移動，飛機往中央前進
+        self.plane_cy += 3 * (((inputs & INPUT_DOWN) != 0).astype(np.int32) - ((inputs & INPUT_UP) != 0))
+        if self.plane_cx < center_x:
+            self.plane_cx += 3
+
+        # 生成、移動、移除離開畫面的物件
+        self.spawn_timer += 1
+        if self.spawn_timer > p['spawn_interval']:
+            self.spawn_timer = 0
+            self._spawn()
+        self.obj_cx -= self.obj_speed
+        # 與 rect.right < 0 相同 (兩種物件同寬)
+        self.obj_alive &= self.obj_cx + (BIRD_SCALE[0] - BIRD_SCALE[0] // 2) >= 0
+
+        # 能量：自然增加 + 偵測半徑內的加減分 (按住 SPACE 時改為扣能量)
+        energy += p['energy_increase_rate'] * self.dt
+        dx = self.obj_cx - self.plane_cx
+        dy = self.obj_cy - self.plane_cy
+        inside = self.obj_alive & (dx * dx + dy * dy <= DETECTION_RADIUS * DETECTION_RADIUS)
+        delta = (self.obj_score * inside).sum(axis=0)
+        hold = (inputs & INPUT_HOLD) != 0
+        self.last_delta = np.where(hold, 0.0, delta)
+        energy += np.where(hold, -p['space_energy_cost'], delta)
+        np.clip(energy, LOSE_SCORE, energy_max, out=energy)
+
+        # 勝負
+        win = self.running & (energy >= p['win_score'])
+        lose = self.running & ~win & (energy <= LOSE_SCORE)
+        if win.any() or lose.any():
+            t = self.tick * self.dt
+            self.outcome[self.rows[win]] = GAME_STATE['WIN']
+            self.outcome[self.rows[lose]] = GAME_STATE['LOSE']
+            self.end_time[self.rows[win | lose]] = t
+            self.running &= ~(win | lose)
+        self.tick += 1
+        if self.tick % COMPACT_EVERY == 0 and self.running.sum() < COMPACT_FRACTION * len(self.rows):
+            self._compact()
+
+    def _spawn(self):
+        # 與 GameSimulation._update_objects 相同的分布 (randint 含兩端)
+        p = self.params
+        n = len(self.rows)
+        rng = self.rng
+        slot = self.spawn_count % self.slots
+        self.spawn_count += 1
+        self.overwritten += int(self.obj_alive[slot].sum())
+        camera_offset = self.plane_cy - screen_height // 2
+        top = rng.integers(camera_offset - 20, camera_offset + screen_height + 20 - OBJECT_HEIGHT + 1)
+        bird = rng.random(n) < p['bird_ratio']
+        bird_speed = rng.integers(p['bird_speed'][0], p['bird_speed'][1] + 1, size=n)
+        owl_speed = rng.integers(p['owl_speed'][0], p['owl_speed'][1] + 1, size=n)
+        self.obj_cx[slot] = screen_width + rng.integers(0, 201, size=n) + BIRD_SCALE[0] // 2
+        self.obj_cy[slot] = top + np.where(bird, BIRD_SCALE[1] // 2, OWL_SCALE[1] // 2)
+        self.obj_speed[slot] = np.where(bird, bird_speed, owl_speed)
+        self.obj_score[slot] = np.where(bird, p['bird_score'], p['owl_score'])
+        self.obj_bird[slot] = bird
+        self.obj_alive[slot] = True
+
+    def _repel(self, rows):
+        # 與 EntityStore.repel 相同：半徑內 (不含重合) 的物件沿「飛機→物件」方向推開，位移往 0 截斷
+        dx = (self.obj_cx[:, rows] - self.plane_cx).astype(np.float64)
+        dy = (self.obj_cy[:, rows] - self.plane_cy[rows]).astype(np.float64)
+        distance = np.hypot(dx, dy)
+        hit = self.obj_alive[:, rows] & (distance <= REPEL_RADIUS) & (distance > 0)
+        distance[~hit] = 1.0
+        self.obj_cx[:, rows] += np.where(hit, np.trunc(dx / distance * REPEL_FORCE), 0).astype(np.int32)
+        self.obj_cy[:, rows] += np.where(hit, np.trunc(dy / distance * REPEL_FORCE), 0).astype(np.int32)
+
+    def run(self):
+        while self.tick < self.max_ticks and self.running.any():
+            self.step()
+        return self.outcome, self.end_time
+
+
+# --- bot：回傳每一局這個 tick 的輸入位元 (與 simulation 的 INPUT_* 相同) ---
+def policy_idle(sim):
+    return np.zeros(len(sim), dtype=np.int32)
+
+def policy_scripted(sim):
+    # 與 benchmarks/bench.py 的 scripted_inputs 相同的節奏：上、停、下、停，定時跳躍與打鼓
+    tick = sim.tick
+    inputs = (INPUT_UP, 0, INPUT_DOWN, 0)[(tick // 45) % 4]
+    if tick % 90 == 30:
+        inputs |= INPUT_JUMP_UP
+    if tick % 120 == 60:
+        inputs |= INPUT_DRUM
+    return np.full(len(sim), inputs, dtype=np.int32)
+
+def policy_random(sim):
+    # 按住的方向平均每半秒換一次；偶爾跳躍或打鼓
+    rng = sim.rng
+    n = len(sim)
+    change = rng.random(n) < 1.0 / 30
+    sim.state[change] = rng.integers(0, 3, size=int(change.sum()))
+    inputs = np.choose(sim.state, (0, INPUT_UP, INPUT_DOWN)).astype(np.int32)
+    r = rng.random(n)
+    inputs |= np.where(r < 0.005, INPUT_JUMP_UP, 0)
+    inputs |= np.where((r >= 0.005) & (r < 0.01), INPUT_JUMP_DOWN, 0)
+    inputs |= np.where(rng.random(n) < 0.02, INPUT_DRUM, 0)
+    return inputs
+
+def policy_greedy(sim):
+    # 往前方不遠處那些鳥的平均高度移動，太遠時跳躍；沒有鳥時停在原地。
+    # 貓頭鷹進入推開半徑就打鼓 (有冷卻)，偵測範圍內淨分數為負時按住 SPACE
+    # (只用沿槽位軸的加總，不用 argmin：(槽位, 局) 排列下 argmin 是跨步存取，慢很多)
+    plane_cy = sim.plane_cy
+    dx = sim.obj_cx - sim.plane_cx
+    chase = sim.obj_alive & sim.obj_bird & (dx >= -DETECTION_RADIUS) & (dx <= LOOKAHEAD_PIXELS)
+    count = chase.sum(axis=0)
+    gap = np.where(count > 0, (sim.obj_cy * chase).sum(axis=0) // np.maximum(count, 1) - plane_cy, 0)
+    inputs = np.where(gap < -3, INPUT_UP, np.where(gap > 3, INPUT_DOWN, 0)).astype(np.int32)
+    far = np.abs(gap) > 2 * JUMP_PIXELS
+    spare = sim.energy > sim.params['energy_cost'] + 50
+    inputs |= np.where(far & spare & (gap < 0), INPUT_JUMP_UP, 0)
+    inputs |= np.where(far & spare & (gap > 0), INPUT_JUMP_DOWN, 0)
+
+    dy = sim.obj_cy - plane_cy
+    owl_near = (sim.obj_alive & ~sim.obj_bird & (dx * dx + dy * dy <= REPEL_RADIUS * REPEL_RADIUS)).any(axis=0)
+    drum = owl_near & (sim.tick - sim.last_drum >= DRUM_COOLDOWN)
+    sim.last_drum[drum] = sim.tick
+    inputs |= np.where(drum, INPUT_DRUM, 0)
+    inputs |= np.where(sim.last_delta < -sim.params['space_energy_cost'], INPUT_HOLD, 0)
+    return inputs
+
+POLICIES = {
+    'idle': policy_idle,
+    'scripted': policy_scripted,
+    'random': policy_random,
+    'greedy': policy_greedy,
+}
+
+
+# --- 批次與掃描 ---
+def run_batch(params, policy, games, seed, max_seconds=MAX_SECONDS):
+    # process pool 的工作單位，必須是模組層級函數；回傳 (結果, 結束時間, 覆蓋的物件數)
+    sim = BatchSimulation(games, params, policy, seed, max_seconds)
+    outcome, end_time = sim.run()
+    return outcome, end_time, sim.overwritten
+
+def _run_job(job):
+    return run_batch(*job)
+
+def summarize(params, outcome, end_time, max_seconds=MAX_SECONDS, overwritten=0):
+    wins = outcome == GAME_STATE['WIN']
+    losses = outcome == GAME_STATE['LOSE']
+    games = len(outcome)
+    win_times = end_time[wins]
+    bins = np.arange(0.0, max_seconds + HISTOGRAM_SECONDS, HISTOGRAM_SECONDS)
+    histogram, _ = np.histogram(win_times, bins=bins)
+    summary = {
+        'params': {name: list(value) if name in RANGE_PARAMS else value for name, value in params.items()},
+        'games': games,
+        'win_rate': float(wins.mean()) if games else 0.0,
+        'lose_rate': float(losses.mean()) if games else 0.0,
+        'timeout_rate': float((outcome == GAME_STATE['RUNNING']).mean()) if games else 0.0,
+        'win_time_mean': float(win_times.mean()) if len(win_times) else None,
+        'lose_time_p50': float(np.percentile(end_time[losses], 50)) if losses.any() else None,
+        'win_time_histogram': {'bin_seconds': HISTOGRAM_SECONDS, 'counts': histogram.tolist()},
+        'overwritten_objects': overwritten,
+    }
+    for q in PERCENTILES:
+        summary[f'win_time_p{q}'] = float(np.percentile(win_times, q)) if len(win_times) else None
+    return summary
+
+def expand_grid(grid):
+    # {'owl_score': [-0.4, -0.3], ...} -> 每種組合一組完整參數
+    names = list(grid)
+    for values in itertools.product(*(grid[name] for name in names)):
+        yield dict(DEFAULT_PARAMS, **dict(zip(names, values)))
+
+def sweep(grid, games, policy='greedy', workers=None, seed=0, max_seconds=MAX_SECONDS, batch_games=BATCH_GAMES):
+    # 每組參數拆成 ceil(games / batch_games) 個工作，全部丟進同一個 process pool
+    param_sets = list(expand_grid(grid))
+    sizes = [batch_games] * (games // batch_games) + ([games % batch_games] if games % batch_games else [])
+    seeds = iter(np.random.SeedSequence(seed).spawn(len(param_sets) * len(sizes)))
+    jobs = [(params, policy, size, next(seeds), max_seconds) for params in param_sets for size in sizes]
+    if workers == 1:
+        results = [_run_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_run_job, jobs))
+    summaries = []
+    for i, params in enumerate(param_sets):
+        parts = results[i * len(sizes):(i + 1) * len(sizes)]
+        outcome = np.concatenate([part[0] for part in parts])
+        end_time = np.concatenate([part[1] for part in parts])
+        summaries.append(summarize(params, outcome, end_time, max_seconds, sum(part[2] for part in parts)))
+    return summaries
+
+
+def parse_setting(text):
+    # name=v1,v2,...；速度範圍寫成 lo:hi
+    name, _, values = text.partition('=')
+    if name not in DEFAULT_PARAMS or not values:
+        raise argparse.ArgumentTypeError(f"expected name=v1,v2 with name in {', '.join(DEFAULT_PARAMS)}")
+    parsed = []
+    for value in values.split(','):
+        if name in RANGE_PARAMS:
+            lo, _, hi = value.partition(':')
+            parsed.append((int(lo), int(hi or lo)))
+        elif name in INT_PARAMS:
+            parsed.append(int(value))
+        else:
+            parsed.append(float(value))
+    return name, parsed
+
+def describe_params(params, grid):
+    # 只列出有掃描的參數
+    return ' '.join(f"{name}={params[name]}" for name in grid) or 'defaults'
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate many games at once to check game balance')
+    parser.add_argument('--games', type=int, default=100000, help='games per parameter set')
+    parser.add_argument('--policy', default='greedy', choices=sorted(POLICIES), help='bot that plays every game')
+    parser.add_argument('--set', dest='settings', type=parse_setting, action='append', default=[],
+                        help='parameter values to sweep, e.g. owl_score=-0.4,-0.3 or bird_speed=3:5,2:4 (repeatable)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--batch', type=int, default=BATCH_GAMES, help='games per worker job')
+    parser.add_argument('--max-seconds', type=float, default=MAX_SECONDS, help='game time before a game counts as a timeout')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default=None, help='write the summaries as JSON to this path')
+    args = parser.parse_args()
+
+    grid = dict(args.settings)
+    start = time.perf_counter()
+    summaries = sweep(grid, args.games, args.policy, args.workers, args.seed, args.max_seconds, args.batch)
+    wall = time.perf_counter() - start
+    for s in summaries:
+        p50 = s['win_time_p50']
+        p90 = s['win_time_p90']
+        times = f"win time p50 {p50:6.1f} s  p90 {p90:6.1f} s" if p50 is not None else "no wins"
+        print(f"{describe_params(s['params'], grid)}: win {s['win_rate'] * 100:5.1f}%  lose {s['lose_rate'] * 100:5.1f}%  "
+              f"timeout {s['timeout_rate'] * 100:5.1f}%  {times}")
+    total = sum(s['games'] for s in summaries)
+    print(f"{total} games ({args.policy}) in {wall:.1f} s ({total / max(wall, 1e-9):.0f} games/s, "
+          f"{args.workers or os.cpu_count()} workers)")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'policy': args.policy, 'max_seconds': args.max_seconds, 'seed': args.seed,
+                       'wall_seconds': wall, 'results': summaries}, f, indent=2)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
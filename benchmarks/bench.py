@@ -0,0 +1,323 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+# 無畫面、無音效卡也能執行
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # simple.py 以相對路徑載入 ./image
+
+import numpy as np
+import pygame
+
+import simple
+simple.initialize(background=False, audio_output='mixer')  # 不顯示載入畫面，直接在這個執行緒載入資源
+from audio_engine import AudioEngine
+from entities import EntityStore
+from simulation import (
+    GameSimulation, Plane, DETECTION_RADIUS, REPEL_RADIUS, REPEL_FORCE, BIRD_SCALE, OWL_SCALE,
+    screen_width, screen_height, INPUT_UP, INPUT_DOWN, INPUT_HOLD, INPUT_JUMP_UP, INPUT_DRUM,
+)
+from trail import MusicTrail
+from render import TrailRenderer
+from background import load_parallax
+from visualizer import SampleTap, Spectrogram
+
+
+"""
+遊戲熱點的可重現效能測試 (SDL dummy 驅動，無畫面無音效)。
+用法:
+  python benchmarks/bench.py --out bench.json
+  python benchmarks/bench.py --out new.json --compare bench.json --threshold 0.15
+結果為 JSON，每個項目包含各百分位數 (微秒)；比較模式下 p50 變慢超過門檻即視為退步，結束碼為 1。
+"""
+
+OBJECT_COUNTS = (10, 100, 1000, 10000)
+TRAIL_SCROLLS = (55, 11, 5, 1)  # 每幀加一點時，軌跡長度約為 550 / scroll = 10, 50, 110, 550 點
+AUDIO_BLOCKS = (64, 256, 1024)
+
+
+# --- 計時 ---
+def measure(fn, iterations, warmup):
+    for _ in range(warmup):
+        fn()
+    samples = np.empty(iterations, dtype=np.int64)
+    for i in range(iterations):
+        start = time.perf_counter_ns()
+        fn()
+        samples[i] = time.perf_counter_ns() - start
+    us = samples / 1000.0
+    return {
+        'iterations': iterations,
+        'mean_us': float(us.mean()),
+        'min_us': float(us.min()),
+        'p50_us': float(np.percentile(us, 50)),
+        'p90_us': float(np.percentile(us, 90)),
+        'p99_us': float(np.percentile(us, 99)),
+        'max_us': float(us.max()),
+    }
+
+
+# --- 各項測試的準備 ---
+def make_store(count, seed=0):
+    rng = random.Random(seed)
+    store = EntityStore(cell_size=DETECTION_RADIUS)
+    for _ in range(count):
+        if rng.random() < 0.39:
+            store.spawn(rng.randint(0, screen_width), rng.randint(-screen_height, 2 * screen_height),
+                        BIRD_SCALE, speed=rng.randint(3, 5), obj_type='bird', phase=rng.random())
+        else:
+            store.spawn(rng.randint(0, screen_width), rng.randint(-screen_height, 2 * screen_height),
+                        OWL_SCALE, speed=rng.randint(4, 7), obj_type='owl', phase=rng.random())
+    return store
+
+def bench_radius(count):
+    store = make_store(count)
+    plane = Plane(screen_width // 2, screen_height // 2)
+    return lambda: plane.get_objects_in_radius(store)
+
+def bench_repel(count):
+    store = make_store(count)
+    center = (screen_width // 2, screen_height // 2)
+    state = {'flip': 1}
+
+    def run():
+        # 來回推動，讓物件維持在玩家附近
+        store.repel(center, REPEL_RADIUS, REPEL_FORCE * state['flip'])
+        state['flip'] = -state['flip']
+    return run
+
+def bench_objects_draw(count):
+    store = make_store(count)
+    surface = pygame.Surface((screen_width, screen_height)).convert()
+    anims = simple.OBJECT_ANIMS
+    state = {'tick': 0}
+
+    def run():
+        anims.update(state['tick'] * simple.sim.dt)
+        store.draw(surface, 0, anims)
+        state['tick'] += 1
+    return run
+
+def bench_trail(scroll):
+    trail = MusicTrail(capacity=1024, scroll_per_frame=scroll)
+    renderer = TrailRenderer((screen_width, screen_height))
+    surface = pygame.Surface((screen_width, screen_height)).convert()
+    state = {'frame': 0}
+
+    def run():
+        frame = state['frame']
+        y = screen_height // 2 + int(120 * np.sin(frame / 15.0))
+        trail.append(screen_width // 2, y)
+        trail.advance()
+        renderer.draw(surface, trail, y - screen_height // 2)
+        state['frame'] = frame + 1
+    for _ in range(600):  # 先讓軌跡長度達到穩定
+        run()
+    return run
+
+def bench_background(mode):
+    # fill_trail：原本每幀的整個畫面填黑 + 整條軌跡重畫；parallax：視差背景每幀都移動時的整個畫面重畫
+    trail = MusicTrail(capacity=1024, scroll_per_frame=5)
+    renderer = TrailRenderer((screen_width, screen_height))
+    surface = pygame.Surface((screen_width, screen_height)).convert()
+    background = load_parallax((screen_width, screen_height)) if mode == 'parallax' else None
+    state = {'frame': 0}
+    for frame in range(120):
+        trail.append(screen_width // 2, screen_height // 2 + int(120 * np.sin(frame / 15.0)))
+        trail.advance()
+
+    def run():
+        frame = state['frame']
+        camera_offset = int(200 * np.sin(frame / 40.0))
+        if background is None:
+            surface.fill((0, 0, 0))
+            renderer.invalidate()
+            renderer.draw(surface, trail, camera_offset)
+        else:
+            background.scroll_to(trail.offset + frame * 5, camera_offset)
+            background.draw(surface)
+        state['frame'] = frame + 1
+    return run
+
+def bench_plane_draw():
+    sim = GameSimulation(seed=0)
+    sprite = simple.PlaneSprite(sim.plane.max_tilt)
+    state = {'tilt': -sim.plane.max_tilt}
+
+    def run():
+        sim.plane.tilt_angle = state['tilt']
+        sprite.draw(sim.plane, 0)
+        state['tilt'] = state['tilt'] + 1 if state['tilt'] < sim.plane.max_tilt else -sim.plane.max_tilt
+    return run
+
+def scripted_inputs(tick):
+    # 固定的操作腳本：上下擺動、偶爾跳躍與打鼓、偶爾按住 SPACE
+    phase = (tick // 45) % 4
+    inputs = (INPUT_UP, 0, INPUT_DOWN, 0)[phase]
+    if tick % 90 == 30:
+        inputs |= INPUT_JUMP_UP
+    if tick % 120 == 60:
+        inputs |= INPUT_DRUM
+    if (tick // 300) % 5 == 4:
+        inputs |= INPUT_HOLD
+    return inputs
+
+def bench_full_frame():
+    # 與 simple.main() 相同的一幀：模擬一步 + 音訊事件 + 繪圖
+    sim = simple.sim
+    sim.reset(seed=1234)
+    sim.music_mode = True  # 避免中途結束，量測的都是遊戲進行中的畫面
+    state = {'tick': 0}
+
+    def run():
+        sim.step(scripted_inputs(state['tick']))
+        simple.handle_audio(sim.drain_events())
+        simple.draw_frame()
+        state['tick'] += 1
+    return run
+
+
+def bench_audio_block(block_size):
+    # 串流混音器的一次回呼：主旋律滑音 + 4 個和聲 + 鼓聲，每 0.1 秒換音
+    engine = AudioEngine(block_size=block_size)
+    engine.add_sample('drum', engine.synth.render_drum())
+    out = np.empty((block_size, engine.channels), dtype=np.float32)
+    blocks_per_note = max(1, int(0.1 * engine.sample_rate) // block_size)
+    state = {'block': 0}
+
+    def run():
+        i = state['block']
+        if i % blocks_per_note == 0:
+            engine.note_on(220.0 * 2 ** ((i // blocks_per_note) % 24 / 12))
+            engine.harmony(330.0, 0.4)
+            engine.play('drum')
+        engine.render_into(out)
+        state['block'] = i + 1
+    return run
+
+def bench_visualizer():
+    # 頻譜圖的一幀：tap 收到 1/60 秒的混音 (每幀 1~2 個 hop)，分析後畫到畫面上
+    engine = AudioEngine()
+    tap = SampleTap()
+    engine.tap = tap
+    spectrogram = Spectrogram(tap, engine.sample_rate)
+    surface = pygame.Surface((screen_width, screen_height)).convert()
+    out = np.empty((engine.sample_rate // 60, engine.channels), dtype=np.float32)
+    engine.note_on(440.0)
+    engine.harmony(660.0, 1000.0)
+    engine.render_into(out)
+    spectrogram.update()
+    blocks = [out.copy() for _ in range(8)]
+    for block in blocks:
+        engine.render_into(block)
+    mono = [block[:, 0].copy() for block in blocks]
+    state = {'frame': 0}
+
+    def run():
+        tap.write(mono[state['frame'] % len(mono)])
+        spectrogram.update()
+        spectrogram.draw(surface, (10, screen_height - 74))
+        state['frame'] += 1
+    return run
+
+
+def build_suite(quick=False):
+    scale = 0.2 if quick else 1.0
+
+    def n(iterations):
+        return max(5, int(iterations * scale))
+
+    suite = [
+        ('generate_sound', lambda: (lambda: simple.generate_sound(523.25, duration=1.0, harmonics=6)), n(200)),
+        ('generate_drum', lambda: simple.generate_drum, n(200)),
+        ('load_gif_animation/bird', lambda: (lambda: simple.load_gif_animation(simple.BIRD_PATH, BIRD_SCALE)), n(10)),
+        ('load_gif_animation/owl', lambda: (lambda: simple.load_gif_animation(simple.OWL_PATH, OWL_SCALE, flip_x=True)), n(10)),
+    ]
+    for count in OBJECT_COUNTS:
+        suite.append((f'get_objects_in_radius/{count}', lambda count=count: bench_radius(count), n(2000)))
+        suite.append((f'drum_repel/{count}', lambda count=count: bench_repel(count), n(2000)))
+        suite.append((f'objects_draw/{count}', lambda count=count: bench_objects_draw(count), n(500)))
+    for scroll in TRAIL_SCROLLS:
+        length = (screen_width // 2) // scroll
+        suite.append((f'trail_update_draw/{length}', lambda scroll=scroll: bench_trail(scroll), n(2000)))
+    suite.append(('plane_draw_tilt', bench_plane_draw, n(5000)))
+    for mode in ('fill_trail', 'parallax'):
+        suite.append((f'background/{mode}', lambda mode=mode: bench_background(mode), n(2000)))
+    for block_size in AUDIO_BLOCKS:
+        suite.append((f'audio_block/{block_size}', lambda block_size=block_size: bench_audio_block(block_size), n(3000)))
+    suite.append(('visualizer', bench_visualizer, n(3000)))
+    suite.append(('full_frame', bench_full_frame, n(1500)))
+    return suite
+
+
+def run_suite(name_filter=None, quick=False):
+    results = {}
+    for name, setup, iterations in build_suite(quick):
+        if name_filter and name_filter not in name:
+            continue
+        fn = setup()
+        results[name] = measure(fn, iterations, warmup=max(1, iterations // 10))
+        r = results[name]
+        print(f"{name:32s} p50 {r['p50_us']:10.1f} us   p99 {r['p99_us']:10.1f} us")
+    return results
+
+
+def compare(results, baseline, threshold, metric='p50_us'):
+    # 回傳退步的項目：(名稱, 基準值, 目前值, 比例)
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get('results', {}).get(name)
+        if base is None:
+            continue
+        ratio = current[metric] / base[metric] if base[metric] > 0 else 1.0
+        flag = 'REGRESSION' if ratio > 1.0 + threshold else ''
+        print(f"{name:32s} {base[metric]:10.1f} -> {current[metric]:10.1f} us  ({ratio:5.2f}x) {flag}")
+        if flag:
+            regressions.append((name, base[metric], current[metric], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless benchmarks for the game hot paths')
+    parser.add_argument('--out', help='write results as JSON to this path')
+    parser.add_argument('--compare', help='baseline JSON produced by an earlier --out run')
+    parser.add_argument('--threshold', type=float, default=0.15, help='allowed slowdown ratio before flagging (default 0.15)')
+    parser.add_argument('--metric', default='p50_us', help='metric used by --compare (default p50_us)')
+    parser.add_argument('--filter', help='only run benchmarks whose name contains this string')
+    parser.add_argument('--quick', action='store_true', help='fewer iterations, for smoke runs')
+    args = parser.parse_args()
+
+    results = run_suite(args.filter, args.quick)
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'pygame': pygame.version.ver,
+        },
+        'results': results,
+    }
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.metric)
+        if regressions:
+            print(f"{len(regressions)} regression(s) over {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from audio_engine import AudioEngine, NullSink, _CMD_NOTE
+from scheduler import NoteScheduler, LOOKAHEAD_SECONDS
+from simulation import GameSimulation, INPUT_UP, INPUT_DOWN
+
+
+"""
+量測主旋律 onset 相對遊戲時間的抖動：與 simple.main() 相同的固定步長迴圈，
+每幀加上隨機的繪圖負載 (偶爾一次長卡頓)，音訊由 NullSink 以實際時間拉出區塊。
+比較兩種送法：
+  frame      每幀處理完模擬後立即送出 (原本的做法，音符從下一個區塊開頭開始)
+  scheduled  NoteScheduler 以模擬時間排程到取樣時間 (look-ahead)
+抖動 = 相鄰兩個音實際間隔 (取樣) - 遊戲時間間隔。
+用法: python benchmarks/bench_scheduler.py [--seconds 10] [--load-ms 4 30] [--spike-ms 40]
+"""
+
+
+class OnsetLog(AudioEngine):
+    # 記錄每個主旋律音實際生效的取樣時間
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.onsets = []
+
+    def _apply(self, command, now):
+        if command[1] == _CMD_NOTE:
+            self.onsets.append(now)
+        super()._apply(command, now)
+
+
+def scripted_inputs(tick):
+    # 上下擺動，讓主旋律持續換音
+    return (INPUT_UP, 0, INPUT_DOWN, 0)[(tick // 20) % 4]
+
+
+def run(mode, seconds, load_ms, spike_ms, spike_every, block_size, lookahead, seed=0):
+    engine = OnsetLog(block_size=block_size)
+    sink = NullSink(engine).start()
+    scheduler = NoteScheduler(engine, lookahead=lookahead) if mode == 'scheduled' else None
+    sim = GameSimulation(seed=seed)
+    sim.music_mode = True  # 不會中途結束
+    sim.drain_events()
+    rng = random.Random(seed)
+    note_times = []
+    accumulator = 0.0
+    frame = 0
+    start = last = time.perf_counter()
+    while last - start < seconds:
+        frame_start = time.perf_counter()
+        accumulator += frame_start - last
+        last = frame_start
+        steps = min(int(accumulator / sim.dt), 5)
+        accumulator -= steps * sim.dt
+        notes = []
+        for _ in range(steps):
+            sim.step(scripted_inputs(sim.tick))
+            for name, value in sim.drain_events():
+                if name == 'note':
+                    note_times.append(sim.time)
+                    if scheduler is not None:
+                        scheduler.note_on(sim.time, value)
+                    else:
+                        notes.append(value)
+        for value in notes:
+            engine.note_on(value)
+        # 模擬繪圖負載，之後與 clock.tick(60) 一樣補足一幀
+        busy = rng.uniform(*load_ms)
+        if spike_every and frame % spike_every == spike_every - 1:
+            busy = spike_ms
+        time.sleep(busy / 1000.0)
+        remaining = 1.0 / 60.0 - (time.perf_counter() - frame_start)
+        if remaining > 0:
+            time.sleep(remaining)
+        frame += 1
+    time.sleep(lookahead + 2 * block_size / engine.sample_rate)  # 讓最後排程的音送出
+    sink.close()
+
+    count = min(len(note_times), len(engine.onsets))
+    onsets = np.asarray(engine.onsets[:count], dtype=np.float64)
+    ideal = np.asarray(note_times[:count]) * engine.sample_rate
+    jitter = np.abs(np.diff(onsets) - np.diff(ideal)) * 1000.0 / engine.sample_rate
+    result = {
+        'notes': count,
+        'frames': frame,
+        'jitter_p50_ms': float(np.percentile(jitter, 50)) if len(jitter) else 0.0,
+        'jitter_p99_ms': float(np.percentile(jitter, 99)) if len(jitter) else 0.0,
+        'jitter_max_ms': float(jitter.max()) if len(jitter) else 0.0,
+        'underruns': engine.underruns,
+    }
+    if scheduler is not None:
+        result.update(scheduler.stats())
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure note onset jitter against game time under render load')
+    parser.add_argument('--seconds', type=float, default=10.0, help='duration of each run')
+    parser.add_argument('--load-ms', type=float, nargs=2, default=(4.0, 30.0), help='random render cost per frame (min max)')
+    parser.add_argument('--spike-ms', type=float, default=40.0, help='render cost of an occasional long frame')
+    parser.add_argument('--spike-every', type=int, default=60, help='frames between long frames (0 disables)')
+    parser.add_argument('--block', type=int, default=256, help='audio block size')
+    parser.add_argument('--lookahead', type=float, default=LOOKAHEAD_SECONDS, help='look-ahead in seconds')
+    parser.add_argument('--mode', choices=('frame', 'scheduled', 'both'), default='both')
+    args = parser.parse_args()
+
+    modes = ('frame', 'scheduled') if args.mode == 'both' else (args.mode,)
+    for mode in modes:
+        result = run(mode, args.seconds, args.load_ms, args.spike_ms, args.spike_every, args.block, args.lookahead)
+        print(f"{mode:10s} notes {result['notes']:4d}  jitter p50 {result['jitter_p50_ms']:6.2f} ms  "
+              f"p99 {result['jitter_p99_ms']:6.2f} ms  max {result['jitter_max_ms']:6.2f} ms  underruns {result['underruns']}")
+        if mode == 'scheduled':
+            print(f"{'':10s} lead p50 {result['lead_p50_ms']:.1f} ms, min {result['lead_min_ms']:.1f} ms, "
+                  f"resyncs {result['resyncs']}, late {result['late']}, onset error max {result['onset_err_max_ms']:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from synth import WavetableSynth
+
+
+"""
+比較原本逐諧波 np.sin 的 generate_sound 與波表合成的速度。
+用法: python benchmarks/bench_synth.py [重複次數]
+"""
+
+# --- 原本 simple.py 的 generate_sound (不含 make_sound)，作為基準 ---
+def reference_generate(freq, duration=1.0, volume=0.2, sample_rate=44100, harmonics=7):
+    t = np.linspace(0, duration, int(sample_rate * duration), endpoint=False)
+    waveform = np.zeros_like(t)
+    for n in range(1, harmonics + 1):
+        partial = np.sin(2 * np.pi * freq * n * t)
+        waveform += (1.0 / n) * partial
+    max_amp = np.max(np.abs(waveform))
+    if max_amp > 0:
+        waveform /= max_amp
+    waveform = (waveform * 32767 * volume).astype(np.int16)
+    return np.column_stack([waveform, waveform])
+
+
+def best_of(fn, freqs, repeat):
+    # 取每輪的最佳時間，降低雜訊影響
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for f in freqs:
+            fn(f)
+        best = min(best, (time.perf_counter() - start) / len(freqs))
+    return best
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    # 與遊戲相同：C 大調、以 440Hz 為基準的上下三個八度
+    c_major = [0, 2, 4, 5, 7, 9, 11]
+    freqs = [440.0 * 2 ** ((c_major[d % 7] + (d // 7) * 12) / 12) for d in range(-21, 22)]
+
+    synth = WavetableSynth(44100)
+    for f in freqs:  # 波表只需建立一次，不計入每個音符的成本
+        synth.render(f, harmonics=6)
+
+    ref = best_of(lambda f: reference_generate(f, harmonics=6), freqs, repeat)
+    wt = best_of(lambda f: synth.render(f, harmonics=6), freqs, repeat)
+
+    print(f"reference generate_sound : {ref * 1e3:8.3f} ms/note")
+    print(f"wavetable render         : {wt * 1e3:8.3f} ms/note")
+    print(f"speedup                  : {ref / wt:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+import numpy as np
+
+from animation import AnimationSet
+from spatial import SpatialHashGrid
+
+
+"""
+飛行物件的 structure-of-arrays 儲存：所有鳥與貓頭鷹的座標、速度、種類、動畫相位
+都放在連續的 NumPy 陣列中，移動、移除、範圍偵測、計分與擊退都以整批陣列運算完成。
+陣列本身就是物件池：離開畫面或重置時的物件以 swap-and-pop 歸還，空出的位置直接給下一次生成，
+FlyingObject 只是指向某個索引的輕量視圖 (每個位置一個，建立後重複使用)。繪圖時由 animation.AnimationSet 一次查出
+所有物件的目前幀，再以一次 Surface.blits() 畫完。
+若指定 cell_size，會同時維護一個空間雜湊網格 (見 spatial.py)，範圍查詢只看鄰近格子。
+"""
+
+TYPE_BIRD = 0
+TYPE_OWL = 1
+TYPE_NAMES = ('bird', 'owl')
+TYPE_CODES = {name: code for code, name in enumerate(TYPE_NAMES)}
+
+
+class FlyingObject:
+    __slots__ = ('store', 'index')
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    @property
+    def x(self):
+        return int(self.store.x[self.index])
+
+    @property
+    def y(self):
+        return int(self.store.y[self.index])
+
+    @property
+    def speed(self):
+        return int(self.store.speed[self.index])
+
+    @property
+    def type_code(self):
+        return int(self.store.type_code[self.index])
+
+    @property
+    def type(self):
+        return TYPE_NAMES[self.type_code]
+
+    @property
+    def phase(self):
+        return float(self.store.phase[self.index])
+
+    @property
+    def anim(self):
+        return self.store.anims.get(self.type_code)
+
+    @property
+    def image(self):
+        return self.store.anims.frame(self.type_code, self.phase)
+
+    @property
+    def rect(self):
+        # 回傳目前位置的 (x, y, w, h) 快照 (這個模組不 import pygame)，修改它不會寫回儲存區
+        i = self.index
+        return (int(self.store.x[i]), int(self.store.y[i]), int(self.store.w[i]), int(self.store.h[i]))
+
+    def rect_into(self, rect):
+        # 寫入呼叫端重複使用的 pygame.Rect，不配置新物件
+        i = self.index
+        rect.update(int(self.store.x[i]), int(self.store.y[i]), int(self.store.w[i]), int(self.store.h[i]))
+        return rect
+
+    def move(self):
+        self.store.x[self.index] -= self.store.speed[self.index]
+
+    def draw(self, surface, camera_offset):
+        return surface.blit(self.image, (self.x, self.y - camera_offset))
+
+
+class EntityStore:
+    FIELDS = ('x', 'y', 'w', 'h', 'speed', 'type_code', 'phase')
+
+    def __init__(self, capacity=256, anims=None, cell_size=None):
+        # type_code -> 動畫 (animation.AnimationSet，時間由呼叫端每個 tick 更新)
+        self.anims = anims if anims is not None else AnimationSet()
+        self.count = 0
+        self.grid = SpatialHashGrid(cell_size, capacity) if cell_size else None
+        self._views = []   # 每個位置一個 FlyingObject，隨容量成長，之後不再配置
+        # 物件池統計：累計生成/歸還次數、同時存活的最大數量、容量擴充次數
+        self.spawned = 0
+        self.recycled = 0
+        self.peak = 0
+        self.grows = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        old_count = self.count
+        fields = {
+            'x': np.int64, 'y': np.int64, 'w': np.int64, 'h': np.int64,
+            'speed': np.int64, 'type_code': np.int8, 'phase': np.float64,
+        }
+        for name, dtype in fields.items():
+            new = np.zeros(capacity, dtype=dtype)
+            if old_count:
+                new[:old_count] = getattr(self, name)[:old_count]
+            setattr(self, name, new)
+        self._views.extend(FlyingObject(self, i) for i in range(len(self._views), capacity))
+        self.capacity = capacity
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self._views[:self.count])
+
+    def view(self, index):
+        return self._views[index]
+
+    # --- 物件池 ---
+    @property
+    def live(self):
+        return self.count
+
+    @property
+    def free(self):
+        return self.capacity - self.count
+
+    def reserve(self, capacity):
+        # 預先配置到指定容量 (例如壓力測試的物件數)，遊戲中就不必再擴充
+        if capacity > self.capacity:
+            self._allocate(capacity)
+
+    def stats(self):
+        return {
+            'live': self.live,
+            'free': self.free,
+            'capacity': self.capacity,
+            'peak': self.peak,
+            'spawned': self.spawned,
+            'recycled': self.recycled,
+            'grows': self.grows,
+        }
+
+    # --- 快照 (錄影關鍵幀用) ---
+    def snapshot(self):
+        n = self.count
+        return {name: getattr(self, name)[:n].copy() for name in self.FIELDS}
+
+    def restore(self, arrays):
+        n = len(arrays['x'])
+        self.reserve(n)
+        for name in self.FIELDS:
+            getattr(self, name)[:n] = arrays[name]
+        self.count = n
+        if self.grid is not None:
+            # 網格在每次移動後都與中心座標一致，依目前座標重建即可
+            self.grid.clear()
+            cx, cy = self.centers()
+            for i, (x, y) in enumerate(zip(cx.tolist(), cy.tolist())):
+                self.grid.insert(i, x, y)
+
+    def clear(self):
+        # 重置時所有物件一次歸還
+        self.recycled += self.count
+        self.count = 0
+        if self.grid is not None:
+            self.grid.clear()
+
+    def spawn(self, x, y, obj_size, speed=3, obj_type='bird', phase=0.0):
+        if self.count == self.capacity:
+            self._allocate(self.capacity * 2)
+            self.grows += 1
+        i = self.count
+        self.x[i] = x
+        self.y[i] = y
+        self.w[i] = obj_size[0]
+        self.h[i] = obj_size[1]
+        self.speed[i] = speed
+        self.type_code[i] = TYPE_CODES[obj_type] if isinstance(obj_type, str) else obj_type
+        self.phase[i] = phase
+        self.count += 1
+        self.spawned += 1
+        if self.count > self.peak:
+            self.peak = self.count
+        if self.grid is not None:
+            self.grid.insert(i, x + obj_size[0] // 2, y + obj_size[1] // 2)
+        return self._views[i]
+
+    def swap_remove(self, index):
+        # 把最後一個物件搬到 index 的位置 (O(1)，不保留順序)
+        last = self.count - 1
+        if index != last:
+            for name in self.FIELDS:
+                arr = getattr(self, name)
+                arr[index] = arr[last]
+        if self.grid is not None:
+            self.grid.swap_remove(index)
+        self.count = last
+        self.recycled += 1
+
+    # --- 每幀的批次運算 ---
+    def move(self):
+        n = self.count
+        self.x[:n] -= self.speed[:n]
+        if self.grid is not None:
+            self.grid.update(*self.centers())
+
+    def remove_offscreen(self):
+        # 與原本 rect.right < 0 的判斷相同；由大到小 swap-and-pop，搬過來的物件一定是保留的
+        n = self.count
+        gone = np.flatnonzero((self.x[:n] + self.w[:n]) < 0)
+        for i in gone[::-1].tolist():
+            self.swap_remove(i)
+        return len(gone)
+
+    def centers(self):
+        n = self.count
+        return self.x[:n] + self.w[:n] // 2, self.y[:n] + self.h[:n] // 2
+
+    def centers_of(self, indices):
+        return self.x[indices] + self.w[indices] // 2, self.y[indices] + self.h[indices] // 2
+
+    def query_radius(self, center, radius):
+        # 回傳距離 center 不超過 radius 的物件索引 (以平方距離比較，免去開根號)
+        if self.grid is not None:
+            return self.grid.query_radius(center, radius, self.centers_of)
+        cx, cy = self.centers()
+        dx = cx - center[0]
+        dy = cy - center[1]
+        return np.flatnonzero(dx * dx + dy * dy <= radius * radius)
+
+    def query_band(self, top, bottom):
+        # 中心 y 介於 [top, bottom] 的物件索引
+        if self.grid is not None:
+            return self.grid.query_band(top, bottom, self.centers_of)
+        _, cy = self.centers()
+        return np.flatnonzero((cy >= top) & (cy <= bottom))
+
+    def nearest(self, center, obj_type=None, max_radius=None):
+        # 回傳最近物件的索引 (可限定種類，例如 'owl')，找不到時回傳 None
+        if self.count == 0:
+            return None
+        mask = None
+        if obj_type is not None:
+            code = TYPE_CODES[obj_type] if isinstance(obj_type, str) else obj_type
+            mask = self.type_code[:self.count] == code
+        if self.grid is not None:
+            return self.grid.nearest(center, self.centers_of, mask=mask, max_radius=max_radius)
+        cx, cy = self.centers()
+        d2 = (cx - center[0]) ** 2 + (cy - center[1]) ** 2
+        if mask is not None:
+            d2 = np.where(mask, d2, np.iinfo(np.int64).max)
+        j = int(np.argmin(d2))
+        if mask is not None and not mask[j]:
+            return None
+        if max_radius is not None and d2[j] > max_radius * max_radius:
+            return None
+        return j
+
+    def type_counts(self, indices):
+        counts = np.bincount(self.type_code[indices], minlength=len(TYPE_NAMES))
+        return {TYPE_NAMES[code]: int(c) for code, c in enumerate(counts) if c}
+
+    def score_delta(self, indices, type_scores):
+        # type_scores: 依 type_code 排列的分數陣列
+        if len(indices) == 0:
+            return 0
+        return float(np.asarray(type_scores)[self.type_code[indices]].sum())
+
+    def repel(self, center, radius, force):
+        # 把半徑內的物件沿著「玩家→物件」方向推開 force 像素 (與原本逐物件運算相同，包含 int() 截斷)
+        # 先以 query_radius (可走網格) 取得半徑內的物件，再排除與玩家中心重合者
+        hit = self.query_radius(center, radius)
+        cx, cy = self.centers_of(hit)
+        dx = (cx - center[0]).astype(np.float64)
+        dy = (cy - center[1]).astype(np.float64)
+        distance = np.hypot(dx, dy)
+        moving = distance > 0
+        hit, dx, dy, distance = hit[moving], dx[moving], dy[moving], distance[moving]
+        if len(hit) == 0:
+            return hit
+        self.x[hit] += np.trunc(dx / distance * force).astype(np.int64)
+        self.y[hit] += np.trunc(dy / distance * force).astype(np.int64)
+        if self.grid is not None:
+            self.grid.update(self.x[hit] + self.w[hit] // 2, self.y[hit] + self.h[hit] // 2, hit)
+        return hit
+
+    def draw(self, surface, camera_offset, anims=None):
+        # 一次 blits() 畫完所有物件，回傳畫過的矩形 (已裁切到 surface)，供 dirty rect 使用
+        n = self.count
+        if n == 0:
+            return []
+        anims = self.anims if anims is None else anims
+        images = anims.frames_for(self.type_code[:n], self.phase[:n])
+        dests = zip(self.x[:n].tolist(), (self.y[:n] - camera_offset).tolist())
+        return surface.blits(zip(images, dests))
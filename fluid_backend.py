@@ -0,0 +1,283 @@
+import argparse
+import os
+import sys
+import threading
+import time
+
+from music import freq_to_midi
+from offline import load_score, write_audio
+
+
+"""
+FluidSynth 音訊後端 (main.py 與離線算譜共用)：不再寫死 Windows 的 DLL 路徑、.sf2 絕對路徑與 dsound 驅動。
+- SoundFont 預設找專案目錄下的 Star_Fox_64_GM.sf2 (再找目前目錄)；Windows 上 import 前先把
+  專案內附的 fluidsynth-2.4.8-win10-x64/bin 加進 DLL 搜尋路徑，其他平台用系統安裝的 libfluidsynth。
+- FluidBackend 只建立一個合成器、載入一次 SoundFont；同一份合成器可以接即時驅動 (start)，
+  也可以不開驅動，依事件時間以 get_samples 拉出取樣寫 WAV (render)，CPU 多快就寫多快。
+- 驅動：'auto' 依平台依序嘗試 PLATFORM_DRIVERS；'null' 不出聲，背景執行緒依實際時間拉出取樣後丟棄
+  (沒有音效卡的伺服器與測試用，合成器的負載與計時和真的驅動相同)。
+- 回報 SoundFont 載入時間，以及 null/離線算譜的速度 (音訊秒數 / 實際花費秒數)。
+- 提供 MidiDispatcher 需要的 noteon/noteoff/cc/program_select/delete；record=True 時記下實際送出的事件，
+  結束時可以用同一份已載入的 SoundFont 把這一局算成 WAV (bounce)。
+用法 (離線算譜，錄音格式見 offline.load_score):
+  python fluid_backend.py flight.json -o flight.wav [--soundfont path] [--program 0]
+"""
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+SOUNDFONT_NAME = 'Star_Fox_64_GM.sf2'
+WINDOWS_DLL_DIR = os.path.join(PROJECT_DIR, 'fluidsynth-2.4.8-win10-x64', 'bin')
+SAMPLE_RATE = 44100
+GAIN = 0.2
+BLOCK_SIZE = 1024               # null 驅動與離線算譜每次拉出的取樣數
+RENDER_TAIL = 1.0               # 最後一個事件之後多算幾秒，讓釋音結束
+DRUM_CHANNEL = 9                # GM 打擊樂頻道
+DRUM_BANK = 128
+DRUM_KEY = 36                   # GM 的大鼓
+MELODY_VELOCITY = 100           # 與 main.py 相同
+HARMONY_VELOCITY = 80
+DRUM_VELOCITY = 110
+
+# 依序嘗試；第一個成功建立的就用
+PLATFORM_DRIVERS = {
+    'win32': ('dsound', 'wasapi', 'waveout', 'sdl3', 'sdl2'),
+    'darwin': ('coreaudio', 'portaudio', 'sdl3', 'sdl2'),
+    'linux': ('pipewire', 'pulseaudio', 'alsa', 'jack', 'sdl3', 'sdl2', 'oss'),
+}
+
+
+def platform_drivers(platform=sys.platform):
+    if platform.startswith('win'):
+        return PLATFORM_DRIVERS['win32']
+    if platform == 'darwin':
+        return PLATFORM_DRIVERS['darwin']
+    return PLATFORM_DRIVERS['linux']
+
+def find_soundfont(path=None, name=SOUNDFONT_NAME):
+    # path 有給就只用 path；否則依序找專案目錄、目前目錄
+    candidates = [path] if path else [os.path.join(PROJECT_DIR, name), os.path.abspath(name)]
+    for candidate in candidates:
+        if os.path.isfile(candidate):
+            return candidate
+    raise FileNotFoundError(f"SoundFont not found (looked for {', '.join(candidates)})")
+
+def import_fluidsynth():
+    # pyfluidsynth 以 ctypes 載入 libfluidsynth；Windows 上先讓它找得到專案內附的 DLL
+    if sys.platform.startswith('win') and os.path.isdir(WINDOWS_DLL_DIR):
+        os.add_dll_directory(WINDOWS_DLL_DIR)
+        # ctypes.util.find_library 只看 PATH，不看 add_dll_directory
+        os.environ['PATH'] = WINDOWS_DLL_DIR + os.pathsep + os.environ.get('PATH', '')
+    import fluidsynth
+    return fluidsynth
+
+
+class FluidBackend:
+    def __init__(self, soundfont=None, sample_rate=SAMPLE_RATE, gain=GAIN, record=False, clock=time.perf_counter):
+        self.fluidsynth = import_fluidsynth()
+        self.sample_rate = sample_rate
+        self.clock = clock
+        self.soundfont = find_soundfont(soundfont)
+        start = clock()
+        self.synth = self.fluidsynth.Synth(gain=gain, samplerate=float(sample_rate))
+        self.sfid = self.synth.sfload(self.soundfont)
+        self.load_ms = (clock() - start) * 1000.0
+        if self.sfid == -1:
+            self.synth.delete()
+            raise RuntimeError(f"FluidSynth could not load {self.soundfont}")
+        self.driver = None              # 目前的驅動名稱；None 表示沒有即時輸出
+        self.take = [] if record else None  # [(秒, 方法名稱, 參數)]，實際送到合成器的事件
+        self._take_start = None
+        self._stop = threading.Event()
+        self._pump = None
+        self._deleted = False
+        # 統計 (null 驅動與離線算譜)
+        self.rendered_frames = 0
+        self.render_seconds = 0.0
+        self.underruns = 0
+
+    # --- 即時輸出 ---
+    def start(self, driver='auto'):
+        # 回傳實際使用的驅動名稱；全部失敗時拋出 RuntimeError
+        if self.driver is not None:
+            self.stop()
+        if driver == 'null':
+            self._stop.clear()
+            self._pump = threading.Thread(target=self._run_null, name='fluidsynth-null', daemon=True)
+            self._pump.start()
+            self.driver = 'null'
+            return self.driver
+        candidates = platform_drivers() if driver == 'auto' else (driver,)
+        synth = self.synth
+        for name in candidates:
+            # 只建立音訊驅動 (Synth.start 還會建立這裡用不到的 MIDI 驅動)；失敗時回傳 NULL
+            synth.setting('audio.driver', name)
+            handle = self.fluidsynth.new_fluid_audio_driver(synth.settings, synth.synth)
+            if handle:
+                synth.audio_driver = handle  # Synth.delete() 會一併刪除
+                self.driver = name
+                return name
+        raise RuntimeError(f"no FluidSynth audio driver could be started (tried {', '.join(candidates)})")
+
+    def stop(self):
+        if self._pump is not None:
+            self._stop.set()
+            self._pump.join()
+            self._pump = None
+        if self.synth.audio_driver:
+            self.fluidsynth.delete_fluid_audio_driver(self.synth.audio_driver)
+            self.synth.audio_driver = None
+        self.driver = None
+
+    def _run_null(self):
+        # 與 audio_engine.NullSink 相同：依實際時間拉出區塊後丟棄，落後超過一個區塊記為斷音
+        block_seconds = BLOCK_SIZE / self.sample_rate
+        deadline = self.clock()
+        while not self._stop.is_set():
+            start = self.clock()
+            self.synth.get_samples(BLOCK_SIZE)
+            self.render_seconds += self.clock() - start
+            self.rendered_frames += BLOCK_SIZE
+            deadline += block_seconds
+            delay = deadline - self.clock()
+            if delay > 0:
+                self._stop.wait(delay)
+            elif delay < -block_seconds:
+                self.underruns += 1
+                deadline = self.clock()
+
+    # --- MidiDispatcher 呼叫的合成器介面 (在分派執行緒上執行) ---
+    def _record(self, name, args):
+        now = self.clock()
+        if self._take_start is None:
+            self._take_start = now
+        self.take.append((now - self._take_start, name, args))
+
+    def noteon(self, chan, key, vel):
+        if self.take is not None:
+            self._record('noteon', (chan, key, vel))
+        return self.synth.noteon(chan, key, vel)
+
+    def noteoff(self, chan, key):
+        if self.take is not None:
+            self._record('noteoff', (chan, key))
+        return self.synth.noteoff(chan, key)
+
+    def cc(self, chan, ctrl, val):
+        if self.take is not None:
+            self._record('cc', (chan, ctrl, val))
+        return self.synth.cc(chan, ctrl, val)
+
+    def program_select(self, chan, sfid, bank, preset):
+        if self.take is not None:
+            self._record('program_select', (chan, sfid, bank, preset))
+        return self.synth.program_select(chan, sfid, bank, preset)
+
+    def delete(self):
+        if self._deleted:
+            return
+        self._deleted = True
+        self.stop()
+        self.synth.delete()
+
+    # --- 不開驅動的離線算譜 ---
+    def chunks(self, events, duration, block_size=BLOCK_SIZE):
+        # events：依時間排序的 [(秒, 方法名稱, 參數)]；事件之間以 get_samples 拉出 (n, 2) 的 int16 區塊
+        synth = self.synth
+        sample_rate = self.sample_rate
+        pos = 0
+        ends = [int(round(when * sample_rate)) for when, _, _ in events]
+        ends.append(int(round(duration * sample_rate)))
+        for i, end in enumerate(ends):
+            while pos < end:
+                n = min(block_size, end - pos)
+                yield synth.get_samples(n).reshape(-1, 2)
+                pos += n
+            if i < len(events):
+                _, name, args = events[i]
+                getattr(synth, name)(*args)
+
+    def render(self, events, path, duration=None, block_size=BLOCK_SIZE):
+        # 回傳 (音訊秒數, 實際花費秒數)；即時驅動必須先停掉，否則兩邊會搶同一個合成器的輸出
+        if self.driver is not None:
+            raise RuntimeError("stop the live audio driver before rendering offline")
+        if duration is None:
+            duration = (events[-1][0] if events else 0.0) + RENDER_TAIL
+        start = self.clock()
+        frames = write_audio(path, self.chunks(events, duration, block_size), self.sample_rate)
+        spent = self.clock() - start
+        self.rendered_frames += frames
+        self.render_seconds += spent
+        return frames / self.sample_rate, spent
+
+    def bounce(self, path):
+        # 把這一局實際送出的事件 (record=True) 用同一份已載入的 SoundFont 重新算成 WAV
+        self.stop()
+        self.synth.system_reset()
+        return self.render(list(self.take or ()), path)
+
+    # --- 統計 ---
+    def realtime_factor(self):
+        # 音訊秒數 / 實際花費秒數 (null 驅動與離線算譜)；> 1 表示比即時快
+        if not self.render_seconds:
+            return 0.0
+        return self.rendered_frames / self.sample_rate / self.render_seconds
+
+    def stats(self):
+        return {
+            'soundfont': self.soundfont,
+            'load_ms': self.load_ms,
+            'driver': self.driver,
+            'rendered_seconds': self.rendered_frames / self.sample_rate,
+            'render_cpu_seconds': self.render_seconds,
+            'realtime_factor': self.realtime_factor(),
+            'underruns': self.underruns,
+        }
+
+
+# --- 離線算譜：offline.Score -> MIDI 事件 ---
+def score_events(score, sfid, program=0):
+    # 主旋律與和聲在頻道 0 (與 main.py 相同)，鼓在 GM 打擊樂頻道；同一時間 note off 排在 note on 前面
+    events = [(0.0, 'program_select', (0, sfid, 0, program)),
+              (0.0, 'program_select', (DRUM_CHANNEL, sfid, DRUM_BANK, 0))]
+    previous = None
+    for when, freq in zip(score.melody_times.tolist(), score.melody_freqs.tolist()):
+        key = freq_to_midi(freq)
+        if previous is not None:
+            events.append((when, 'noteoff', (0, previous)))
+        events.append((when, 'noteon', (0, key, MELODY_VELOCITY)))
+        previous = key
+    if previous is not None:
+        events.append((score.duration, 'noteoff', (0, previous)))
+    for when, freq, length in zip(score.harmony_times.tolist(), score.harmony_freqs.tolist(),
+                                  score.harmony_durations.tolist()):
+        key = freq_to_midi(freq)
+        events.append((when, 'noteon', (0, key, HARMONY_VELOCITY)))
+        events.append((when + length, 'noteoff', (0, key)))
+    for when in score.drum_times.tolist():
+        events.append((when, 'noteon', (DRUM_CHANNEL, DRUM_KEY, DRUM_VELOCITY)))
+        events.append((when + 0.1, 'noteoff', (DRUM_CHANNEL, DRUM_KEY)))
+    order = {'program_select': 0, 'noteoff': 1, 'cc': 1, 'noteon': 2}
+    events.sort(key=lambda event: (event[0], order[event[1]]))
+    return events
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render a recorded flight through the FluidSynth SoundFont without an audio driver')
+    parser.add_argument('source', help='recording (.json/.csv, see offline.py)')
+    parser.add_argument('-o', '--out', required=True, help='output file (.wav, or .pcm/.raw for raw PCM)')
+    parser.add_argument('--soundfont', help=f'SoundFont path (default: {SOUNDFONT_NAME} in the project directory)')
+    parser.add_argument('--program', type=int, default=0, help='General MIDI program for melody and harmony')
+    parser.add_argument('--sample-rate', type=int, default=SAMPLE_RATE)
+    parser.add_argument('--seed', type=int, default=0, help='seed for harmony choices')
+    args = parser.parse_args()
+
+    backend = FluidBackend(args.soundfont, sample_rate=args.sample_rate)
+    print(f"SoundFont {backend.soundfont} loaded in {backend.load_ms:.0f} ms")
+    score = load_score(args.source, seed=args.seed)
+    seconds, spent = backend.render(score_events(score, backend.sfid, args.program), args.out,
+                                    score.duration + RENDER_TAIL)
+    backend.delete()
+    print(f"{args.source} -> {args.out}: {seconds:.1f} s audio in {spent:.2f} s ({seconds / max(spent, 1e-9):.0f}x realtime)")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
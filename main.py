@@ -1,11 +1,24 @@
+import argparse
 import pygame
 import sys
-import time
-import os
-os.add_dll_directory(r"D:\allen\side-project\musicplane\fluidsynth-2.4.8-win10-x64\bin")  # Windows 下需要指定 DLL 路徑
-import fluidsynth
-import numpy as np
 import random
+from fluid_backend import FluidBackend, SOUNDFONT_NAME
+from trail import MusicTrail
+from render import TrailRenderer
+from midi_dispatch import MidiDispatcher
+from music import PitchMap, A4_MIDI, HARMONY_VOICINGS, DEFAULT_VOICING
+from scheduler import BeatGrid
+from background import load_parallax
+
+# --- 命令列參數 ---
+parser = argparse.ArgumentParser(description='Procedural music plane game with FluidSynth output')
+parser.add_argument('--soundfont', help=f'SoundFont path (default: {SOUNDFONT_NAME} in the project directory)')
+parser.add_argument('--driver', default='auto',
+                    help="FluidSynth audio driver (default: auto, picked per platform); 'null' renders silently")
+parser.add_argument('--bounce', help='on exit, render the notes played this session to this WAV file')
+parser.add_argument('--voicing', default=DEFAULT_VOICING, choices=tuple(HARMONY_VOICINGS),
+                    help="harmony voicing: fixed +/-4 and 7 semitones (default) or in-key thirds/fifths ('diatonic')")
+args = parser.parse_args()
 
 # --- 初始化 Pygame ---
 pygame.init()
@@ -18,17 +31,18 @@ clock = pygame.time.Clock()
 pygame.font.init()
 font = pygame.font.SysFont('Consolas', 20)
 
-# --- 初始化 FluidSynth ---
-fs = fluidsynth.Synth()
-fs.start(driver="dsound")
-sfid = fs.sfload(r"D:\allen\side-project\musicplane\Star_Fox_64_GM.sf2")
-fs.program_select(0, sfid, 0, 0)  # channel 0, bank 0, preset 40 (小提琴)
-
-# --- 音樂相關函數 ---
-def freq_from_semitone(base, semitone):
-    return base * (2 ** (semitone / 12))
-
-base_freq = 440.0  # A4
+# --- 初始化 FluidSynth (fluid_backend.py：SoundFont 找專案目錄，驅動依平台選擇) ---
+fluid = FluidBackend(args.soundfont, record=args.bounce is not None)
+try:
+    fluid.start(args.driver)
+except RuntimeError as e:
+    print(f"WARNING: {e}; continuing without sound")
+    fluid.start('null')
+print(f"SoundFont {fluid.soundfont} loaded in {fluid.load_ms:.0f} ms, audio driver: {fluid.driver}")
+sfid = fluid.sfid
+# 所有 noteon/noteoff 交給分派執行緒，主迴圈只放事件，不會被合成器或驅動卡住
+midi = MidiDispatcher(fluid)
+midi.program_select(0, sfid, 0, 0)  # channel 0, bank 0, preset 40 (小提琴)
 
 # --- 飛機類別 ---
 class Plane:
@@ -57,8 +71,9 @@ class Plane:
 player = Plane(100, screen_height // 2)
 
 # --- 遊戲變數 ---
-music_line = []
-start_time = time.time()
+music_line = MusicTrail(scroll_per_frame=5)
+trail_renderer = TrailRenderer((screen_width, screen_height))
+background = load_parallax((screen_width, screen_height))  # 視差背景 (background.py)，取代每幀填黑
 center_x = screen_width // 2
 camera_offset = 0
 
@@ -72,25 +87,37 @@ energy_max = 100.0
 energy_increase_rate = 3.7
 energy_bar_height = 20
 
-# --- 背景和聲設定 ---
-C_major = [0, 2, 4, 5, 7, 9, 11]          # C 大調音階
+# --- 主旋律與背景和聲設定 (高度 -> 音符的查表與 simple.py 共用 music.py) ---
+# 拍點固定間隔、提前 look-ahead 排程 (scheduler.py)；MIDI 事件帶著拍點時間送出，不跟著畫面時間抖動
+pitch = PitchMap(center_y=screen_height // 2, voicing=args.voicing)
+note_interval = 0.1
+harmony_interval = 2.0
 harmony_duration = 2.0
-last_harmony_time = time.time()
+melody_beats = BeatGrid(note_interval, clock=midi.clock)
+harmony_beats = BeatGrid(harmony_interval, clock=midi.clock)
 harmony_notes_playing = []
 
-freq = 442 
+freq = 442
+midi_note = A4_MIDI
 
 # --- 主遊戲迴圈 ---
 while True:
-    screen.fill((0, 0, 0))
-
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
             if player.current_note is not None:
-                fs.noteoff(0, player.current_note)
+                midi.note_off(0, player.current_note)
             for note in harmony_notes_playing:
-                fs.noteoff(0, note)
-            fs.delete()
+                midi.note_off(0, note)
+            # 全部靜音後在分派執行緒上刪除合成器；要 bounce 時保留，用同一份 SoundFont 離線算成 WAV
+            midi.close(delete_synth=args.bounce is None)
+            print(f"MIDI dispatch: {midi.stats()}")
+            if args.bounce:
+                seconds, spent = fluid.bounce(args.bounce)
+                fluid.delete()
+                print(f"session bounced to {args.bounce}: {seconds:.1f} s audio in {spent:.2f} s "
+                      f"({seconds / max(spent, 1e-9):.0f}x realtime)")
+            print(f"fluidsynth: {fluid.stats()}")
+            print(f"beats missed: melody {melody_beats.missed}, harmony {harmony_beats.missed}")
             pygame.quit()
             sys.exit()
 
@@ -114,32 +141,28 @@ while True:
     camera_offset = player.rect.centery - screen_height // 2
 
     # --- 記錄軌跡與主旋律 ---
-    if time.time() - start_time > 0.1:
-        music_line.append([player.rect.centerx, player.rect.centery])
-        start_time = time.time()
+    for beat in melody_beats.due():
+        music_line.append(player.rect.centerx, player.rect.centery)
 
-        # 計算主旋律 (C 大調)
-        scale_degree = int((screen_height//2 - player.rect.centery) / 10)
-        offset_in_scale = C_major[scale_degree % len(C_major)] + (scale_degree // len(C_major)) * 12
-        freq = freq_from_semitone(base_freq, offset_in_scale)
-        midi_note = int(round(69 + 12 * np.log2(freq / 440.0)))
+        # 計算主旋律 (查表)
+        midi_note, freq = pitch.note_at(player.rect.centery)
 
-        # 播放主旋律
+        # 播放主旋律 (在拍點時間換音)
         if player.current_note is not None and player.current_note != midi_note:
-            fs.noteoff(0, player.current_note)
+            midi.note_off(0, player.current_note, at=beat)
         if player.current_note != midi_note:
-            fs.noteon(0, midi_note, 100)
+            midi.note_on(0, midi_note, 100, at=beat)
             player.current_note = midi_note
 
-    # 軌跡左移
-    for point in music_line:
-        point[0] -= 5
-    music_line = [p for p in music_line if p[0] > 0]
+    # 軌跡左移 (隱含在捲動量中)
+    music_line.advance()
 
-    # 畫軌跡
-    if len(music_line) > 1:
-        adjusted_points = [(p[0], p[1] - camera_offset) for p in music_line]
-        pygame.draw.lines(screen, (0, 255, 0), False, adjusted_points, 3)
+    # 畫背景 (蓋滿整個畫面，不必先填黑)
+    background.scroll_to(music_line.offset, camera_offset)
+    background.draw(screen)
+
+    # 畫軌跡 (只捲動畫布並補上最新線段)
+    trail_renderer.draw(screen, music_line, camera_offset)
 
     # 畫飛機
     player.draw(camera_offset)
@@ -153,43 +176,22 @@ while True:
     bar_width = int((energy / energy_max) * screen_width)
     pygame.draw.rect(screen, (255, 0, 0), (0, 0, bar_width, energy_bar_height))
 
-    midi_note = int(round(69 + 12 * np.log2(freq / 440.0)))
     current_freq = freq
 
-    text_surface = font.render(f"MIDI: {midi_note} | Freq: {current_freq:.1f} Hz", True, (255, 255, 255))
+    text_surface = font.render(f"MIDI: {midi_note} | Freq: {current_freq:.1f} Hz | queue {midi.depth} | latency p99 {midi.latency_ms(99):.1f} ms", True, (255, 255, 255))
     screen.blit(text_surface, (10, energy_bar_height + 5))  # 放在能量條下方 5px
 
-    # --- 和聲播放 ---
-    current_time = time.time()
-    if current_time - last_harmony_time >= 2.0:
-        # 關掉上一個和聲
-        for note in harmony_notes_playing:
-            fs.noteoff(0, note)
-        harmony_notes_playing = []
-
-        # 計算和聲音符
-        scale_degree = int((screen_height//2 - player.rect.centery) / 10)
-        offset_in_scale = C_major[scale_degree % len(C_major)] + (scale_degree // len(C_major)) * 12
-
-        # 上行或下行大三度/五度
+    # --- 和聲播放：每個拍點一個音，note off 直接排在 harmony_duration 之後 ---
+    for beat in harmony_beats.due():
+        # 上行或下行三度/五度 (依 --voicing)
         if player.rect.centery < screen_height//2:
-            harmony_offset = random.choice([4, 7])
+            harmony_offset = random.choice(pitch.harmony_above)
         else:
-            harmony_offset = random.choice([-4, -7])
-
-        freq_h = freq_from_semitone(base_freq, offset_in_scale + harmony_offset)
-        midi_note_h = int(round(69 + 12 * np.log2(freq_h / 440.0)))
-        fs.noteon(0, midi_note_h, 80)
-        harmony_notes_playing.append(midi_note_h)
-
-        last_harmony_time = current_time
-
-    # 停止播放超過 2 秒的和聲
-    if harmony_notes_playing:
-        if current_time - last_harmony_time >= harmony_duration:
-            for note in harmony_notes_playing:
-                fs.noteoff(0, note)
-            harmony_notes_playing = []
+            harmony_offset = random.choice(pitch.harmony_below)
+        midi_note_h = pitch.harmony_midi_at(player.rect.centery, harmony_offset)
+        midi.note_on(0, midi_note_h, 80, at=beat)
+        midi.note_off(0, midi_note_h, at=beat + harmony_duration)
+        harmony_notes_playing = [midi_note_h]
 
     pygame.display.update()
     clock.tick(60)
\ No newline at end of file
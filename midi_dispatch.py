@@ -0,0 +1,213 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+"""
+MIDI 事件分派執行緒：主迴圈只把帶時間戳的事件 (note on/off、換音色、全部靜音) 放進有上限的佇列，
+由專用的音訊控制執行緒依時間順序呼叫 FluidSynth，合成器或驅動卡住時不會拖慢畫面。
+- 時間戳可以是未來的時間 (例如和聲兩秒後的 note off)，到時間才送出。
+- 相同音高合併：還沒送出的 note on 又收到同音高的 note on 時只保留一個；
+  note on 還沒送出就收到同音高、立即生效的 note off 時，兩個一起取消 (這個音根本不會響)。
+- 背壓：佇列滿時 note on 最多等待 put_timeout 秒，仍然滿就丟棄並計數；
+  note off / 全部靜音 / 換音色永遠會放進佇列，避免音卡住。
+- 所有合成器呼叫 (包括結束時的 fs.delete()) 都在分派執行緒上執行。
+"""
+
+NOTE_ON = 'note_on'
+NOTE_OFF = 'note_off'
+PROGRAM = 'program'
+ALL_NOTES_OFF = 'all_notes_off'
+_STOP = 'stop'
+
+CC_ALL_NOTES_OFF = 123
+
+
+class MidiEvent:
+    __slots__ = ('when', 'kind', 'channel', 'data', 'enqueued', 'cancelled')
+
+    def __init__(self, when, kind, channel, data, enqueued):
+        self.when = when
+        self.kind = kind
+        self.channel = channel
+        self.data = data
+        self.enqueued = enqueued
+        self.cancelled = False
+
+
+class MidiDispatcher:
+    def __init__(self, synth, capacity=256, put_timeout=0.002, latency_window=512, clock=time.perf_counter):
+        self.synth = synth  # fluidsynth.Synth 或具有 noteon/noteoff/cc/program_select 的物件
+        self.capacity = capacity
+        self.put_timeout = put_timeout
+        self.clock = clock
+        self._heap = []                  # (when, 序號, MidiEvent)
+        self._seq = itertools.count()
+        self._pending_on = {}            # (channel, key) -> 還沒送出的 note on
+        self._depth = 0                  # 佇列中未取消的事件數
+        self._cond = threading.Condition()
+        self._latencies = deque(maxlen=latency_window)  # 實際送出時間 - 預定時間 (秒)
+        self._channels = set()
+        self.enqueued = 0
+        self.dispatched = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.blocked_time = 0.0          # 主迴圈因背壓等待的累計秒數
+        self.errors = 0
+        self.last_error = None
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, name='midi-dispatch', daemon=True)
+        self._thread.start()
+
+    # --- 主迴圈端 (只放事件) ---
+    def note_on(self, channel, key, velocity, at=None):
+        return self._put(NOTE_ON, channel, (key, velocity), at)
+
+    def note_off(self, channel, key, at=None):
+        return self._put(NOTE_OFF, channel, (key,), at)
+
+    def program_select(self, channel, sfid, bank, preset, at=None):
+        return self._put(PROGRAM, channel, (sfid, bank, preset), at)
+
+    def all_notes_off(self, channel=None, at=None):
+        # channel=None 時對所有用過的頻道送出
+        channels = sorted(self._channels) if channel is None else [channel]
+        for ch in channels:
+            self._put(ALL_NOTES_OFF, ch, (), at)
+
+    def _put(self, kind, channel, data, at):
+        now = self.clock()
+        when = now if at is None else at
+        with self._cond:
+            if self._closing:
+                return False
+            self._channels.add(channel)
+            if kind == NOTE_ON or kind == NOTE_OFF:
+                key = (channel, data[0])
+                pending = self._pending_on.get(key)
+                # 只合併「現在就該送出」的事件；排在未來的 note off (例如和聲結束) 照常排隊
+                if pending is not None and not pending.cancelled and pending.when <= when <= now:
+                    if kind == NOTE_ON:
+                        # 同音高的 note on 還在排隊：不必再排一次
+                        self.coalesced += 1
+                        return True
+                    # note on 還沒送出就要關掉：兩個都不送
+                    pending.cancelled = True
+                    del self._pending_on[key]
+                    self._depth -= 1
+                    self.coalesced += 2
+                    return True
+            if kind == NOTE_ON and self._depth >= self.capacity:
+                # 背壓：等分派執行緒消化，逾時就丟棄這個 note on
+                start = self.clock()
+                self._cond.wait_for(lambda: self._depth < self.capacity, timeout=self.put_timeout)
+                self.blocked_time += self.clock() - start
+                if self._depth >= self.capacity:
+                    self.dropped += 1
+                    return False
+            event = MidiEvent(when, kind, channel, data, now)
+            if kind == NOTE_ON:
+                self._pending_on[(channel, data[0])] = event
+            heapq.heappush(self._heap, (when, next(self._seq), event))
+            self._depth += 1
+            self.enqueued += 1
+            if self._depth > self.max_depth:
+                self.max_depth = self._depth
+            self._cond.notify_all()
+        return True
+
+    # --- 分派執行緒 ---
+    def _next_event(self):
+        with self._cond:
+            while True:
+                while self._heap and self._heap[0][2].cancelled:
+                    heapq.heappop(self._heap)
+                if self._heap:
+                    when, _, event = self._heap[0]
+                    delay = when - self.clock()
+                    if delay <= 0 or event.kind == _STOP:
+                        heapq.heappop(self._heap)
+                        if event.kind == NOTE_ON and self._pending_on.get((event.channel, event.data[0])) is event:
+                            del self._pending_on[(event.channel, event.data[0])]
+                        self._depth -= 1
+                        self._cond.notify_all()
+                        return event
+                    self._cond.wait(delay)
+                else:
+                    self._cond.wait()
+
+    def _dispatch(self, event):
+        synth = self.synth
+        kind = event.kind
+        if kind == NOTE_ON:
+            synth.noteon(event.channel, *event.data)
+        elif kind == NOTE_OFF:
+            synth.noteoff(event.channel, *event.data)
+        elif kind == PROGRAM:
+            synth.program_select(event.channel, *event.data)
+        elif kind == ALL_NOTES_OFF:
+            synth.cc(event.channel, CC_ALL_NOTES_OFF, 0)
+
+    def _run(self):
+        while True:
+            event = self._next_event()
+            if event.kind == _STOP:
+                break
+            try:
+                self._dispatch(event)
+            except Exception as e:
+                self.errors += 1
+                self.last_error = e
+            self._latencies.append(self.clock() - event.when)
+            self.dispatched += 1
+        if event.data[0]:
+            self.synth.delete()
+
+    # --- 統計與結束 ---
+    @property
+    def depth(self):
+        return self._depth
+
+    def latency_ms(self, q=50):
+        if not self._latencies:
+            return 0.0
+        return float(np.percentile(np.asarray(self._latencies), q)) * 1000.0
+
+    def stats(self):
+        return {
+            'depth': self._depth,
+            'max_depth': self.max_depth,
+            'enqueued': self.enqueued,
+            'dispatched': self.dispatched,
+            'coalesced': self.coalesced,
+            'dropped': self.dropped,
+            'blocked_ms': self.blocked_time * 1000.0,
+            'latency_p50_ms': self.latency_ms(50),
+            'latency_p99_ms': self.latency_ms(99),
+            'errors': self.errors,
+        }
+
+    def close(self, timeout=2.0, delete_synth=True):
+        # 先讓所有用過的頻道靜音，再停止執行緒；fs.delete() 也在分派執行緒上呼叫
+        if self._closing:
+            return
+        self.all_notes_off()
+        with self._cond:
+            self._closing = True
+            # 停止事件排在所有「已到期」事件之後；還沒到時間的排程事件直接放棄
+            now = self.clock()
+            for _, _, event in self._heap:
+                if event.when > now and not event.cancelled:
+                    event.cancelled = True
+                    self._depth -= 1
+            stop = MidiEvent(self.clock(), _STOP, None, (delete_synth,), self.clock())
+            heapq.heappush(self._heap, (stop.when, next(self._seq), stop))
+            self._depth += 1
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
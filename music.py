@@ -0,0 +1,172 @@
+import numpy as np
+
+
+"""
+共用的樂理查表：高度 (y) -> 音階級數 -> MIDI 音符 -> 頻率。
+建立 PitchMap 時一次算好「級數 -> MIDI」與「MIDI -> 頻率」兩張表，
+遊戲中每次取音只需整數運算與索引，不再做浮點次方或 log2。
+換調或換音階 (set_scale) 時重新產生整組表再一次換上，讀取端不會看到一半的表。
+和聲的配法 (voicing) 預設與原本相同，固定在主旋律上方 +4/+7、下方 -4/-7 個半音；
+voicing='diatonic' 時改以音階級數位移 (調內三度/五度) 查同一張表，換成小調或調式時和聲也跟著在調內。
+simple.py、main.py、offline.py 都用這個模組。
+"""
+
+SCALES = {
+    'major': (0, 2, 4, 5, 7, 9, 11),
+    'minor': (0, 2, 3, 5, 7, 8, 10),
+    'dorian': (0, 2, 3, 5, 7, 9, 10),
+    'phrygian': (0, 1, 3, 5, 7, 8, 10),
+    'lydian': (0, 2, 4, 6, 7, 9, 11),
+    'mixolydian': (0, 2, 4, 5, 7, 9, 10),
+    'harmonic_minor': (0, 2, 3, 5, 7, 8, 11),
+    'pentatonic': (0, 2, 4, 7, 9),
+    'minor_pentatonic': (0, 3, 5, 7, 10),
+    'blues': (0, 3, 5, 6, 7, 10),
+    'chromatic': tuple(range(12)),
+}
+NOTE_NAMES = ('C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B')
+
+A4_MIDI = 69
+A4_FREQ = 440.0
+DEFAULT_ROOT = A4_MIDI   # 原本的 base_freq = 440.0：第 0 級是 A4
+BAND_HEIGHT = 10         # 每 10 像素一個音階級數
+MIDI_MIN = 0
+MIDI_MAX = 127
+
+# 和聲：飛機在中線上方/下方時的位移 (中線以上往上加、以下往下減)
+THIRD = 2   # 調內三度/五度的音階級數 (大調第 0 級時分別是 +4、+7 個半音)
+FIFTH = 4
+HARMONY_VOICINGS = {
+    'semitones': ((4, 7), (-4, -7)),                      # 原本的做法：固定的半音數
+    'diatonic': ((THIRD, FIFTH), (-THIRD, -FIFTH)),       # 音階級數
+}
+DEFAULT_VOICING = 'semitones'
+
+# MIDI -> 頻率 (十二平均律)，所有 PitchMap 共用
+MIDI_FREQS = A4_FREQ * 2.0 ** ((np.arange(MIDI_MAX + 1) - A4_MIDI) / 12.0)
+_MIDI_FREQ_LIST = MIDI_FREQS.tolist()
+
+
+def midi_to_freq(midi):
+    return _MIDI_FREQ_LIST[min(max(int(midi), MIDI_MIN), MIDI_MAX)]
+
+def freq_to_midi(freq):
+    # 只給非熱點路徑使用 (例如外部輸入的頻率)；遊戲中請直接用查表得到的 MIDI
+    return int(round(A4_MIDI + 12 * np.log2(freq / A4_FREQ)))
+
+def note_name(midi):
+    return f"{NOTE_NAMES[midi % 12]}{midi // 12 - 1}"
+
+
+class PitchTables:
+    # 一組不可變的表；PitchMap 換調時整組替換
+    def __init__(self, intervals, root, center_y, band_height):
+        self.intervals = tuple(intervals)
+        self.root = root
+        steps = len(self.intervals)
+        # 級數範圍：涵蓋 MIDI 0..127 (超出時夾在兩端)
+        self.min_degree = -((root - MIDI_MIN) // 12 + 1) * steps
+        self.max_degree = ((MIDI_MAX - root) // 12 + 1) * steps
+        degrees = np.arange(self.min_degree, self.max_degree + 1)
+        scale = np.asarray(self.intervals)
+        midi = root + scale[degrees % steps] + (degrees // steps) * 12
+        self.degree_midi = np.clip(midi, MIDI_MIN, MIDI_MAX).astype(np.int64)
+        self.degree_freq = MIDI_FREQS[self.degree_midi]
+        self.midi_list = self.degree_midi.tolist()
+        self.freq_list = self.degree_freq.tolist()
+        # 以 y 直接索引的表：涵蓋所有級數的高度範圍，範圍外夾在兩端 (級數本來也會被夾住)
+        self.y_lo = center_y - (self.max_degree + 1) * band_height + 1
+        ys = np.arange(self.y_lo, center_y - (self.min_degree - 1) * band_height)
+        d = center_y - ys
+        y_degrees = np.clip(np.where(d >= 0, d // band_height, -(-d // band_height)), self.min_degree, self.max_degree)
+        self.y_last = len(ys) - 1
+        self.y_degree = y_degrees.tolist()
+        self.y_midi = self.degree_midi[y_degrees - self.min_degree].tolist()
+        self.y_freq = self.degree_freq[y_degrees - self.min_degree].tolist()
+
+
+class PitchMap:
+    def __init__(self, scale='major', root=DEFAULT_ROOT, center_y=300, band_height=BAND_HEIGHT, voicing=DEFAULT_VOICING):
+        self.center_y = center_y
+        self.band_height = band_height
+        self.set_scale(scale, root, voicing)
+
+    def set_scale(self, scale=None, root=None, voicing=None):
+        # scale 可以是 SCALES 的名稱或半音間隔序列；root 為第 0 級的 MIDI 音；voicing 見 HARMONY_VOICINGS
+        scale = self.scale if scale is None else scale
+        root = self.root if root is None else root
+        voicing = self.voicing if voicing is None else voicing
+        if voicing not in HARMONY_VOICINGS:
+            raise ValueError(f"unknown harmony voicing '{voicing}' (choose from {', '.join(HARMONY_VOICINGS)})")
+        if isinstance(scale, str):
+            if scale not in SCALES:
+                raise ValueError(f"unknown scale '{scale}' (choose from {', '.join(SCALES)})")
+            intervals = SCALES[scale]
+        else:
+            intervals = tuple(scale)
+        self.tables = PitchTables(intervals, int(root), self.center_y, self.band_height)
+        self.scale = scale
+        self.root = int(root)
+        self.voicing = voicing
+        self.harmony_above, self.harmony_below = HARMONY_VOICINGS[voicing]
+
+    def describe(self):
+        return {'scale': self.scale if isinstance(self.scale, str) else list(self.scale), 'root': self.root,
+                'voicing': self.voicing}
+
+    # --- 熱點：只有整數運算與索引 ---
+    def degree_at(self, y):
+        # 與原本 int((center_y - y) / 10) 相同 (往 0 截斷)
+        d = self.center_y - int(y)
+        band = self.band_height
+        return d // band if d >= 0 else -(-d // band)
+
+    def midi_for_degree(self, degree):
+        t = self.tables
+        return t.midi_list[min(max(degree, t.min_degree), t.max_degree) - t.min_degree]
+
+    def freq_for_degree(self, degree):
+        t = self.tables
+        return t.freq_list[min(max(degree, t.min_degree), t.max_degree) - t.min_degree]
+
+    def midi_at(self, y):
+        t = self.tables
+        i = int(y) - t.y_lo
+        return t.y_midi[0 if i < 0 else t.y_last if i > t.y_last else i]
+
+    def freq_at(self, y):
+        t = self.tables
+        i = int(y) - t.y_lo
+        return t.y_freq[0 if i < 0 else t.y_last if i > t.y_last else i]
+
+    def note_at(self, y):
+        # (MIDI, 頻率)，主旋律每次取音用
+        t = self.tables
+        i = int(y) - t.y_lo
+        i = 0 if i < 0 else t.y_last if i > t.y_last else i
+        return t.y_midi[i], t.y_freq[i]
+
+    def harmony_midi_at(self, y, offset):
+        # offset：harmony_above/harmony_below 其中一個 (半音數或音階級數，依 voicing)
+        if self.voicing == 'semitones':
+            return min(max(self.midi_at(y) + offset, MIDI_MIN), MIDI_MAX)
+        return self.midi_for_degree(self.degree_at(y) + offset)
+
+    # --- 整批 (離線算譜用) ---
+    def degrees_at(self, ys):
+        # ys 可以是浮點數 (錄下來的軌跡)，與 int((center_y - y) / band) 相同
+        return np.trunc((self.center_y - np.asarray(ys, dtype=np.float64)) / self.band_height).astype(np.int64)
+
+    def midi_for_degrees(self, degrees):
+        t = self.tables
+        return t.degree_midi[np.clip(degrees, t.min_degree, t.max_degree) - t.min_degree]
+
+    def freqs_for_degrees(self, degrees):
+        t = self.tables
+        return t.degree_freq[np.clip(degrees, t.min_degree, t.max_degree) - t.min_degree]
+
+    def harmony_midi_for_degrees(self, degrees, offsets):
+        # harmony_midi_at 的整批版本
+        if self.voicing == 'semitones':
+            return np.clip(self.midi_for_degrees(degrees) + offsets, MIDI_MIN, MIDI_MAX)
+        return self.midi_for_degrees(np.asarray(degrees) + offsets)
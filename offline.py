@@ -0,0 +1,274 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from synth import get_synth, NUM_OCTAVES, LOWEST_FREQ
+from music import PitchMap, A4_MIDI, MIDI_FREQS, DEFAULT_VOICING
+from simulation import NOTE_INTERVAL, screen_height
+
+
+"""
+離線算譜：把錄下來的飛行軌跡 (時間, 飛機 centery) 或音符序列，直接算成主旋律 + 和聲 + 鼓聲的音檔，
+不需要音效卡，也不必即時播放。
+- 軌跡轉音符的規則與遊戲相同：每 NOTE_INTERVAL 秒取樣一次高度，經 music.PitchMap 查表換成頻率；
+  和聲與 main.py 相同，每 2 秒一個音，在主旋律上方或下方加調內的三度/五度。
+- 合成全部是 NumPy 向量運算 (每個取樣點的頻率 -> 累加相位 -> 依八度查限頻波表)，
+  以固定長度的區塊產生並逐塊寫入 WAV 或 raw PCM，記憶體用量與曲長無關。
+- --batch 以 process pool 平行處理整個目錄的錄音。
+用法:
+  python offline.py flight.json -o flight.wav
+  python offline.py --batch recordings/ -o renders/ --workers 8
+"""
+
+SAMPLE_RATE = 44100
+CHUNK_SECONDS = 1.0
+HARMONY_INTERVAL = 2.0          # 與 main.py 相同：每 2 秒換一個和聲音
+HARMONY_DURATION = 2.0
+FADE_SECONDS = 0.005            # 和聲與鼓聲的起止淡入淡出，避免爆音
+MELODY_GAIN = 0.2
+HARMONY_GAIN = 0.12
+DRUM_GAIN = 0.5
+INPUT_SUFFIXES = ('.json', '.csv')
+
+
+# --- 譜：主旋律、和聲、鼓的時間與頻率 (全部是 NumPy 陣列) ---
+class Score:
+    def __init__(self, melody_times, melody_freqs, harmony_times=(), harmony_freqs=(), harmony_durations=(),
+                 drum_times=(), duration=None):
+        self.melody_times = np.asarray(melody_times, dtype=np.float64)
+        self.melody_freqs = np.asarray(melody_freqs, dtype=np.float64)
+        self.harmony_times = np.asarray(harmony_times, dtype=np.float64)
+        self.harmony_freqs = np.asarray(harmony_freqs, dtype=np.float64)
+        self.harmony_durations = np.broadcast_to(np.asarray(harmony_durations, dtype=np.float64),
+                                                 self.harmony_times.shape).copy()
+        self.drum_times = np.sort(np.asarray(drum_times, dtype=np.float64))
+        if duration is None:
+            ends = [0.0]
+            if len(self.melody_times):
+                ends.append(self.melody_times[-1] + NOTE_INTERVAL)
+            if len(self.harmony_times):
+                ends.append(float(np.max(self.harmony_times + self.harmony_durations)))
+            if len(self.drum_times):
+                ends.append(self.drum_times[-1] + 0.5)
+            duration = max(ends)
+        self.duration = float(duration)
+
+    @classmethod
+    def from_trajectory(cls, times, centery, drum_times=(), duration=None, seed=0, pitch=None):
+        # times/centery：飛機中心高度的取樣 (不必等間隔)；取樣之間視為維持前一個值
+        # pitch：music.PitchMap，預設與遊戲相同 (大調音階、第 0 級為 A4)
+        if pitch is None:
+            pitch = PitchMap(center_y=screen_height // 2)
+        times = np.asarray(times, dtype=np.float64)
+        centery = np.asarray(centery, dtype=np.float64)
+        if duration is None:
+            duration = float(times[-1]) if len(times) else 0.0
+        melody_times = np.arange(0.0, duration, NOTE_INTERVAL)
+        ys = _sample_hold(times, centery, melody_times)
+        freqs = pitch.freqs_for_degrees(pitch.degrees_at(ys))
+        # 相鄰相同的音合併成一個長音 (遊戲中音高沒變時也是持續播放)
+        keep = np.ones(len(freqs), dtype=bool)
+        keep[1:] = freqs[1:] != freqs[:-1]
+
+        harmony_times = np.arange(0.0, duration, HARMONY_INTERVAL)
+        hy = _sample_hold(times, centery, harmony_times)
+        rng = np.random.default_rng(seed)
+        pick = rng.integers(0, 2, size=len(harmony_times))
+        offsets = np.where(hy < screen_height // 2, np.take(pitch.harmony_above, pick), np.take(pitch.harmony_below, pick))
+        harmony_freqs = MIDI_FREQS[pitch.harmony_midi_for_degrees(pitch.degrees_at(hy), offsets)]
+        return cls(melody_times[keep], freqs[keep], harmony_times, harmony_freqs, HARMONY_DURATION,
+                   drum_times, duration)
+
+    @classmethod
+    def from_notes(cls, notes, harmony=(), drum_times=(), duration=None):
+        # notes: [(開始秒數, 頻率)]；harmony: [(開始秒數, 頻率, 長度)]
+        notes = np.asarray(notes, dtype=np.float64).reshape(-1, 2)
+        harmony = np.asarray(harmony, dtype=np.float64).reshape(-1, 3)
+        return cls(notes[:, 0], notes[:, 1], harmony[:, 0], harmony[:, 1], harmony[:, 2], drum_times, duration)
+
+
+def _sample_hold(times, values, at):
+    if len(times) == 0:
+        return np.full(len(at), screen_height // 2, dtype=np.float64)
+    i = np.clip(np.searchsorted(times, at, side='right') - 1, 0, len(times) - 1)
+    return values[i]
+
+
+# --- 讀取錄音 ---
+def load_score(path, seed=0):
+    # .json: {"trajectory": [[t, y], ...]} 或 {"notes": [[t, freq], ...], "harmony": [[t, freq, dur], ...]}，
+    #        另可有 "drums": [t, ...]、"duration"，以及軌跡用的 "scale"、"root" (見 music.SCALES) 與 "voicing" (見 music.HARMONY_VOICINGS)
+    # .csv:  每列 t,y (可有標題列)
+    if path.endswith('.csv'):
+        rows = []
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.reader(f):
+                try:
+                    rows.append((float(row[0]), float(row[1])))
+                except (ValueError, IndexError):
+                    continue
+        data = np.asarray(rows, dtype=np.float64).reshape(-1, 2)
+        return Score.from_trajectory(data[:, 0], data[:, 1], seed=seed)
+
+    with open(path, encoding='utf-8') as f:
+        doc = json.load(f)
+    drums = doc.get('drums', ())
+    duration = doc.get('duration')
+    if 'trajectory' in doc:
+        data = np.asarray(doc['trajectory'], dtype=np.float64).reshape(-1, 2)
+        pitch = PitchMap(doc.get('scale', 'major'), doc.get('root', A4_MIDI), center_y=screen_height // 2,
+                         voicing=doc.get('voicing', DEFAULT_VOICING))
+        return Score.from_trajectory(data[:, 0], data[:, 1], drums, duration, seed=doc.get('seed', seed), pitch=pitch)
+    if 'notes' in doc:
+        return Score.from_notes(doc['notes'], doc.get('harmony', ()), drums, duration)
+    raise ValueError(f"{path}: 需要 'trajectory' 或 'notes'")
+
+
+# --- 向量化合成 ---
+class OfflineRenderer:
+    def __init__(self, sample_rate=SAMPLE_RATE, chunk_seconds=CHUNK_SECONDS, harmonics=6, timbre='additive', seed=0):
+        self.sample_rate = sample_rate
+        self.chunk_size = max(1, int(sample_rate * chunk_seconds))
+        synth = get_synth(sample_rate)
+        # 每個八度一張限頻波表，疊成 (八度, 波表長度) 的二維陣列，一次 fancy index 查完
+        self.tables = np.stack([synth.table(timbre, harmonics, octave) for octave in range(NUM_OCTAVES)])
+        self.table_size = self.tables.shape[1]
+        drum = synth.render_drum(rng=np.random.default_rng(seed))
+        self.drum = drum[:, 0].astype(np.float32) / 32767.0
+        self.fade = max(1, int(sample_rate * FADE_SECONDS))
+
+    def _octaves(self, freqs):
+        octave = np.floor(np.log2(np.maximum(freqs, LOWEST_FREQ) / LOWEST_FREQ)).astype(np.int64)
+        return np.minimum(octave, NUM_OCTAVES - 1)
+
+    def _voice(self, t, starts, freqs, phase, ends=None):
+        # 依每個取樣點所在的音符取頻率，累加相位 (跨區塊連續)；ends 不為 None 時音符外靜音
+        seg = np.searchsorted(starts, t, side='right') - 1
+        active = seg >= 0
+        segc = np.maximum(seg, 0)
+        if ends is not None:
+            active &= t < ends[segc]
+        f = np.where(active, freqs[segc], 0.0)
+        cycles = np.cumsum(f / self.sample_rate) + phase
+        index = (cycles * self.table_size).astype(np.int64) & (self.table_size - 1)
+        wave = self.tables[self._octaves(f), index]
+        # 音符開頭與結尾 (或整段第一個音) 做短淡入淡出
+        since = (t - starts[segc]) * self.sample_rate
+        env = np.clip(since / self.fade, 0.0, 1.0)
+        if ends is not None:
+            env = np.minimum(env, np.clip((ends[segc] - t) * self.sample_rate / self.fade, 0.0, 1.0))
+        else:
+            env = np.where(seg == 0, env, 1.0)
+        wave = np.where(active, wave * env, 0.0)
+        return wave, float(cycles[-1] % 1.0) if len(cycles) else phase
+
+    def chunks(self, score):
+        sr = self.sample_rate
+        total = int(round(score.duration * sr))
+        melody_phase = 0.0
+        harmony_phase = 0.0
+        harmony_ends = score.harmony_times + score.harmony_durations
+        drum = self.drum
+        for start in range(0, total, self.chunk_size):
+            n = min(self.chunk_size, total - start)
+            t = (start + np.arange(n)) / sr
+            mix = np.zeros(n, dtype=np.float64)
+            if len(score.melody_times):
+                wave, melody_phase = self._voice(t, score.melody_times, score.melody_freqs, melody_phase)
+                mix += MELODY_GAIN * wave
+            if len(score.harmony_times):
+                wave, harmony_phase = self._voice(t, score.harmony_times, score.harmony_freqs, harmony_phase, harmony_ends)
+                mix += HARMONY_GAIN * wave
+            # 鼓：只處理與這個區塊重疊的幾次敲擊
+            first = np.searchsorted(score.drum_times, (start - len(drum)) / sr, side='right')
+            last = np.searchsorted(score.drum_times, (start + n) / sr, side='left')
+            for hit in score.drum_times[first:last].tolist():
+                offset = int(round(hit * sr)) - start
+                lo = max(0, offset)
+                hi = min(n, offset + len(drum))
+                if hi > lo:
+                    mix[lo:hi] += DRUM_GAIN * drum[lo - offset:hi - offset]
+            pcm = (np.clip(mix, -1.0, 1.0) * 32767).astype(np.int16)
+            yield np.repeat(pcm[:, None], 2, axis=1)
+
+
+# --- 輸出 ---
+def write_audio(path, chunks, sample_rate=SAMPLE_RATE):
+    # .wav 寫 WAV 標頭，其他副檔名 (.pcm/.raw) 寫 16-bit 小端序立體聲原始資料；回傳寫入的取樣數
+    frames = 0
+    if path.endswith('.wav'):
+        with wave.open(path, 'wb') as out:
+            out.setnchannels(2)
+            out.setsampwidth(2)
+            out.setframerate(sample_rate)
+            for chunk in chunks:
+                out.writeframesraw(chunk.astype('<i2', copy=False).tobytes())
+                frames += len(chunk)
+    else:
+        with open(path, 'wb') as out:
+            for chunk in chunks:
+                out.write(chunk.astype('<i2', copy=False).tobytes())
+                frames += len(chunk)
+    return frames
+
+def render_file(source, target, sample_rate=SAMPLE_RATE, seed=0):
+    # 回傳 (來源, 輸出, 音訊秒數, 實際花費秒數)；process pool 的工作單位，必須是模組層級函數
+    start = time.perf_counter()
+    score = load_score(source, seed=seed)
+    renderer = OfflineRenderer(sample_rate=sample_rate, seed=seed)
+    frames = write_audio(target, renderer.chunks(score), sample_rate)
+    return source, target, frames / sample_rate, time.perf_counter() - start
+
+def _render_job(job):
+    return render_file(*job)
+
+def render_directory(source_dir, target_dir, workers=None, fmt='wav', sample_rate=SAMPLE_RATE, seed=0, skip_existing=False):
+    os.makedirs(target_dir, exist_ok=True)
+    jobs = []
+    for name in sorted(os.listdir(source_dir)):
+        stem, suffix = os.path.splitext(name)
+        if suffix not in INPUT_SUFFIXES:
+            continue
+        target = os.path.join(target_dir, f"{stem}.{fmt}")
+        if skip_existing and os.path.exists(target):
+            continue
+        jobs.append((os.path.join(source_dir, name), target, sample_rate, seed))
+    if workers == 1:
+        return [_render_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_render_job, jobs, chunksize=max(1, len(jobs) // (4 * (workers or os.cpu_count() or 1)))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render recorded flights to audio files without a sound card')
+    parser.add_argument('source', help='recording (.json/.csv), or a directory with --batch')
+    parser.add_argument('-o', '--out', required=True, help='output file (.wav, or .pcm/.raw for raw PCM), or directory with --batch')
+    parser.add_argument('--batch', action='store_true', help='render every recording in the source directory')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes for --batch (default: all cores)')
+    parser.add_argument('--format', default='wav', choices=('wav', 'pcm', 'raw'), help='output format for --batch')
+    parser.add_argument('--sample-rate', type=int, default=SAMPLE_RATE)
+    parser.add_argument('--seed', type=int, default=0, help='seed for harmony choices and drum noise')
+    parser.add_argument('--skip-existing', action='store_true', help='with --batch, keep outputs that already exist')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.batch:
+        results = render_directory(args.source, args.out, args.workers, args.format, args.sample_rate, args.seed, args.skip_existing)
+    else:
+        results = [render_file(args.source, args.out, args.sample_rate, args.seed)]
+    wall = time.perf_counter() - start
+    audio = sum(r[2] for r in results)
+    for source, target, seconds, spent in results if len(results) <= 20 else ():
+        print(f"{source} -> {target}: {seconds:.1f} s audio in {spent:.2f} s ({seconds / max(spent, 1e-9):.0f}x realtime)")
+    print(f"{len(results)} file(s), {audio:.1f} s audio in {wall:.2f} s ({audio / max(wall, 1e-9):.0f}x realtime)")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
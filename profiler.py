@@ -0,0 +1,181 @@
+import json
+import time
+
+import numpy as np
+import pygame
+
+
+"""
+每幀分段計時器：主迴圈在每個階段結束時呼叫 lap(階段名稱)，
+以 perf_counter_ns 記錄各階段耗時，最近 capacity 幀存放在固定大小的環形緩衝區。
+可在畫面上顯示 (ProfilerOverlay)，也可匯出 Chrome trace / Perfetto 的 JSON。
+停用時 lap() 只做一次旗標判斷就返回。
+"""
+
+
+class FrameProfiler:
+    def __init__(self, phases, capacity=1024, enabled=False):
+        self.phases = tuple(phases)
+        self._phase_index = {name: i for i, name in enumerate(self.phases)}
+        self.capacity = capacity
+        n = len(self.phases)
+        self._durations = np.zeros((capacity, n), dtype=np.int64)  # 各階段耗時 (ns)
+        self._starts = np.zeros((capacity, n), dtype=np.int64)     # 各階段第一次開始的時間 (ns)
+        self._frame_starts = np.zeros(capacity, dtype=np.int64)
+        self._frame_totals = np.zeros(capacity, dtype=np.int64)
+        self._cur_durations = [0] * n
+        self._cur_starts = [0] * n
+        self.write_index = 0
+        self.frames = 0       # 累計記錄的幀數
+        self.enabled = enabled
+        self._active = False  # 這一幀是否正在記錄 (begin_frame 時才決定)
+        self._last = 0
+
+    def __len__(self):
+        return min(self.frames, self.capacity)
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        self._active = False
+
+    def toggle(self):
+        self.set_enabled(not self.enabled)
+        return self.enabled
+
+    def clear(self):
+        self.write_index = 0
+        self.frames = 0
+
+    # --- 記錄 ---
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        now = time.perf_counter_ns()
+        n = len(self.phases)
+        self._cur_durations = [0] * n
+        self._cur_starts = [0] * n
+        self._frame_start = now
+        self._last = now
+        self._active = True
+
+    def lap(self, phase):
+        # 把「上一次 lap 到現在」的時間算在 phase；同一階段一幀內可以出現多次，會累加
+        if not self._active:
+            return
+        now = time.perf_counter_ns()
+        i = self._phase_index[phase]
+        if not self._cur_starts[i]:
+            self._cur_starts[i] = self._last
+        self._cur_durations[i] += now - self._last
+        self._last = now
+
+    def end_frame(self):
+        if not self._active:
+            return
+        self._active = False
+        row = self.write_index
+        self._durations[row] = self._cur_durations
+        self._starts[row] = self._cur_starts
+        self._frame_starts[row] = self._frame_start
+        self._frame_totals[row] = self._last - self._frame_start
+        self.write_index = (row + 1) % self.capacity
+        self.frames += 1
+
+    # --- 統計 ---
+    def _order(self):
+        # 由舊到新的列索引
+        count = len(self)
+        if count < self.capacity:
+            return np.arange(count)
+        return (self.write_index + np.arange(self.capacity)) % self.capacity
+
+    def frame_times_ms(self):
+        return self._frame_totals[self._order()] / 1e6
+
+    def phase_times_ms(self, phase):
+        return self._durations[self._order(), self._phase_index[phase]] / 1e6
+
+    def percentile(self, q, phase=None):
+        values = self.frame_times_ms() if phase is None else self.phase_times_ms(phase)
+        return float(np.percentile(values, q)) if len(values) else 0.0
+
+    def histogram(self, phase=None, bins=20):
+        values = self.frame_times_ms() if phase is None else self.phase_times_ms(phase)
+        return np.histogram(values, bins=bins)
+
+    def top_phases(self, count=3):
+        # 依平均耗時排序：[(階段, 平均 ms, p99 ms), ...]
+        if not len(self):
+            return []
+        durations = self._durations[self._order()] / 1e6
+        means = durations.mean(axis=0)
+        p99 = np.percentile(durations, 99, axis=0)
+        order = np.argsort(means)[::-1][:count]
+        return [(self.phases[i], float(means[i]), float(p99[i])) for i in order]
+
+    def summary(self):
+        return {
+            'frames': len(self),
+            'frame_ms_mean': float(self.frame_times_ms().mean()) if len(self) else 0.0,
+            'frame_ms_p99': self.percentile(99),
+            'phases': {name: {'mean_ms': mean, 'p99_ms': p99} for name, mean, p99 in self.top_phases(len(self.phases))},
+        }
+
+    # --- 匯出 Chrome trace / Perfetto ---
+    def export_chrome_trace(self, path, pid=1, tid=1):
+        order = self._order()
+        if len(order) == 0:
+            origin = 0
+        else:
+            origin = int(self._frame_starts[order[0]])
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': 'musicplane'}}]
+        for row in order.tolist():
+            start = int(self._frame_starts[row])
+            events.append({'name': 'frame', 'ph': 'X', 'pid': pid, 'tid': tid,
+                           'ts': (start - origin) / 1000.0, 'dur': int(self._frame_totals[row]) / 1000.0})
+            for i, phase in enumerate(self.phases):
+                duration = int(self._durations[row, i])
+                if duration:
+                    events.append({'name': phase, 'ph': 'X', 'pid': pid, 'tid': tid,
+                                   'ts': (int(self._starts[row, i]) - origin) / 1000.0, 'dur': duration / 1000.0})
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        return len(events)
+
+
+class ProfilerOverlay:
+    def __init__(self, profiler, font, position, refresh_frames=15, color=(0, 255, 255), background=(0, 0, 0)):
+        self.profiler = profiler
+        self.font = font
+        self.position = position
+        self.refresh_frames = refresh_frames  # 每隔幾幀才重新產生文字，避免 overlay 本身變成負擔
+        self.color = color
+        self.background = background
+        self.surface = None
+        self._counter = 0
+
+    def _render(self):
+        prof = self.profiler
+        lines = [f"frame {prof.frame_times_ms()[-1]:5.2f} ms | p99 {prof.percentile(99):5.2f} ms"]
+        for name, mean, p99 in prof.top_phases(3):
+            lines.append(f"{name:16s} {mean:5.2f} ms (p99 {p99:5.2f})")
+        line_height = self.font.get_linesize()
+        width = max(self.font.size(line)[0] for line in lines) + 8
+        surface = pygame.Surface((width, line_height * len(lines) + 8)).convert()
+        surface.fill(self.background)
+        for i, line in enumerate(lines):
+            surface.blit(self.font.render(line, True, self.color), (4, 4 + i * line_height))
+        self.surface = surface
+
+    def draw(self, screen):
+        if not self.profiler.enabled or not len(self.profiler):
+            return None
+        if self.surface is None or self._counter % self.refresh_frames == 0:
+            self._render()
+        self._counter += 1
+        x, y = self.position
+        position = (x - self.surface.get_width(), y)
+        if hasattr(screen, 'blit_stream'):
+            # 貼圖後端 (texture_render.TextureScreen)：每次重新產生的 Surface 不進貼圖快取
+            return screen.blit_stream('profiler', self.surface, position)
+        return screen.blit(self.surface, position)
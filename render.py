@@ -0,0 +1,176 @@
+from collections import OrderedDict
+
+import pygame
+
+
+"""
+繪圖層：
+- DirtyRectRenderer 記錄每幀畫過的矩形，只把「上一幀 + 這一幀」的矩形交給 display.update，
+  下一幀開始時也只清除上一幀畫過的區域，而不是整個畫面。
+  背景可以是顏色，或是有 draw(screen, area=None)、moved 與 take_dirty() 的物件 (background.ParallaxBackground)：
+  背景移動時重畫並更新它回報的橫條 (只有移動的那幾層蓋到的範圍)，其他地方仍只清除上一幀的區域；
+  橫條蓋滿整個畫面時才整個畫面重畫。每個矩形都是背景的一次 draw (ParallaxBackground 從合成好的圖一次 blit)。
+- TextCache 以 (font, 字串, 顏色) 快取 font.render 的結果，超過上限時依 LRU 淘汰。
+- TrailRenderer 保留一張持續存在的軌跡畫布 (trail.MusicTrail)，每幀只捲動畫布並畫上最新的線段，
+  鏡頭垂直移動超出預留邊界時才整條重畫。
+"""
+
+
+class DirtyRectRenderer:
+    def __init__(self, screen, background=(0, 0, 0), merge_threshold=24, update=None):
+        # update：把矩形送上畫面的函數，預設 pygame.display.update (貼圖後端用 TextureScreen.update)
+        self.screen = screen
+        self.background = background
+        self.merge_threshold = merge_threshold  # 矩形太多時合併成一個外框，避免 update 變慢
+        self.update = update or pygame.display.update
+        self.screen_rect = screen.get_rect()
+        self._previous = []
+        self._current = []
+
+    def _merged(self, rects):
+        rects = [r for r in (self.screen_rect.clip(r) for r in rects) if r.w > 0 and r.h > 0]
+        if len(rects) > self.merge_threshold:
+            return [rects[0].unionall(rects[1:])]
+        return rects
+
+    def mark(self, rect):
+        if rect is not None:
+            self._current.append(pygame.Rect(rect))
+        return rect
+
+    def mark_all(self, rects):
+        self._current.extend(pygame.Rect(r) for r in rects)
+
+    def clear_previous(self):
+        # 只用背景蓋掉上一幀畫過的區域
+        background = self.background
+        if not hasattr(background, 'draw'):
+            for rect in self._merged(self._previous):
+                self.screen.fill(background, rect)
+        else:
+            if background.moved:
+                bands = [rect.clip(self.screen_rect) for rect in background.take_dirty()]
+                if bands[0].unionall(bands[1:]).contains(self.screen_rect):
+                    self.invalidate()
+                    return
+                # 捲動到的橫條整條重畫並送去更新；完全落在橫條內的舊矩形不必再清
+                for band in bands:
+                    background.draw(self.screen, band)
+                self._current.extend(bands)
+            else:
+                bands = ()
+            for rect in self._merged(self._previous):
+                if not any(band.contains(rect) for band in bands):
+                    background.draw(self.screen, rect)
+
+    def invalidate(self):
+        # 狀態切換 (例如進入或離開結束畫面) 或背景捲動時整個畫面重畫
+        if hasattr(self.background, 'draw'):
+            self.background.draw(self.screen)
+        else:
+            self.screen.fill(self.background)
+        self._current.append(self.screen_rect.copy())
+
+    def present(self):
+        rects = self._merged(self._previous + self._current)
+        if rects:
+            self.update(rects)
+        self._previous = self._current
+        self._current = []
+        return rects
+
+
+class TextCache:
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def render(self, font, text, color, antialias=True):
+        key = (font, text, tuple(color), antialias)
+        surface = self._entries.get(key)
+        if surface is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        self._entries[key] = surface
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return surface
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class TrailRenderer:
+    def __init__(self, size, color=(0, 255, 0), width=3, margin=200, colorkey=(0, 0, 0)):
+        self.size = size
+        self.color = color
+        self.width = width
+        self.margin = margin  # 畫布上下各多預留的像素，鏡頭在此範圍內移動不需重畫
+        self.colorkey = colorkey
+        self.surface = pygame.Surface((size[0], size[1] + 2 * margin)).convert()
+        self.surface.set_colorkey(colorkey)
+        self._top = None       # 畫布頂端對應的世界 y
+        self._frame = 0
+        self._appended = 0
+
+    def invalidate(self):
+        self._top = None
+
+    def _redraw(self, trail, camera_offset):
+        self._top = camera_offset - self.margin
+        self.surface.fill(self.colorkey)
+        if len(trail) > 1:
+            pts = trail.points()
+            pts[:, 1] -= self._top
+            pygame.draw.lines(self.surface, self.color, False, pts.tolist(), self.width)
+
+    def _update(self, trail):
+        shift = (trail.frame - self._frame) * trail.scroll_per_frame
+        if shift:
+            width, height = self.surface.get_size()
+            self.surface.scroll(-shift, 0)
+            self.surface.fill(self.colorkey, (width - shift, 0, shift, height))
+        new_points = trail.total_appended - self._appended
+        if new_points and len(trail) > 1:
+            # 只畫最新的線段 (與前一點相連)
+            pts = trail.points(last=new_points + 1)
+            pts[:, 1] -= self._top
+            pygame.draw.lines(self.surface, self.color, False, pts.tolist(), self.width)
+
+    def draw(self, screen, trail, camera_offset):
+        if (self._top is None
+                or trail.total_appended < self._appended
+                or trail.frame < self._frame
+                or abs(camera_offset - self.margin - self._top) > self.margin):
+            self._redraw(trail, camera_offset)
+        else:
+            self._update(trail)
+        self._frame = trail.frame
+        self._appended = trail.total_appended
+        # 只貼出軌跡外框內的區域，回傳的矩形可直接當作 dirty rect
+        rect = self.bounds(trail, camera_offset)
+        if rect is None:
+            return None
+        rect = rect.clip(screen.get_rect())
+        screen.blit(self.surface, rect.topleft, rect.move(0, camera_offset - self._top))
+        return rect
+
+    def bounds(self, trail, camera_offset):
+        # 軌跡在螢幕上的外框 (連到剛移除之點的線段會一路延伸到左邊界)
+        y_range = trail.y_range()
+        if y_range is None:
+            return None
+        pad = self.width
+        right = int(trail.points(last=1)[0, 0]) + pad
+        top = y_range[0] - camera_offset - pad
+        return pygame.Rect(0, top, max(right, 0), y_range[1] - y_range[0] + 2 * pad + 1)
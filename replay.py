@@ -0,0 +1,224 @@
+import argparse
+import bisect
+import io
+import json
+import struct
+import sys
+import time
+import zlib
+from array import array
+
+import numpy as np
+
+from simulation import GameSimulation, GAME_STATE
+
+
+"""
+輸入錄影與重播：模擬是以固定步長與可指定種子的亂數推進 (見 simulation.py)，
+所以只要記錄每個 tick 的輸入位元 (1 byte) 就能完整重現一局。
+檔案格式 (小端序)：
+  標頭   magic 'MPRC', 版本, 旗標 (bit0 = zlib 壓縮), 種子, dt, 關鍵幀間隔
+  區段   tag, 起始 tick, 原始長度, 儲存長度, 內容
+    'INPT'  從起始 tick 開始的輸入位元組 (uint8)
+    'KEYF'  該 tick 結束時的完整模擬狀態 (np.savez：meta 為 JSON，其餘為陣列)
+每隔 keyframe_interval 個 tick 寫一段輸入加一個關鍵幀，因此程式中途結束也只會少最後一段。
+重播跳到任意 tick 時，先還原之前最近的關鍵幀再往前模擬，最多只需模擬 keyframe_interval 步。
+用法:
+  python replay.py session.mprc                 # 以最快速度播完並顯示結果
+  python replay.py session.mprc --seek 3600     # 跳到第 3600 個 tick
+"""
+
+RECORD_MAGIC = b'MPRC'
+RECORD_VERSION = 1
+FLAG_ZLIB = 1
+HEADER = struct.Struct('<4sHHqdI')
+SECTION = struct.Struct('<4sIII')
+TAG_INPUTS = b'INPT'
+TAG_KEYFRAME = b'KEYF'
+KEYFRAME_INTERVAL = 600  # 60 tick/s 時每 10 秒一個關鍵幀
+
+
+# --- 關鍵幀編碼 ---
+def encode_keyframe(sim):
+    meta, arrays = sim.snapshot()
+    buffer = io.BytesIO()
+    meta_bytes = np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8)
+    np.savez(buffer, meta=meta_bytes, **arrays)
+    return buffer.getvalue()
+
+def decode_keyframe(data):
+    # allow_pickle=False：錄影檔可能來自其他機器，不執行任何 pickle
+    with np.load(io.BytesIO(data), allow_pickle=False) as npz:
+        arrays = {name: npz[name] for name in npz.files}
+    meta = json.loads(arrays.pop('meta').tobytes().decode('utf-8'))
+    return meta, arrays
+
+
+# --- 錄影 ---
+class InputRecorder:
+    def __init__(self, path, sim, keyframe_interval=KEYFRAME_INTERVAL, compress=True):
+        # 在 sim 開始 step 之前建立；之後每次 sim.step(inputs) 後呼叫 record(inputs)
+        self.sim = sim
+        self.keyframe_interval = keyframe_interval
+        self.compress = compress
+        self.inputs = array('B')
+        self._flushed = 0          # 已寫入檔案的輸入數
+        self._start_tick = sim.tick
+        self.bytes_written = 0
+        self._file = open(path, 'wb')
+        seed = sim.seed if sim.seed is not None else -1
+        self._write(HEADER.pack(RECORD_MAGIC, RECORD_VERSION, FLAG_ZLIB if compress else 0, seed, sim.dt, keyframe_interval))
+        self._write_section(TAG_KEYFRAME, sim.tick, encode_keyframe(sim))
+
+    def _write(self, data):
+        self._file.write(data)
+        self.bytes_written += len(data)
+
+    def _write_section(self, tag, tick, raw):
+        stored = zlib.compress(raw, 6) if self.compress else raw
+        self._write(SECTION.pack(tag, tick, len(raw), len(stored)))
+        self._write(stored)
+
+    def __len__(self):
+        return len(self.inputs)
+
+    def record(self, inputs):
+        self.inputs.append(inputs & 0xFF)
+        if len(self.inputs) - self._flushed >= self.keyframe_interval:
+            self.flush(keyframe=True)
+
+    def flush(self, keyframe=False):
+        if len(self.inputs) > self._flushed:
+            block = self.inputs[self._flushed:].tobytes()
+            self._write_section(TAG_INPUTS, self._start_tick + self._flushed, block)
+            self._flushed = len(self.inputs)
+        if keyframe:
+            self._write_section(TAG_KEYFRAME, self.sim.tick, encode_keyframe(self.sim))
+        self._file.flush()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+
+# --- 重播 ---
+class Replay:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, flags, seed, dt, interval = HEADER.unpack_from(data, 0)
+        if magic != RECORD_MAGIC or version != RECORD_VERSION:
+            raise ValueError(f"不是有效的錄影檔：{path}")
+        self.path = path
+        self.seed = None if seed < 0 else seed
+        self.dt = dt
+        self.keyframe_interval = interval
+        self._data = data
+        self._compressed = bool(flags & FLAG_ZLIB)
+        self.keyframe_ticks = []
+        self._keyframes = []       # 與 keyframe_ticks 對應的 (位置, 儲存長度)，需要時才解碼
+        blocks = []
+        pos = HEADER.size
+        while pos + SECTION.size <= len(data):
+            tag, tick, raw_size, stored_size = SECTION.unpack_from(data, pos)
+            pos += SECTION.size
+            if pos + stored_size > len(data):
+                break  # 寫到一半被中斷的最後一段
+            if tag == TAG_INPUTS:
+                blocks.append((tick, self._payload(pos, stored_size)))
+            elif tag == TAG_KEYFRAME:
+                self.keyframe_ticks.append(tick)
+                self._keyframes.append((pos, stored_size))
+            pos += stored_size
+        if not self.keyframe_ticks:
+            raise ValueError(f"錄影檔沒有起始關鍵幀：{path}")
+        self.start_tick = self.keyframe_ticks[0]
+        self.inputs = np.zeros(sum(len(b) for _, b in blocks), dtype=np.uint8)
+        for tick, block in blocks:
+            start = tick - self.start_tick
+            self.inputs[start:start + len(block)] = np.frombuffer(block, dtype=np.uint8)
+        # 最後一個關鍵幀之後若沒有輸入 (中斷)，不能跳到它之後
+        self.end_tick = self.start_tick + len(self.inputs)
+
+    def _payload(self, pos, size):
+        raw = self._data[pos:pos + size]
+        return zlib.decompress(raw) if self._compressed else raw
+
+    def __len__(self):
+        return len(self.inputs)
+
+    @property
+    def duration(self):
+        return len(self.inputs) * self.dt
+
+    def new_simulation(self):
+        sim = GameSimulation(seed=self.seed, dt=self.dt)
+        self.seek(sim, self.start_tick)
+        return sim
+
+    def restore_keyframe(self, sim, index):
+        pos, size = self._keyframes[index]
+        sim.restore(*decode_keyframe(self._payload(pos, size)))
+        return sim.tick
+
+    def input_at(self, tick):
+        # 第 tick+1 步 (讓 sim.tick 從 tick 變成 tick+1) 的輸入
+        return int(self.inputs[tick - self.start_tick])
+
+    def seek(self, sim, tick):
+        # 還原 tick 之前最近的關鍵幀，再往前模擬到 tick；事件在途中丟棄
+        tick = max(self.start_tick, min(tick, self.end_tick))
+        index = bisect.bisect_right(self.keyframe_ticks, tick) - 1
+        current = sim.tick
+        # 已經在目標之前、且比最近的關鍵幀更近時，直接往前模擬
+        if not (self.keyframe_ticks[index] <= current <= tick):
+            current = self.restore_keyframe(sim, index)
+        self.fast_forward(sim, tick - current)
+        sim.drain_events()
+        return sim.tick
+
+    def fast_forward(self, sim, ticks):
+        # 不繪圖、不播聲音，只推進模擬；回傳實際走了幾步
+        start = sim.tick - self.start_tick
+        stop = min(start + max(ticks, 0), len(self.inputs))
+        step = sim.step
+        for inputs in self.inputs[start:stop].tolist():
+            step(inputs)
+        return stop - start
+
+    def next_input(self, sim):
+        # 逐步播放時使用；錄影結束後回傳 None
+        if sim.tick >= self.end_tick:
+            return None
+        return self.input_at(sim.tick)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect or fast-forward a recorded session')
+    parser.add_argument('path', help='recording written by simple.py --record')
+    parser.add_argument('--seek', type=int, default=None, help='tick to seek to (default: end of recording)')
+    args = parser.parse_args()
+
+    replay = Replay(args.path)
+    print(f"{args.path}: {len(replay)} ticks ({replay.duration:.1f} s), seed {replay.seed}, "
+          f"{len(replay.keyframe_ticks)} keyframes every {replay.keyframe_interval} ticks")
+    sim = replay.new_simulation()
+    target = replay.end_tick if args.seek is None else args.seek
+    start = time.perf_counter()
+    replay.seek(sim, target)
+    spent = time.perf_counter() - start
+    states = {v: k for k, v in GAME_STATE.items()}
+    print(f"tick {sim.tick}: state {states[sim.state]}, energy {sim.energy:.2f}, time {sim.time:.2f} s, "
+          f"objects {len(sim.objects)}, trail {len(sim.trail)}")
+    print(f"seek took {spent * 1000:.1f} ms")
+    start = time.perf_counter()
+    sim = replay.new_simulation()
+    replay.fast_forward(sim, len(replay))
+    spent = time.perf_counter() - start
+    print(f"full replay: {len(replay)} ticks in {spent:.2f} s ({len(replay) * replay.dt / max(spent, 1e-9):.0f}x realtime)")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import math
+import time
+from collections import deque
+
+import numpy as np
+
+
+"""
+前瞻 (look-ahead) 音符排程：不再在畫面迴圈裡用「距離上次超過 0.1 秒」決定何時發聲
+(這樣音符會跟著畫面時間抖動最多一幀，畫面卡頓時還會漂移)。
+- NoteScheduler (simple.py)：模擬是固定步長，每個事件都有精確的遊戲時間；
+  把遊戲時間對應到 audio_engine 的取樣時鐘，並延後 look-ahead 秒送出，
+  混音器在指定的取樣開始發聲。只要畫面卡頓不超過 look-ahead，音符間隔就與遊戲時間完全一致。
+  遊戲時間與音訊時鐘差太多 (長時間卡頓、快轉、重新開始) 時重新對齊，並計數。
+- BeatGrid (main.py)：固定間隔的拍點，提前 look-ahead 秒交給 MIDI 分派執行緒，帶預定時間送出。
+統計：lead (排程時離發聲還有多久) 與 onset 誤差 (見 AudioEngine.stats / MidiDispatcher.stats)。
+"""
+
+LOOKAHEAD_SECONDS = 0.05        # 約 3 幀；能吸收這麼長的畫面卡頓
+RESYNC_SECONDS = 0.1            # 排程時間比 look-ahead 還遠這麼多時，重新對齊
+LEAD_WINDOW = 1024
+
+
+class NoteScheduler:
+    def __init__(self, engine, lookahead=LOOKAHEAD_SECONDS, resync=RESYNC_SECONDS):
+        self.engine = engine
+        self.sample_rate = engine.sample_rate
+        self.lookahead = int(lookahead * engine.sample_rate)
+        self.resync = int(resync * engine.sample_rate)
+        self.min_lead = engine.block_size  # 至少提前一個區塊，否則回呼可能已經算過那個時間
+        self._anchor_time = None        # 對齊點：遊戲時間 <-> 取樣時間
+        self._anchor_sample = 0
+        self.resyncs = 0
+        self._leads = deque(maxlen=LEAD_WINDOW)
+
+    def reset(self):
+        # 下一個事件重新對齊 (遊戲時間不連續時呼叫，例如重新開始、重播跳轉)
+        self._anchor_time = None
+
+    def sample_at(self, game_time):
+        now = self.engine.frame
+        if self._anchor_time is not None:
+            at = self._anchor_sample + int(round((game_time - self._anchor_time) * self.sample_rate))
+            lead = at - now
+            if self.min_lead <= lead <= self.lookahead + self.resync:
+                self._leads.append(lead)
+                return at
+            self.resyncs += 1
+        self._anchor_time = game_time
+        self._anchor_sample = now + self.lookahead
+        self._leads.append(self.lookahead)
+        return self._anchor_sample
+
+    # --- 以遊戲時間 (秒) 排程 ---
+    def note_on(self, game_time, freq):
+        self.engine.note_on(freq, at=self.sample_at(game_time))
+
+    def note_off(self, game_time):
+        self.engine.note_off(at=self.sample_at(game_time))
+
+    def harmony(self, game_time, freq, duration):
+        self.engine.harmony(freq, duration, at=self.sample_at(game_time))
+
+    def play(self, game_time, name, gain=1.0):
+        self.engine.play(name, gain, at=self.sample_at(game_time))
+
+    def stop_all(self):
+        self.engine.stop_all()
+        self.reset()
+
+    # --- 統計 ---
+    def lead_ms(self, q=50):
+        if not self._leads:
+            return 0.0
+        return float(np.percentile(np.asarray(self._leads), q)) * 1000.0 / self.sample_rate
+
+    def stats(self):
+        engine = self.engine
+        return {
+            'lookahead_ms': self.lookahead * 1000.0 / self.sample_rate,
+            'lead_p50_ms': self.lead_ms(50),
+            'lead_min_ms': self.lead_ms(0),
+            'resyncs': self.resyncs,
+            'scheduled': engine.scheduled,
+            'late': engine.late,
+            'onset_err_p99_ms': engine.onset_error_ms(99),
+            'onset_err_max_ms': engine.onset_error_ms(100),
+        }
+
+
+class BeatGrid:
+    # 固定間隔的拍點 (秒，與 clock 同一個時鐘)；拍點時間由起點累加，不會隨畫面時間漂移
+    def __init__(self, interval, lookahead=LOOKAHEAD_SECONDS, start=None, clock=time.perf_counter):
+        self.interval = interval
+        self.lookahead = lookahead
+        self.clock = clock
+        # 第一個拍點預設在 look-ahead 之後，才來得及提前排程
+        self.next = clock() + lookahead if start is None else start
+        self.missed = 0   # 卡頓超過 look-ahead 而來不及排程、直接跳過的拍點
+
+    def due(self, now=None):
+        # 回傳 now + lookahead 之前、還沒排程過的拍點
+        now = self.clock() if now is None else now
+        if self.next < now:
+            skip = math.ceil((now - self.next) / self.interval)
+            self.missed += skip
+            self.next += skip * self.interval
+        beats = []
+        while self.next <= now + self.lookahead:
+            beats.append(self.next)
+            self.next += self.interval
+        return beats
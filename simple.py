@@ -1,12 +1,30 @@
-import pygame
-import sys
 import time
-import numpy as np
+STARTUP_T0 = time.perf_counter()  # --startup-profile 的時間起點
+
+import os
 import random
-import pyganim
-from PIL import Image
-import os 
-import math
+import sys
+
+import pygame  # pygame 本身 (pygame.surfarray) 就會載入 NumPy，所以遊戲模組的 NumPy 不必延後 import
+PYGAME_IMPORTED = time.perf_counter()
+
+# 較重的模組 (audio_engine/sounddevice、synth、visualizer、replay、texture_render、assets、background)
+# 在用到的函數裡才 import，載入畫面不必等它們；耗時由 startup_profile.importing 記錄
+# simulation 定義了視窗大小與輸入位元，開視窗前就要用到，所以不延後
+from startup import StartupProfile, BackgroundLoader, LoadingScreen
+from animation import FrameAnimation, AnimationSet
+from tone_cache import ToneCache
+from music import midi_to_freq
+from entities import TYPE_BIRD, TYPE_OWL
+from sprites import RotatedSpriteCache
+from render import DirtyRectRenderer, TextCache, TrailRenderer
+from profiler import FrameProfiler, ProfilerOverlay
+from simulation import (
+    GameSimulation, GAME_STATE, energy_max, screen_width, screen_height,
+    BIRD_SCALE, OWL_SCALE,
+    INPUT_UP, INPUT_DOWN, INPUT_HOLD, INPUT_JUMP_UP, INPUT_JUMP_DOWN, INPUT_DRUM,
+    INPUT_MUSIC_MODE, INPUT_RESTART,
+)
 
 
 """
@@ -15,286 +33,271 @@ owl painter:https://pixabay.com/gifs/bird-hark-eagle-fly-flying-wings-15079/
 pake command: 
 exe小:nuitka --standalone --onefile --plugin-enable=pylint-warnings --output-dir=dist simple.py
 快速編譯/exe大:python -m nuitka --standalone --onefile --lto=no simple.py
+啟動時間：python simple.py --startup-profile  (含各個延後 import 的耗時)
+錄影/重播：python simple.py --record session.mprc / python simple.py --replay session.mprc
+換調：python simple.py --scale dorian --root 62  (音階名稱見 music.SCALES，root 為 MIDI 音)
+和聲：python simple.py --voicing diatonic  (預設 semitones：固定 ±4/±7 個半音；diatonic：調內三度/五度)
+音訊：python simple.py --audio stream|mixer|null|out.wav [--audio-block 256] [--lookahead 0.05]
+背景：預設為 image/background.jpg 的視差捲動背景 (background.py)；--no-background 時維持黑底
+繪圖後端：python simple.py --renderer surface|texture|software  (texture_render.py；software 為不需要 GPU 的 SDL 軟體 renderer)
+頻譜圖：左下角顯示實際播放聲音的頻譜圖 (visualizer.py)，F2 開關；--no-visualizer 時不建立
 """
 
-# --- 初始化 Pygame ---
-pygame.init()
-# 設置混音器參數，確保聲音品質
-pygame.mixer.init(frequency=44100, size=-16, channels=2) 
-screen_height = 600
-screen_width = 1100
-screen = pygame.display.set_mode((screen_width, screen_height))
-pygame.display.set_caption("Procedural Music Plane Game")
-clock = pygame.time.Clock()
-
-# --- 遊戲狀態 ---
-GAME_STATE = {
-    'RUNNING': 1,
-    'WIN': 2,
-    'LOSE': 3
-}
-current_game_state = GAME_STATE['RUNNING'] 
-
-# --- 遊戲常數 ---
-OWL_SCORE = -0.4
-BIRD_SCORE = 0.25
-WIN_SCORE = 500.0
-LOSE_SCORE = 0.0
-SPAWN_INTERVAL = 40 # 將生成間隔作為全域常數
-energy_max = 500.0
+# --- 啟動計時 (--startup-profile 時在第一幀畫完後印出) ---
+startup_profile = StartupProfile(STARTUP_T0, enabled='--startup-profile' in sys.argv)
+startup_profile.mark('import pygame', PYGAME_IMPORTED)
+startup_profile.mark('import game modules')
+
+def arg_value(flag, default=None):
+    # 取得 flag 後面的值；沒有給值時回傳 default
+    if flag not in sys.argv:
+        return None
+    i = sys.argv.index(flag)
+    if i + 1 < len(sys.argv) and not sys.argv[i + 1].startswith('--'):
+        return sys.argv[i + 1]
+    return default
+
+# --- 遊戲常數 (遊戲規則的常數在 simulation.py) ---
+PLANE_SMOOTH_ROTATION = False # True 時以 rotozoom 預先產生較平滑的傾斜圖
+MAX_STEPS_PER_FRAME = 5 # 畫面卡頓時最多補跑幾個模擬步，避免越補越慢
 energy_bar_height = 20
-
-# --- 初始化字體 ---
-pygame.font.init()
-font = pygame.font.SysFont('Consolas', 20)
-large_font = pygame.font.SysFont('Consolas', 48, bold=True)
-button_font = pygame.font.SysFont('Consolas', 30, bold=True)
+SAMPLE_RATE = 44100
+
+# --- 視窗與字體：先開視窗顯示載入畫面，其餘資源在背景載入 ---
+screen = None
+use_textures = False  # screen 是 texture_render.TextureScreen (貼圖後端)
+clock = None
+dirty = None
+font = None
+large_font = None
+button_font = None
+text_cache = TextCache(max_entries=256)
+
+def init_display():
+    global screen, clock, dirty, font, large_font, button_font, use_textures
+    pygame.display.init()
+    pygame.font.init()
+    backend = arg_value('--renderer') or 'surface'
+    if backend in ('texture', 'software'):
+        screen = open_texture_screen(accelerated=backend == 'texture')
+    use_textures = screen is not None
+    if use_textures:
+        dirty = DirtyRectRenderer(screen, background=(0, 0, 0), update=screen.update)
+    else:
+        screen = pygame.display.set_mode((screen_width, screen_height))
+        pygame.display.set_caption("Procedural Music Plane Game")
+        dirty = DirtyRectRenderer(screen, background=(0, 0, 0))
+    clock = pygame.time.Clock()
+    font = pygame.font.SysFont('Consolas', 20)
+    large_font = pygame.font.SysFont('Consolas', 48, bold=True)
+    button_font = pygame.font.SysFont('Consolas', 30, bold=True)
+
+def open_texture_screen(accelerated):
+    # Renderer/Texture 後端 (texture_render.py)；建立失敗時回傳 None，退回 Surface 繪圖
+    # 另開一個隱藏的 display surface，convert()/convert_alpha() 才有目標格式可用
+    with startup_profile.importing('texture_render'):
+        from texture_render import TextureScreen
+    try:
+        pygame.display.set_mode((1, 1), pygame.HIDDEN)
+        return TextureScreen((screen_width, screen_height), "Procedural Music Plane Game", accelerated=accelerated)
+    except pygame.error as e:
+        print(f"WARNING: texture renderer unavailable ({e}); falling back to surface drawing")
+        return None
+
+def preload_textures():
+    # 精靈、動畫幀與背景在開始前一次上傳成貼圖
+    surfaces = [plane_sprite.base_image]
+    for anim in OBJECT_ANIMS.animations.values():
+        surfaces.extend(anim.surfaces)
+    if parallax is not None:
+        surfaces.append(parallax.composed)
+    screen.preload(surfaces)
+
+# --- 音訊輸出：預設用串流混音器 (audio_engine.py)，沒有 sounddevice 或打不開輸出裝置時退回 pygame.mixer ---
+AUDIO_BLOCK_SIZE = 256
+audio = None       # AudioEngine；None 表示使用 pygame.mixer
+audio_sink = None
+note_scheduler = None  # 把模擬時間的事件排程到混音器的取樣時間 (scheduler.py)
+
+def init_audio(output=None):
+    # output：'stream'、'mixer'、'null' 或輸出檔路徑；None 時看 --audio
+    global audio, audio_sink, note_scheduler
+    output = output or arg_value('--audio')
+    if output != 'mixer':
+        with startup_profile.importing('audio_engine'):
+            from audio_engine import AudioEngine, open_output, stream_available
+            from scheduler import NoteScheduler, LOOKAHEAD_SECONDS
+        output = output or ('stream' if stream_available() else 'mixer')
+    if output != 'mixer':
+        engine = AudioEngine(SAMPLE_RATE, block_size=int(arg_value('--audio-block') or AUDIO_BLOCK_SIZE),
+                             harmonics=TONE_HARMONICS)
+        try:
+            audio_sink = open_output(engine, output)
+        except Exception as e:  # sounddevice.PortAudioError 等：有 PortAudio 但沒有可用的輸出裝置
+            if output != 'stream':
+                raise
+            print(f"WARNING: audio stream unavailable ({e}); falling back to pygame.mixer")
+        else:
+            audio = engine
+            note_scheduler = NoteScheduler(audio, lookahead=float(arg_value('--lookahead') or LOOKAHEAD_SECONDS))
+            return
+    # 設置混音器參數，確保聲音品質
+    pygame.mixer.init(frequency=SAMPLE_RATE, size=-16, channels=2)
+
+# --- 頻譜圖：串流混音器直接分接混音輸出，pygame.mixer 時改由目前的音色緩衝區餵入 ---
+VISUALIZER_MARGIN = 10
+visualizer = None    # Spectrogram；None 表示關閉
+loop_feeder = None
+show_visualizer = True
+
+def init_visualizer():
+    global visualizer, loop_feeder
+    if '--no-visualizer' in sys.argv:
+        return
+    with startup_profile.importing('visualizer'):
+        from visualizer import SampleTap, LoopFeeder, Spectrogram
+    tap = SampleTap()
+    if audio is not None:
+        audio.tap = tap
+    else:
+        loop_feeder = LoopFeeder(tap, SAMPLE_RATE)
+    visualizer = Spectrogram(tap, SAMPLE_RATE)
+
+def draw_visualizer():
+    if loop_feeder is not None:
+        loop_feeder.advance()
+    if visualizer.update() and use_textures:
+        # 內容改了：更新已上傳的同一張貼圖，不建立新的
+        screen.refresh(visualizer.surface, visualizer.surface.get_rect())
+    position = (VISUALIZER_MARGIN, screen_height - VISUALIZER_MARGIN - visualizer.size[1])
+    return visualizer.draw(screen, position)
 
 # --- 圖片與動畫設定 ---
+parallax = None  # ParallaxBackground；None 時背景為黑色
 BIRD_PATH = os.path.join('.', 'image', 'bird.gif')
 OWL_PATH = os.path.join('.', 'image', 'owl.gif')
-
-BIRD_SCALE = (100, 100)
-OWL_SCALE = (100, 100) 
 # -----------------------------
 
 # --- 載入 GIF 函數  ---
+def placeholder_animation(scale, color):
+    surface = pygame.Surface(scale, pygame.SRCALPHA)
+    surface.fill(color)
+    return FrameAnimation([(surface, 1000)])
+
 def load_gif_animation(path, new_scale, flip_x=False):
-    pil_img = Image.open(path)
-    frames = []
-    DEFAULT_DURATION_MS = 100 
+    # 解碼結果快取成圖集檔 (見 assets.py)，之後啟動直接 memory-map 讀取
+    with startup_profile.importing('assets'):
+        from assets import load_gif_frames
     try:
-        while True:
-            frame = pil_img.convert('RGBA')
-            mode = frame.mode
-            size = frame.size
-            data = frame.tobytes()
-            
-            pygame_image = pygame.image.fromstring(data, size, mode)
-            pygame_image = pygame.transform.scale(pygame_image, new_scale)
-            if flip_x:
-                pygame_image = pygame.transform.flip(pygame_image, True, False)
-            duration_ms = pil_img.info.get('duration', DEFAULT_DURATION_MS)
-            duration_int_ms = max(int(duration_ms), 10) 
-            frames.append((pygame_image, duration_int_ms))
-            pil_img.seek(pil_img.tell() + 1)
-    except EOFError:
-        pass
+        frames = load_gif_frames(path, new_scale, flip_x=flip_x)
     except Exception as e:
         print(f"載入 GIF 發生錯誤：{e}")
-        temp_surface = pygame.Surface(new_scale)
-        temp_surface.fill((255, 0, 255))
-        anim = pyganim.PygAnimation([(temp_surface, 1000)])
-        anim.play()
-        return anim
+        return placeholder_animation(new_scale, (255, 0, 255))
     if not frames:
         raise ValueError(f"無法從路徑 {path} 載入任何 GIF 幀。請確認檔案存在且非空。")
-    anim = pyganim.PygAnimation(frames)
-    anim.play()
-    return anim
-
-# --- 全域載入動畫 ---
-try:
-    BIRD_ANIM = load_gif_animation(BIRD_PATH, BIRD_SCALE, flip_x=False) 
-    OWL_ANIM = load_gif_animation(OWL_PATH, OWL_SCALE, flip_x=True) 
-except Exception as e:
-    print(f"警告：GIF 載入失敗，將使用預設佔位圖。錯誤: {e}")
-    # 提供一個基本的 PygAnimation 作為 fallback
-    TEMP_SURF_BIRD = pygame.Surface(BIRD_SCALE, pygame.SRCALPHA)
-    TEMP_SURF_BIRD.fill((0, 255, 255, 128))
-    BIRD_ANIM = pyganim.PygAnimation([(TEMP_SURF_BIRD, 1000)])
-    BIRD_ANIM.play()
-    
-    TEMP_SURF_OWL = pygame.Surface(OWL_SCALE, pygame.SRCALPHA)
-    TEMP_SURF_OWL.fill((255, 0, 255, 128))
-    OWL_ANIM = pyganim.PygAnimation([(TEMP_SURF_OWL, 1000)])
-    OWL_ANIM.play()
-# -----------------------------
-
-# --- 飛行物件類別 ---
-class FlyingObject:
-    def __init__(self, x, y, anim_obj, obj_size, speed=3, obj_type="unknown"): 
-        self.anim = anim_obj
-        self.rect = pygame.Rect(x, y, obj_size[0], obj_size[1]) 
-        self.speed = speed
-        self.type = obj_type 
+    return FrameAnimation(frames)
 
-    def move(self):
-        self.rect.x -= self.speed
+# --- 飛行物件動畫 (依 type_code 對應，背景載入時填入；時間跟著模擬時間走) ---
+OBJECT_ANIMS = AnimationSet()
 
-    def draw(self, surface, camera_offset):
-        self.anim.blit(surface, (self.rect.x, self.rect.y - camera_offset))
+def load_object_animation(type_code, path, scale, flip_x, fallback_color):
+    try:
+        anim = load_gif_animation(path, scale, flip_x=flip_x)
+    except Exception as e:
+        print(f"警告：GIF 載入失敗，將使用預設佔位圖。錯誤: {e}")
+        # 提供一個單色的佔位動畫作為 fallback
+        anim = placeholder_animation(scale, fallback_color)
+    OBJECT_ANIMS.add(type_code, anim)
+    return anim
 # -----------------------------
 
 
 # --- 音樂相關函數 ---
-def freq_from_semitone(base, semitone):
-    return base * (2 ** (semitone / 12))
-
-def generate_sound(freq, duration=1.0, volume=0.2, sample_rate=44100, harmonics=7):
-    t = np.linspace(0, duration, int(sample_rate * duration), endpoint=False)
-    waveform = np.zeros_like(t)
-    for n in range(1, harmonics + 1):  
-        partial = np.sin(2 * np.pi * freq * n * t)
-        waveform += (1.0 / n) * partial 
-    max_amp = np.max(np.abs(waveform))
-    if max_amp > 0:
-        waveform /= max_amp
-    waveform = (waveform * 32767 * volume).astype(np.int16)
-    stereo_waveform = np.column_stack([waveform, waveform])
+def load_synth(sample_rate):
+    # 合成器在背景載入 (鼓聲、音色) 第一次用到時才 import
+    with startup_profile.importing('synth'):
+        from synth import get_synth
+    return get_synth(sample_rate)
+
+def generate_sound(freq, duration=1.0, volume=0.2, sample_rate=SAMPLE_RATE, harmonics=7):
+    # 以波表合成取代逐諧波 np.sin 迴圈 (見 synth.py)
+    stereo_waveform = load_synth(sample_rate).render(freq, duration=duration, volume=volume, harmonics=harmonics)
     sound = pygame.sndarray.make_sound(stereo_waveform)
     sound.set_volume(volume)
     return sound
 
-def generate_drum(duration=0.5, sample_rate=44100):
-    t = np.linspace(0, duration, int(sample_rate * duration), False)
-    freq = 100
-    envelope = np.exp(-5 * t)
-    wave = np.sin(2 * np.pi * freq * t) * envelope
-    noise = (np.random.rand(len(t)) * 2 - 1) * 0.2 * envelope
-    wave += noise
-    audio = np.int16(wave * 32767)
-    stereo = np.column_stack((audio, audio))
+def generate_drum(duration=0.5, sample_rate=SAMPLE_RATE):
+    stereo = load_synth(sample_rate).render_drum(duration=duration)
     sound = pygame.sndarray.make_sound(stereo)
     return sound
 
-drum_sound = generate_drum()
-base_freq = 440.0 
+drum_sound = None
+
+def synthesize_drum():
+    global drum_sound
+    if audio is not None:
+        audio.add_sample('drum', load_synth(SAMPLE_RATE).render_drum())
+        return
+    drum_sound = generate_drum()
+
+# --- 音色快取 (LRU，避免每次換音高都重新合成) ---
+TONE_CACHE_MAX_BYTES = 16 * 1024 * 1024
+TONE_PREWARM_SPAN = 3  # 預熱飛機目前位置上下各幾個音階
+TONE_DURATION = 1.0
+TONE_HARMONICS = 6
+tone_cache = ToneCache(generate_sound, max_bytes=TONE_CACHE_MAX_BYTES)
+
+def prewarm_tones_near(centery, limit=None):
+    pitch = sim.pitch
+    scale_degree = pitch.degree_at(centery)
+    freqs = [pitch.freq_for_degree(scale_degree + d) for d in range(-TONE_PREWARM_SPAN, TONE_PREWARM_SPAN + 1)]
+    return tone_cache.prewarm(freqs, duration=TONE_DURATION, harmonics=TONE_HARMONICS, limit=limit)
+
+# --- 飛機圖片 (物理狀態在 simulation.Plane) ---
+def load_plane_image():
+    try:
+        image = pygame.image.load('./image/plane.png').convert_alpha()
+    except pygame.error:
+        print("WARNING: 'image/plane.png' not found. Using a square.")
+        image = pygame.Surface((100, 100), pygame.SRCALPHA)
+        image.fill((100, 100, 255, 180))
+    return pygame.transform.scale(image, (100, 100))
+
+class PlaneSprite:
+    def __init__(self, max_tilt):
+        self.base_image = load_plane_image()
+        # 預先產生所有傾斜角度的圖，draw 時只需查表；貼圖後端在貼上時旋轉，不需要
+        self.sprites = None
+        if not use_textures:
+            self.sprites = RotatedSpriteCache(self.base_image, max_tilt, smooth=PLANE_SMOOTH_ROTATION)
+
+    def draw(self, plane, camera_offset):
+        # 回傳畫過的矩形，供 dirty rect 使用
+        drawn = []
+        center = (plane.rect.centerx, plane.rect.centery - camera_offset)
+        if self.sprites is None:
+            if plane.show_radius:
+                drawn.append(screen.circle((255, 255, 255), center, plane.detection_radius, 1))
+            drawn.append(screen.blit_rotated(self.base_image, center, plane.tilt_angle))
+            return drawn
+        if plane.show_radius:
+            drawn.append(pygame.draw.circle(screen, (255, 255, 255), center, plane.detection_radius, 1))
+        drawn.append(self.sprites.blit(screen, plane.tilt_angle, center))
+        return drawn
 
-# --- 飛機類別 ---
-class Plane:
-    def __init__(self, x, y):
-        try:
-            self.image = pygame.image.load('./image/plane.png').convert_alpha()
-        except pygame.error:
-            print("WARNING: 'image/plane.png' not found. Using a square.")
-            self.image = pygame.Surface((100, 100), pygame.SRCALPHA)
-            self.image.fill((100, 100, 255, 180))
-
-        self.image = pygame.transform.scale(self.image, (100, 100))
-        self.base_image = self.image  
-        self.rect = self.image.get_rect()
-        self.rect.center = (x, y)
-        self.speed = 3
-        self.current_freq = None
-        self.current_sound = None
-        self.tilt_angle = 0  
-        self.paused = False 
-        self.max_tilt = 20
-        self.detection_radius = 85
-        self.show_radius = True 
-
-    def draw(self, camera_offset):
-        if self.show_radius:
-            radius_center_screen = (self.rect.centerx, self.rect.centery - camera_offset)
-            pygame.draw.circle(screen, (255, 255, 255), radius_center_screen, self.detection_radius, 1) 
-        
-        rotated_img = pygame.transform.rotate(self.base_image, self.tilt_angle)
-        new_rect = rotated_img.get_rect(center=(self.rect.centerx, self.rect.centery - camera_offset)) 
-        screen.blit(rotated_img, new_rect.topleft)
-
-    def move_vertical(self, direction):
-        if direction == 'up':
-            self.rect.y -= self.speed
-            self.tilt_angle = min(self.tilt_angle + 2, self.max_tilt)  
-        if direction == 'down':
-            self.rect.y += self.speed
-            self.tilt_angle = max(self.tilt_angle - 2, -self.max_tilt)  
-
-    def update_tilt(self):
-        if self.tilt_angle > 0:
-            self.tilt_angle = max(0, self.tilt_angle - 1)
-        elif self.tilt_angle < 0:
-            self.tilt_angle = min(0, self.tilt_angle + 1)
-
-    def move_to_center(self, center_x):
-        if self.rect.centerx < center_x:
-            self.rect.x += self.speed
-
-    def get_objects_in_radius(self, objects_list):
-        player_center_world = self.rect.center 
-        nearby_objects = []
-        
-        for obj in objects_list:
-            obj_center = obj.rect.center
-            distance = np.linalg.norm(np.array(player_center_world) - np.array(obj_center))
-            
-            if distance <= self.detection_radius:
-                nearby_objects.append(obj)
-                
-        type_counts = {}
-        delta_score = 0
-        for obj in nearby_objects:
-            obj_type = obj.type
-            type_counts[obj_type] = type_counts.get(obj_type, 0) + 1
-            
-            if obj_type == 'owl':
-                delta_score += OWL_SCORE 
-            elif obj_type == 'bird':
-                delta_score += BIRD_SCORE 
-                
-        return nearby_objects, type_counts, delta_score
-
-
-# --- 遊戲主流程變數初始化 ---
-center_x = screen_width // 2
-camera_offset = 0
-semitone_jump = 5
-energy_cost = 5.8
-energy_increase_rate = 2.6
-C_major = [0, 2, 4, 5, 7, 9, 11] 
-freq = 442
-elapsed_time_sec = 0.0 
-
-player = None
-flying_objects = []
-spawn_timer = 0
-music_line = []
-start_game_time = 0.0
-music_time_start = 0.0
-energy = 180.0
-current_delta_score = 0
-nearby_objects = []
-type_counts = {}
-
-music_mode = False
-
-# --- 遊戲初始化和重置函數 ---
-def reset_game():
-    global player, flying_objects, spawn_timer, music_line, start_game_time, music_time_start, energy, current_game_state, current_delta_score, nearby_objects, type_counts, elapsed_time_sec
-
-    # 停止所有正在播放的聲音
-    if player and player.current_sound:
-        player.current_sound.stop()
-    pygame.mixer.stop() 
-
-    # 重置遊戲狀態
-    current_game_state = GAME_STATE['RUNNING']
-
-    # 重置時間 
-    start_game_time = time.time()
-    music_time_start = time.time() # 專門用於音樂節拍的計時器
-    elapsed_time_sec = 0.0
-
-    # 重置飛機
-    player = Plane(100, screen_height // 2)
-    
-    # 重置物件和分數
-    flying_objects = []
-    spawn_timer = 0
-    music_line = []
-    energy = 200.0
-    current_delta_score = 0
-    nearby_objects = []
-    type_counts = {}
-    player.paused = False 
 
 # --- 終止畫面繪製函數 ---
-def draw_end_screen(state, time_taken=None):
+END_BUTTON_RECT = pygame.Rect((screen_width - 250) // 2, screen_height // 2 + 50, 250, 60)
+end_screen_cache = {}      # (state, time_text, hovered) -> 合成好的整張結束畫面
+end_screen_shown = None    # 目前畫面上顯示的結束畫面 key
+
+def compose_end_screen(state, time_text, hovered):
+    surface = pygame.Surface((screen_width, screen_height)).convert()
+    surface.fill((0, 0, 0))
     overlay = pygame.Surface((screen_width, screen_height))
     overlay.set_alpha(150)
     overlay.fill((0, 0, 0))
-    screen.blit(overlay, (0, 0))
+    surface.blit(overlay, (0, 0))
 
     if state == GAME_STATE['WIN']:
         text = "SUCCESS! Mission Accomplished"
@@ -305,248 +308,441 @@ def draw_end_screen(state, time_taken=None):
         
     title_surface = large_font.render(text, True, color)
     title_rect = title_surface.get_rect(center=(screen_width // 2, screen_height // 2 - 100))
-    screen.blit(title_surface, title_rect)
+    surface.blit(title_surface, title_rect)
     
-    if time_taken is not None:
-        minutes = int(time_taken // 60)
-        seconds = int(time_taken % 60)
-        time_text = f"Time: {minutes:02d}m {seconds:02d}s"
+    if time_text is not None:
         time_surface = font.render(time_text, True, (255, 255, 255))
         time_rect = time_surface.get_rect(center=(screen_width // 2, screen_height // 2 - 30))
-        screen.blit(time_surface, time_rect)
+        surface.blit(time_surface, time_rect)
 
     button_text = "RESTART (R)"
     button_color = (0, 150, 255)
     hover_color = (0, 200, 255)
+    current_color = hover_color if hovered else button_color
     
-    button_width = 250
-    button_height = 60
-    button_x = (screen_width - button_width) // 2
-    button_y = screen_height // 2 + 50
-    
-    button_rect = pygame.Rect(button_x, button_y, button_width, button_height)
-    
-    mouse_pos = pygame.mouse.get_pos()
-    current_color = hover_color if button_rect.collidepoint(mouse_pos) else button_color
-    
-    pygame.draw.rect(screen, current_color, button_rect, border_radius=10)
-    pygame.draw.rect(screen, (255, 255, 255), button_rect, 3, border_radius=10)
+    pygame.draw.rect(surface, current_color, END_BUTTON_RECT, border_radius=10)
+    pygame.draw.rect(surface, (255, 255, 255), END_BUTTON_RECT, 3, border_radius=10)
     
     text_surface = button_font.render(button_text, True, (255, 255, 255))
-    text_rect = text_surface.get_rect(center=button_rect.center)
-    screen.blit(text_surface, text_rect)
+    text_rect = text_surface.get_rect(center=END_BUTTON_RECT.center)
+    surface.blit(text_surface, text_rect)
+    return surface
+
+def draw_end_screen(state, time_taken=None):
+    # 結束畫面是靜態的：只合成一次，之後只有滑鼠移入/移出按鈕時才換圖
+    global end_screen_shown
+    time_text = None
+    if time_taken is not None:
+        minutes = int(time_taken // 60)
+        seconds = int(time_taken % 60)
+        time_text = f"Time: {minutes:02d}m {seconds:02d}s"
+    hovered = END_BUTTON_RECT.collidepoint(pygame.mouse.get_pos())
+
+    key = (state, time_text, hovered)
+    if key != end_screen_shown:
+        if key not in end_screen_cache:
+            end_screen_cache[key] = compose_end_screen(state, time_text, hovered)
+        dirty.mark(screen.blit(end_screen_cache[key], (0, 0)))
+        end_screen_shown = key
     
-    return button_rect
+    return END_BUTTON_RECT
+
+# --- 每幀分段計時 (F2 開關頻譜圖，F3 開關 overlay，F4 匯出 Chrome trace；--profile 啟動時即開啟) ---
+FRAME_PHASES = (
+    'input', 'movement', 'spawn_update', 'energy', 'music_detection', 'win_lose', 'music_update', 'trail',
+    'audio', 'background', 'objects_draw', 'trail_draw', 'plane_draw', 'hud', 'visualizer', 'present',
+)
+profiler = FrameProfiler(FRAME_PHASES, capacity=1024, enabled='--profile' in sys.argv)
+profiler_overlay = None  # 需要字體，視窗開好後才建立
+
+def export_trace():
+    path = time.strftime('trace-%Y%m%d-%H%M%S.json')
+    profiler.export_chrome_trace(path)
+    print(f"profiler trace written to {path}")
+    print(f"object pool: {sim.objects.stats()}")
+
+# --- 模擬與繪圖/音訊 ---
+# --- 錄影與重播 (--record 路徑 / --replay 路徑) ---
+REPLAY_SEEK_TICKS = 600   # 重播時 ←/→ 跳 10 秒
+REPLAY_FAST_STEPS = 8     # 重播時 F 切換快轉，每幀跑幾步
+
+record_path = arg_value('--record', time.strftime('session-%Y%m%d-%H%M%S.mprc'))
+replay_path = arg_value('--replay')
+recorder = None
+replay = None
+replay_fast = False
+
+sim = GameSimulation(seed=int.from_bytes(os.urandom(4), 'little'))
+sim.profiler = profiler
+if '--scale' in sys.argv or '--root' in sys.argv or '--voicing' in sys.argv:
+    # 重播時由關鍵幀還原錄影當時的調性
+    sim.pitch.set_scale(arg_value('--scale'), arg_value('--root') and int(arg_value('--root')), arg_value('--voicing'))
+plane_sprite = None
+trail_renderer = None
+current_sound = None
+drawn_game_state = None
+restart_button_rect = None
+
+def quit_game():
+    if current_sound:
+        current_sound.stop()
+    if use_textures:
+        print(f"textures: {screen.stats()}")
+    if audio_sink is not None:
+        audio_sink.close()
+        print(f"audio: {audio.stats()}")
+        print(f"note scheduling: {note_scheduler.stats()}")
+    if recorder is not None:
+        recorder.close()
+        print(f"session recorded to {record_path} ({len(recorder)} ticks, {recorder.bytes_written} bytes)")
+    pygame.quit()
+    sys.exit()
+
+# --- 輸入：事件轉成單次觸發的位元，按鍵狀態轉成持續位元 ---
+KEYDOWN_INPUTS = {
+    pygame.K_w: INPUT_JUMP_UP,
+    pygame.K_s: INPUT_JUMP_DOWN,
+    pygame.K_d: INPUT_DRUM,
+    pygame.K_p: INPUT_MUSIC_MODE,
+}
 
-# --- 啟動遊戲 (第一次初始化) ---
-reset_game() 
+# 貼圖後端另有一個隱藏視窗，關掉遊戲視窗時 SDL 不一定會送 QUIT
+QUIT_EVENTS = (pygame.QUIT, pygame.WINDOWCLOSE)
 
-# --- 主遊戲迴圈 ---
-while True:
-    if music_mode:
-        WIN_SCORE = math.inf
-        energy += 350
-    
-    # --- 事件處理 ---
+def poll_inputs():
+    global show_visualizer
+    triggered = 0
+    running = sim.state == GAME_STATE['RUNNING']
     for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            if player and player.current_sound:
-                player.current_sound.stop()
-            pygame.quit()
-            sys.exit()
-
-        if current_game_state == GAME_STATE['RUNNING']:
+        if event.type in QUIT_EVENTS:
+            quit_game()
+
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_F2:
+            show_visualizer = not show_visualizer
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+            profiler.toggle()
+            dirty.invalidate()
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+            export_trace()
+        if replay is not None and event.type == pygame.KEYDOWN:
+            handle_replay_key(event.key)
+
+        if running:
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
-                    if player and player.current_sound:
-                        player.current_sound.stop()
-                    pygame.quit()
-                    sys.exit()
-                
-                # ... 快速跳躍邏輯 ...
-                if event.key == pygame.K_w and energy >= energy_cost:
-                    player.rect.y -= semitone_jump * 10
-                    player.tilt_angle = player.max_tilt 
-                    energy -= energy_cost
-                
-                if event.key == pygame.K_s and energy >= energy_cost:
-                    player.rect.y += semitone_jump * 10
-                    player.tilt_angle = -player.max_tilt 
-                    energy -= energy_cost
-                
-                if event.key == pygame.K_d:  
-                    drum_sound.play()
-
-                    # 擊退範圍
-                    repel_radius =  95 
-                    repel_force = 35    # 擊退的強度（越大推得越遠）
-
-                    player_center = np.array(player.rect.center)
-
-                    for obj in flying_objects:
-                        obj_center = np.array(obj.rect.center)
-                        distance = np.linalg.norm(player_center - obj_center)
-
-                        if distance <= repel_radius and distance > 0:
-                            # 計算方向（從玩家到物件的向量，反轉成擊退方向）
-                            direction = (obj_center - player_center) / distance
-                            # 給予擊退效果（直接位移，或是你也可以給 obj.speed 做暫時加速）
-                            obj.rect.x += int(direction[0] * repel_force)
-                            obj.rect.y += int(direction[1] * repel_force)
-
-                if event.key == pygame.K_p:
-                    music_mode = True
-        
-        elif current_game_state in [GAME_STATE['WIN'], GAME_STATE['LOSE']]:
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                if event.button == 1: 
-                    # 檢查按鈕點擊
-                    if 'restart_button_rect' in locals() and restart_button_rect.collidepoint(event.pos):
-                        reset_game()
-            if event.type == pygame.KEYDOWN and event.key == pygame.K_r: 
-                 reset_game()
-
-
-    # --- 遊戲邏輯與繪圖 ---
-    screen.fill((0, 0, 0))
+                    quit_game()
+                triggered |= KEYDOWN_INPUTS.get(event.key, 0)
+        else:
+            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                # 檢查按鈕點擊
+                if restart_button_rect is not None and restart_button_rect.collidepoint(event.pos):
+                    triggered |= INPUT_RESTART
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_r:
+                triggered |= INPUT_RESTART
+
+    held = 0
     keys = pygame.key.get_pressed()
-    
-    if current_game_state == GAME_STATE['RUNNING']:
-        
-        # 1. 玩家移動
-        if keys[pygame.K_UP]:
-            player.move_vertical('up')
-        if keys[pygame.K_DOWN]:
-            player.move_vertical('down')
-            
-        player.move_to_center(center_x)
-        camera_offset = player.rect.centery - screen_height // 2
-        
-        # 2. 飛行物件生成與更新
-        spawn_timer += 1
-        if spawn_timer > SPAWN_INTERVAL:
-            spawn_timer = 0
-            y_pos = random.randint(camera_offset - 20, camera_offset + screen_height + 20 - max(BIRD_SCALE[1], OWL_SCALE[1])) 
-            x_pos = screen_width + random.randint(0, 200) 
-            
-            if random.random() < 0.39:
-                flying_objects.append(
-                    FlyingObject(x_pos, y_pos, BIRD_ANIM, BIRD_SCALE, speed=random.randint(3, 5), obj_type='bird')
-                )
-            else:
-                flying_objects.append(
-                    FlyingObject(x_pos, y_pos, OWL_ANIM, OWL_SCALE, speed=random.randint(4, 7), obj_type='owl')
-                )
-
-        for obj in flying_objects[:]:
-            obj.move()
-            obj.draw(screen, camera_offset) 
-            if obj.rect.right < 0:
-                flying_objects.remove(obj)
-        
-        # 3. 能源更新 (持續回饋)
-        delta_time = clock.get_time() / 1000.0
-        energy += energy_increase_rate * delta_time 
-
-        # 4. 音樂/偵測邏輯
-        if keys[pygame.K_SPACE]:
-            if not player.paused:
-                if player.current_sound:
-                    player.current_sound.stop()
-                player.paused = True
-            player.show_radius = False
-            nearby_objects = []
-            type_counts = {}
-            current_delta_score = 0
-            energy -= 0.11
+    if keys[pygame.K_UP]:
+        held |= INPUT_UP
+    if keys[pygame.K_DOWN]:
+        held |= INPUT_DOWN
+    if keys[pygame.K_SPACE]:
+        held |= INPUT_HOLD
+    return triggered, held
+
+# --- 重播控制：←/→ 跳轉，F 快轉 ---
+def handle_replay_key(key):
+    global replay_fast, current_sound
+    if key == pygame.K_f:
+        replay_fast = not replay_fast
+        return
+    if key == pygame.K_RIGHT:
+        target = sim.tick + REPLAY_SEEK_TICKS
+    elif key == pygame.K_LEFT:
+        target = sim.tick - REPLAY_SEEK_TICKS
+    else:
+        return
+    replay.seek(sim, target)
+    # 跳轉後畫面與聲音都從新的狀態重新開始
+    if audio is not None:
+        note_scheduler.stop_all()
+        reset_harmony()
+    else:
+        pygame.mixer.stop()
+    current_sound = None
+    trail_renderer.invalidate()
+    dirty.invalidate()
+
+def start_recording_or_replay():
+    global recorder, replay
+    with startup_profile.importing('replay'):
+        from replay import InputRecorder, Replay
+    if replay_path:
+        replay = Replay(replay_path)
+        replay.seek(sim, replay.start_tick)
+        print(f"replaying {replay_path}: {len(replay)} ticks ({replay.duration:.1f} s)")
+    elif record_path:
+        recorder = InputRecorder(record_path, sim)
+
+# --- 音訊：消化模擬事件 ---
+def play_tone(freq):
+    global current_sound
+    if current_sound:
+        current_sound.stop()
+    current_sound = tone_cache.get(freq, duration=TONE_DURATION, harmonics=TONE_HARMONICS)
+    current_sound.play(loops=-1)
+    if loop_feeder is not None:
+        loop_feeder.play(current_sound)
+
+def handle_audio(events):
+    global current_sound
+    if audio is not None:
+        handle_stream_audio(events)
+        return
+    note_changed = False
+    for name, value in events:
+        if name == 'note' or name == 'resume':
+            play_tone(value)
+            note_changed = True
+        elif name == 'drum':
+            drum_sound.play()
+        elif name in ('pause', 'win', 'lose'):
+            if current_sound:
+                current_sound.stop()
+        elif name == 'reset':
+            # 停止所有正在播放的聲音，並預熱起始位置附近的音色
+            if current_sound:
+                current_sound.stop()
+            current_sound = None
+            pygame.mixer.stop()
+            prewarm_tones_near(sim.plane.rect.centery)
+            # 結束畫面的時間每局不同，不必保留舊的合成圖
+            end_screen_cache.clear()
+    if not note_changed and sim.state == GAME_STATE['RUNNING'] and not sim.plane.paused:
+        # 音高未變時順便預熱一個鄰近音，分攤合成成本
+        prewarm_tones_near(sim.plane.rect.centery, limit=1)
+
+# --- 串流混音器：主旋律滑音換音、和聲與鼓聲都交給 audio_engine ---
+HARMONY_INTERVAL = 2.0   # 與 main.py 相同：每 2 秒 (模擬時間) 一個和聲音
+HARMONY_DURATION = 2.0
+harmony_rng = random.Random()  # 與模擬的亂數分開，不影響錄影重播
+next_harmony_time = 0.0
+
+def reset_harmony():
+    global next_harmony_time
+    next_harmony_time = sim.time
+
+def handle_stream_audio(events):
+    # 每個模擬步之後呼叫：事件以目前的模擬時間排程，混音器在對應的取樣開始發聲
+    global next_harmony_time
+    now = sim.time
+    for name, value in events:
+        if name == 'note' or name == 'resume':
+            note_scheduler.note_on(now, value)
+        elif name == 'drum':
+            note_scheduler.play(now, 'drum')
+        elif name in ('pause', 'win', 'lose'):
+            note_scheduler.note_off(now)
+        elif name == 'reset':
+            note_scheduler.stop_all()
+            reset_harmony()
+            end_screen_cache.clear()
+    plane = sim.plane
+    if sim.state == GAME_STATE['RUNNING'] and not plane.paused and now >= next_harmony_time:
+        # 飛機在中線上方加三度/五度，下方減三度/五度 (半音數或調內音階級數，見 music.HARMONY_VOICINGS)；
+        # 拍點固定每 HARMONY_INTERVAL 秒，暫停過後從目前的時間重新起算
+        beat = max(next_harmony_time, now - sim.dt)
+        centery = plane.rect.centery
+        pitch = sim.pitch
+        offset = harmony_rng.choice(pitch.harmony_above if centery < screen_height // 2 else pitch.harmony_below)
+        note_scheduler.harmony(beat, midi_to_freq(pitch.harmony_midi_at(centery, offset)), HARMONY_DURATION)
+        next_harmony_time = beat + HARMONY_INTERVAL
+
+# --- 繪圖：讀取模擬狀態 ---
+def blit_hud(slot, surface, dest):
+    # 幾乎每幀都會變的 HUD 文字：貼圖後端畫在 slot 專用的串流貼圖，不進貼圖快取
+    if use_textures:
+        return screen.blit_stream(slot, surface, dest)
+    return screen.blit(surface, dest)
+
+def draw_running():
+    camera_offset = sim.camera_offset
+    plane = sim.plane
+    OBJECT_ANIMS.update(sim.time)
+    dirty.mark_all(sim.objects.draw(screen, camera_offset, OBJECT_ANIMS))
+    profiler.lap('objects_draw')
+    if not plane.paused:
+        if use_textures:
+            # 貼圖後端直接畫線段，不經過軟體畫布
+            points = sim.trail.points()
+            points[:, 1] -= camera_offset
+            dirty.mark(screen.lines(trail_renderer.color, points.tolist(), trail_renderer.width))
         else:
-            if player.paused:
-                player.paused = False
-                if player.current_freq:
-                    # 修正：確保重新播放時使用上次的頻率
-                    sound = generate_sound(player.current_freq, duration=1.0, harmonics=6) 
-                    sound.play(loops=-1)
-                    player.current_sound = sound
-                    
-            player.show_radius = True
-            
-            nearby_objects, type_counts, current_delta_score = player.get_objects_in_radius(flying_objects)
-            energy += current_delta_score
-
-        # 5. 限制能源上下限 
-        energy = max(LOSE_SCORE, min(energy, energy_max))
-        
-        # 6. 檢查勝利/失敗條件 (修正邏輯：狀態應只切換一次)
-        if energy >= WIN_SCORE:
-            if current_game_state == GAME_STATE['RUNNING']:
-                if player.current_sound: player.current_sound.stop()
-                elapsed_time_sec = time.time() - start_game_time 
-                current_game_state = GAME_STATE['WIN']
-        elif energy <= LOSE_SCORE:
-            if current_game_state == GAME_STATE['RUNNING']:
-                if player.current_sound: player.current_sound.stop()
-                current_game_state = GAME_STATE['LOSE']
+            dirty.mark(trail_renderer.draw(screen, sim.trail, camera_offset))
+    profiler.lap('trail_draw')
+    dirty.mark_all(plane_sprite.draw(plane, camera_offset))
+    profiler.lap('plane_draw')
+
+    # 能量條與資訊顯示
+    dirty.mark(screen.fill((50, 50, 50), (0, 0, screen_width, energy_bar_height)))
+    bar_width = int((sim.energy / energy_max) * screen_width)
+    screen.fill((255, 0, 0), (0, 0, bar_width, energy_bar_height))
+
+    # 確保在遊戲進行中 freq 有一個有效值
+    current_freq = plane.current_freq if plane.current_freq else sim.freq
+    text_surface = text_cache.render(font, f"MIDI: {sim.midi_note} | Freq: {current_freq:.1f} Hz | Score: {sim.energy:.1f} / {sim.win_score:.1f}", (255, 255, 255))
+    dirty.mark(blit_hud('status', text_surface, (10, energy_bar_height + 5)))
+
+    detection_text = f"Nearby ({len(sim.nearby_objects)}): "
+    if sim.type_counts:
+        detection_text += ", ".join([f"{t}: {c}" for t, c in sim.type_counts.items()])
+        detection_text += f" | Score Change: {sim.current_delta_score:.2f}"
+    else:
+        detection_text += "None"
         
-        # 7. 音樂和軌跡繪製 (僅在未暫停時)
-        if player.paused == False:
-            # 修正：使用 music_time_start 進行音樂節拍控制
-            if time.time() - music_time_start > 0.1:
-                music_line.append([player.rect.centerx, player.rect.centery])
-                music_time_start = time.time()
-
-                scale_degree = int((screen_height // 2 - player.rect.centery) / 10)
-                offset_in_scale = C_major[scale_degree % len(C_major)] + (scale_degree // len(C_major)) * 12
-                freq = freq_from_semitone(base_freq, offset_in_scale)
-
-                if player.current_freq != freq:
-                    if player.current_sound:
-                        player.current_sound.stop()
-                    sound = generate_sound(freq, duration=1.0, harmonics=6) 
-                    sound.play(loops=-1)
-                    player.current_freq = freq
-                    player.current_sound = sound
-            
-            # 軌跡左移與繪製
-            for point in music_line:
-                point[0] -= 5
-            music_line = [p for p in music_line if p[0] > 0]
-            if len(music_line) > 1:
-                adjusted_points = [(p[0], p[1] - camera_offset) for p in music_line]
-                pygame.draw.lines(screen, (0, 255, 0), False, adjusted_points, 3)
-
-        # 8. 畫飛機和資訊顯示
-        player.draw(camera_offset)
-        player.update_tilt()
-
-        # 9. 能量條與資訊顯示
-        pygame.draw.rect(screen, (50, 50, 50), (0, 0, screen_width, energy_bar_height))
-        bar_width = int((energy / energy_max) * screen_width)
-        pygame.draw.rect(screen, (255, 0, 0), (0, 0, bar_width, energy_bar_height))
-
-        # 確保在遊戲進行中 freq 有一個有效值
-        current_freq = player.current_freq if player.current_freq else freq
-        midi_note = int(round(69 + 12 * np.log2(current_freq / 440.0)))
-        text_surface = font.render(f"MIDI: {midi_note} | Freq: {current_freq:.1f} Hz | Score: {energy:.1f} / {WIN_SCORE:.1f}", True, (255, 255, 255))
-        screen.blit(text_surface, (10, energy_bar_height + 5))
-
-        detection_text = f"Nearby ({len(nearby_objects)}): "
-        if type_counts:
-            detection_text += ", ".join([f"{t}: {c}" for t, c in type_counts.items()])
-            detection_text += f" | Score Change: {current_delta_score:.2f}"
-        else:
-            detection_text += "None"
-            
-        detection_surface = font.render(detection_text, True, (255, 255, 0))
-        screen.blit(detection_surface, (10, energy_bar_height + 30))
-
-    elif current_game_state == GAME_STATE['WIN']:
+    detection_surface = text_cache.render(font, detection_text, (255, 255, 0))
+    dirty.mark(blit_hud('detection', detection_surface, (10, energy_bar_height + 30)))
+    dirty.mark(profiler_overlay.draw(screen))
+    profiler.lap('hud')
+    if show_visualizer and visualizer is not None:
+        dirty.mark(draw_visualizer())
+    profiler.lap('visualizer')
+
+def draw_frame():
+    global drawn_game_state, end_screen_shown, restart_button_rect
+    # 狀態切換時整個畫面重畫，否則只清除上一幀畫過的區域
+    if sim.state != drawn_game_state:
+        dirty.invalidate()
+        end_screen_shown = None
+        drawn_game_state = sim.state
+
+    if sim.state == GAME_STATE['RUNNING']:
+        if parallax is not None:
+            # 背景跟著軌跡的捲動量與鏡頭移動；clear_previous 只重畫移動的層蓋到的橫條
+            parallax.scroll_to(sim.trail.offset, sim.camera_offset)
+        dirty.clear_previous()
+        profiler.lap('background')
+        draw_running()
+    elif sim.state == GAME_STATE['WIN']:
         # 勝利畫面
-        restart_button_rect = draw_end_screen(GAME_STATE['WIN'], elapsed_time_sec)
-
-    elif current_game_state == GAME_STATE['LOSE']:
+        restart_button_rect = draw_end_screen(GAME_STATE['WIN'], sim.elapsed_time_sec)
+    elif sim.state == GAME_STATE['LOSE']:
         # 失敗畫面
         restart_button_rect = draw_end_screen(GAME_STATE['LOSE'])
-
-
-    pygame.display.update()
-    clock.tick(60)
\ No newline at end of file
+    dirty.present()
+    profiler.lap('present')
+
+# --- 啟動：背景執行緒載入資源，主執行緒畫載入畫面 ---
+def load_background():
+    global parallax
+    with startup_profile.importing('background'):
+        from background import load_parallax
+    parallax = load_parallax((screen_width, screen_height))
+
+def load_plane_sprite():
+    global plane_sprite
+    plane_sprite = PlaneSprite(sim.plane.max_tilt)
+
+def asset_tasks():
+    # (顯示名稱, 進度權重, 函數)；權重大約依各項的耗時比例
+    tasks = [
+        ('bird animation', 3, lambda: load_object_animation(TYPE_BIRD, BIRD_PATH, BIRD_SCALE, False, (0, 255, 255, 128))),
+        ('owl animation', 3, lambda: load_object_animation(TYPE_OWL, OWL_PATH, OWL_SCALE, True, (255, 0, 255, 128))),
+        ('plane sprite', 1, load_plane_sprite),
+        ('drum', 2, synthesize_drum),
+    ]
+    if '--no-background' not in sys.argv:
+        tasks.append(('background', 2, load_background))
+    if audio is None:
+        # 只有 pygame.mixer 需要預先合成的音色；串流混音器即時合成
+        tasks.append(('tones', 3, lambda: prewarm_tones_near(sim.plane.rect.centery)))
+    return tasks
+
+def wait_for_assets(loader, loading_screen):
+    while not loader.done:
+        for event in pygame.event.get():
+            if event.type in QUIT_EVENTS:
+                quit_game()
+        loading_screen.draw(loader.progress, loader.current)
+        clock.tick(30)
+    loader.result()
+
+def initialize(background=True, audio_output=None):
+    # background=False 時在目前的執行緒依序載入 (benchmark 等工具用)
+    global profiler_overlay, trail_renderer
+    init_display()
+    if use_textures:
+        # 載入畫面畫在一般 Surface 上，每次更新上傳到同一張串流貼圖
+        loading_surface = pygame.Surface((screen_width, screen_height))
+        loading_screen = LoadingScreen(loading_surface, font, present=lambda: screen.show(loading_surface))
+    else:
+        loading_screen = LoadingScreen(screen, font)
+    loading_screen.draw(0.0)
+    startup_profile.mark('window + loading screen')
+    init_audio(audio_output)
+    init_visualizer()
+    startup_profile.mark('audio init')
+    loader = BackgroundLoader(asset_tasks(), profile=startup_profile)
+    if background:
+        wait_for_assets(loader.start(), loading_screen)
+    else:
+        loader.run()
+        loader.result()
+    startup_profile.mark('assets loaded')
+    if parallax is not None:
+        dirty.background = parallax
+    if use_textures:
+        preload_textures()
+    profiler_overlay = ProfilerOverlay(profiler, font, (screen_width - 10, energy_bar_height + 5))
+    trail_renderer = TrailRenderer((screen_width, screen_height))
+
+# --- 主遊戲迴圈：固定步長推進模擬，每幀畫一次 ---
+def main():
+    initialize()
+    start_recording_or_replay()
+    handle_audio(sim.drain_events())
+    accumulator = 0.0
+    triggered = 0
+    first_frame = True
+    while True:
+        profiler.begin_frame()
+        # 這一幀沒有跑到模擬步時，單次觸發的輸入留給下一個模擬步
+        frame_triggered, held = poll_inputs()
+        triggered |= frame_triggered
+        profiler.lap('input')
+        accumulator += clock.get_time() / 1000.0
+        # 不足一步時這一幀不推進模擬 (高更新率螢幕上模擬仍以實際時間前進)
+        steps = min(int(accumulator / sim.dt), MAX_STEPS_PER_FRAME)
+        accumulator -= steps * sim.dt
+        if replay is not None and replay_fast:
+            steps = REPLAY_FAST_STEPS
+        for _ in range(steps):
+            if replay is not None:
+                # 重播：輸入來自錄影檔，播完後停在最後一個畫面
+                inputs = replay.next_input(sim)
+                if inputs is None:
+                    break
+            else:
+                # 單次觸發的輸入只送給第一個模擬步
+                inputs = held | triggered
+                triggered = 0
+            sim.step(inputs)
+            if recorder is not None:
+                recorder.record(inputs)
+            if audio is not None:
+                # 串流混音器：每一步的事件帶著各自的模擬時間排程，不受這一幀補跑幾步影響
+                handle_stream_audio(sim.drain_events())
+        handle_audio(sim.drain_events())
+        profiler.lap('audio')
+        draw_frame()
+        profiler.end_frame()
+        if first_frame:
+            first_frame = False
+            startup_profile.mark('first game frame')
+            if startup_profile.enabled:
+                startup_profile.report()
+        clock.tick(60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,351 @@
+import math
+import random
+
+import numpy as np
+
+from entities import EntityStore, TYPE_BIRD, TYPE_OWL
+from music import PitchMap, A4_MIDI
+from trail import MusicTrail
+
+
+"""
+無畫面、無音訊的遊戲模擬核心。
+reset_game() 原本放在全域變數中的狀態都集中在 GameSimulation，
+以固定時間步長 step(inputs, dt) 推進；亂數使用可指定種子的 random.Random。
+畫面與音訊只讀取模擬狀態，並透過 drain_events() 取得這一段時間內發生的事件。
+這個模組 (與它用到的 entities、music、trail) 不 import pygame：飛機位置用 PlaneRect，
+balance.py、offline.py、fluid_backend.py 等無畫面的工具不必載入 pygame。
+"""
+
+# --- 遊戲狀態 ---
+GAME_STATE = {
+    'RUNNING': 1,
+    'WIN': 2,
+    'LOSE': 3
+}
+
+# --- 遊戲常數 ---
+OWL_SCORE = -0.4
+BIRD_SCORE = 0.25
+WIN_SCORE = 500.0
+LOSE_SCORE = 0.0
+SPAWN_INTERVAL = 40
+DETECTION_RADIUS = 85
+REPEL_RADIUS = 95
+REPEL_FORCE = 35    # 擊退的強度（越大推得越遠）
+energy_max = 500.0
+semitone_jump = 5
+energy_cost = 5.8
+energy_increase_rate = 2.6
+space_energy_cost = 0.11
+music_mode_energy_bonus = 350
+
+screen_height = 600
+screen_width = 1100
+center_x = screen_width // 2
+PLANE_SIZE = (100, 100)
+BIRD_SCALE = (100, 100)
+OWL_SCALE = (100, 100)
+BIRD_RATIO = 0.39
+BIRD_SPEED_RANGE = (3, 5)
+OWL_SPEED_RANGE = (4, 7)
+TRAIL_SCROLL = 5
+OBJECT_POOL_CAPACITY = 64  # 一般遊戲同時約十來個物件；壓力測試可用 objects.reserve() 加大
+ANIM_PHASE_STEP = 0.6180339887  # 黃金比例：連續生成的物件動畫相位錯開，且不消耗亂數
+
+TICK_DT = 1.0 / 60.0     # 固定時間步長 (與原本 clock.tick(60) 相同)
+NOTE_INTERVAL = 0.1      # 主旋律每 0.1 秒取樣一次
+MUSIC_CLOCK_EPSILON = 1e-9  # 累加 dt 的浮點誤差，避免剛好一拍時晚一個 tick
+
+TYPE_SCORES = [0.0, 0.0]
+TYPE_SCORES[TYPE_BIRD] = BIRD_SCORE
+TYPE_SCORES[TYPE_OWL] = OWL_SCORE
+
+# --- 輸入位元 (每個 tick 一個整數) ---
+INPUT_UP = 1 << 0          # 持續按住 ↑
+INPUT_DOWN = 1 << 1        # 持續按住 ↓
+INPUT_HOLD = 1 << 2        # 持續按住 SPACE (暫停音樂與偵測)
+INPUT_JUMP_UP = 1 << 3     # 按下 W
+INPUT_JUMP_DOWN = 1 << 4   # 按下 S
+INPUT_DRUM = 1 << 5        # 按下 D
+INPUT_MUSIC_MODE = 1 << 6  # 按下 P
+INPUT_RESTART = 1 << 7     # 結束畫面按 R 或點擊按鈕
+HELD_INPUTS = INPUT_UP | INPUT_DOWN | INPUT_HOLD
+
+
+# --- 飛機 (只有物理狀態，圖片由繪圖端處理) ---
+class PlaneRect:
+    # pygame.Rect 中模擬用到的部分 (整數座標，center 的算法相同)
+    __slots__ = ('x', 'y', 'w', 'h')
+
+    def __init__(self, x, y, w, h):
+        self.x, self.y, self.w, self.h = x, y, w, h
+
+    @property
+    def centerx(self):
+        return self.x + self.w // 2
+
+    @property
+    def centery(self):
+        return self.y + self.h // 2
+
+    @property
+    def center(self):
+        return (self.centerx, self.centery)
+
+    @center.setter
+    def center(self, center):
+        self.x = center[0] - self.w // 2
+        self.y = center[1] - self.h // 2
+
+    def __iter__(self):
+        return iter((self.x, self.y, self.w, self.h))
+
+
+class Plane:
+    def __init__(self, x, y):
+        self.rect = PlaneRect(0, 0, PLANE_SIZE[0], PLANE_SIZE[1])
+        self.rect.center = (x, y)
+        self.speed = 3
+        self.current_freq = None
+        self.tilt_angle = 0
+        self.paused = False
+        self.max_tilt = 20
+        self.detection_radius = DETECTION_RADIUS
+        self.show_radius = True
+
+    def move_vertical(self, direction):
+        if direction == 'up':
+            self.rect.y -= self.speed
+            self.tilt_angle = min(self.tilt_angle + 2, self.max_tilt)
+        if direction == 'down':
+            self.rect.y += self.speed
+            self.tilt_angle = max(self.tilt_angle - 2, -self.max_tilt)
+
+    def update_tilt(self):
+        if self.tilt_angle > 0:
+            self.tilt_angle = max(0, self.tilt_angle - 1)
+        elif self.tilt_angle < 0:
+            self.tilt_angle = min(0, self.tilt_angle + 1)
+
+    def move_to_center(self, center_x):
+        if self.rect.centerx < center_x:
+            self.rect.x += self.speed
+
+    def get_objects_in_radius(self, objects_store):
+        nearby_idx = objects_store.query_radius(self.rect.center, self.detection_radius)
+        nearby_objects = [objects_store.view(i) for i in nearby_idx.tolist()]
+        type_counts = objects_store.type_counts(nearby_idx)
+        delta_score = objects_store.score_delta(nearby_idx, TYPE_SCORES)
+        return nearby_objects, type_counts, delta_score
+
+
+class GameSimulation:
+    def __init__(self, seed=None, dt=TICK_DT):
+        self.dt = dt
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.objects = EntityStore(capacity=OBJECT_POOL_CAPACITY, cell_size=DETECTION_RADIUS)
+        self.trail = MusicTrail(scroll_per_frame=TRAIL_SCROLL)
+        self.music_mode = False
+        self.win_score = WIN_SCORE
+        self.events = []
+        self.tick = 0
+        self.pitch = PitchMap(center_y=screen_height // 2)  # 高度 -> 音符查表 (music.py)，set_scale() 可換調
+        self.profiler = None  # 可指定 profiler.FrameProfiler，記錄各階段耗時
+        self.reset()
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.seed = seed
+            self.rng.seed(seed)
+        self.state = GAME_STATE['RUNNING']
+        self.time = 0.0               # 本局經過的模擬時間 (秒)
+        self.music_clock = 0.0        # 主旋律節拍計時
+        self.elapsed_time_sec = 0.0   # 勝利時的通關時間
+        self.plane = Plane(100, screen_height // 2)
+        self.camera_offset = 0
+        self.objects.clear()
+        self.spawn_timer = 0
+        self.spawn_count = 0
+        self.trail.clear()
+        self.energy = 200.0
+        self.freq = 442
+        self.midi_note = A4_MIDI
+        self.current_delta_score = 0
+        self.nearby_objects = []
+        self.type_counts = {}
+        self.events.append(('reset', None))
+
+    def drain_events(self):
+        events = self.events
+        self.events = []
+        return events
+
+    # --- 快照 (錄影關鍵幀用)：回傳 (可轉成 JSON 的純量, NumPy 陣列)，restore 後接著 step 的結果完全相同 ---
+    PLANE_FIELDS = ('speed', 'current_freq', 'tilt_angle', 'paused', 'max_tilt', 'detection_radius', 'show_radius')
+    SCALAR_FIELDS = (
+        'seed', 'tick', 'music_mode', 'win_score', 'state', 'time', 'music_clock', 'elapsed_time_sec',
+        'camera_offset', 'spawn_timer', 'spawn_count', 'energy', 'freq', 'midi_note', 'current_delta_score', 'type_counts',
+    )
+
+    def snapshot(self):
+        plane = self.plane
+        version, internal, gauss_next = self.rng.getstate()
+        trail_meta, trail_arrays = self.trail.snapshot()
+        meta = {name: getattr(self, name) for name in self.SCALAR_FIELDS}
+        meta['plane'] = {name: getattr(plane, name) for name in self.PLANE_FIELDS}
+        meta['plane']['rect'] = list(plane.rect)
+        meta['rng'] = {'version': version, 'gauss_next': gauss_next}
+        meta['events'] = [list(event) for event in self.events]
+        meta['nearby'] = [obj.index for obj in self.nearby_objects]
+        meta['trail'] = trail_meta
+        meta['pitch'] = self.pitch.describe()
+        arrays = {'rng_state': np.asarray(internal, dtype=np.uint32)}
+        arrays.update({f'objects_{name}': arr for name, arr in self.objects.snapshot().items()})
+        arrays.update({f'trail_{name}': arr for name, arr in trail_arrays.items()})
+        return meta, arrays
+
+    def restore(self, meta, arrays):
+        for name in self.SCALAR_FIELDS:
+            setattr(self, name, meta[name])
+        self.pitch.set_scale(**meta['pitch'])
+        plane = Plane(0, 0)
+        for name in self.PLANE_FIELDS:
+            setattr(plane, name, meta['plane'][name])
+        plane.rect = PlaneRect(*meta['plane']['rect'])
+        self.plane = plane
+        rng = meta['rng']
+        self.rng.setstate((rng['version'], tuple(int(v) for v in arrays['rng_state']), rng['gauss_next']))
+        self.events = [tuple(event) for event in meta['events']]
+        self.objects.restore({name: arrays[f'objects_{name}'] for name in EntityStore.FIELDS})
+        self.trail.restore(meta['trail'], {'x': arrays['trail_x'], 'y': arrays['trail_y']})
+        self.nearby_objects = [self.objects.view(i) for i in meta['nearby']]
+
+    # --- 固定步長推進 ---
+    def step(self, inputs=0, dt=None):
+        dt = self.dt if dt is None else dt
+        self.tick += 1
+        if self.music_mode:
+            self.win_score = math.inf
+            self.energy += music_mode_energy_bonus
+
+        if self.state != GAME_STATE['RUNNING']:
+            if inputs & INPUT_RESTART:
+                self.reset()
+            return
+
+        prof = self.profiler
+        self._apply_actions(inputs)
+        self._move_plane(inputs)
+        if prof is not None:
+            prof.lap('movement')
+        self._update_objects()
+        if prof is not None:
+            prof.lap('spawn_update')
+        self.energy += energy_increase_rate * dt
+        if prof is not None:
+            prof.lap('energy')
+        self._update_detection(inputs)
+        if prof is not None:
+            prof.lap('music_detection')
+        self.energy = max(LOSE_SCORE, min(self.energy, energy_max))
+        self._check_end()
+        if prof is not None:
+            prof.lap('win_lose')
+        if self.state != GAME_STATE['RUNNING']:
+            return
+        if not self.plane.paused:
+            self._update_music(dt)
+            if prof is not None:
+                prof.lap('music_update')
+            self.trail.advance()
+            if prof is not None:
+                prof.lap('trail')
+        self.plane.update_tilt()
+        self.time += dt
+
+    def _apply_actions(self, inputs):
+        plane = self.plane
+        # ... 快速跳躍邏輯 ...
+        if inputs & INPUT_JUMP_UP and self.energy >= energy_cost:
+            plane.rect.y -= semitone_jump * 10
+            plane.tilt_angle = plane.max_tilt
+            self.energy -= energy_cost
+        if inputs & INPUT_JUMP_DOWN and self.energy >= energy_cost:
+            plane.rect.y += semitone_jump * 10
+            plane.tilt_angle = -plane.max_tilt
+            self.energy -= energy_cost
+        if inputs & INPUT_DRUM:
+            self.events.append(('drum', None))
+            # 沿「玩家→物件」方向整批推開半徑內的物件
+            self.objects.repel(plane.rect.center, REPEL_RADIUS, REPEL_FORCE)
+        if inputs & INPUT_MUSIC_MODE:
+            self.music_mode = True
+
+    def _move_plane(self, inputs):
+        plane = self.plane
+        if inputs & INPUT_UP:
+            plane.move_vertical('up')
+        if inputs & INPUT_DOWN:
+            plane.move_vertical('down')
+        plane.move_to_center(center_x)
+        self.camera_offset = plane.rect.centery - screen_height // 2
+
+    def _update_objects(self):
+        self.spawn_timer += 1
+        if self.spawn_timer > SPAWN_INTERVAL:
+            self.spawn_timer = 0
+            rng = self.rng
+            y_pos = rng.randint(self.camera_offset - 20, self.camera_offset + screen_height + 20 - max(BIRD_SCALE[1], OWL_SCALE[1]))
+            x_pos = screen_width + rng.randint(0, 200)
+            phase = (self.spawn_count * ANIM_PHASE_STEP) % 1.0
+            self.spawn_count += 1
+            if rng.random() < BIRD_RATIO:
+                self.objects.spawn(x_pos, y_pos, BIRD_SCALE, speed=rng.randint(*BIRD_SPEED_RANGE), obj_type='bird', phase=phase)
+            else:
+                self.objects.spawn(x_pos, y_pos, OWL_SCALE, speed=rng.randint(*OWL_SPEED_RANGE), obj_type='owl', phase=phase)
+        self.objects.move()
+        self.objects.remove_offscreen()
+
+    def _update_detection(self, inputs):
+        plane = self.plane
+        if inputs & INPUT_HOLD:
+            if not plane.paused:
+                plane.paused = True
+                self.events.append(('pause', None))
+            plane.show_radius = False
+            self.nearby_objects = []
+            self.type_counts = {}
+            self.current_delta_score = 0
+            self.energy -= space_energy_cost
+        else:
+            if plane.paused:
+                plane.paused = False
+                if plane.current_freq:
+                    self.events.append(('resume', plane.current_freq))
+            plane.show_radius = True
+            self.nearby_objects, self.type_counts, self.current_delta_score = plane.get_objects_in_radius(self.objects)
+            self.energy += self.current_delta_score
+
+    def _check_end(self):
+        if self.energy >= self.win_score:
+            self.elapsed_time_sec = self.time
+            self.state = GAME_STATE['WIN']
+            self.events.append(('win', self.elapsed_time_sec))
+        elif self.energy <= LOSE_SCORE:
+            self.state = GAME_STATE['LOSE']
+            self.events.append(('lose', None))
+
+    def _update_music(self, dt):
+        # 超過的部分留到下一拍，節拍間隔平均就是 NOTE_INTERVAL (不會因為 dt 不整除而變慢)
+        self.music_clock += dt
+        if self.music_clock < NOTE_INTERVAL - MUSIC_CLOCK_EPSILON:
+            return
+        self.music_clock -= NOTE_INTERVAL
+        plane = self.plane
+        self.trail.append(plane.rect.centerx, plane.rect.centery)
+        self.midi_note, self.freq = self.pitch.note_at(plane.rect.centery)
+        if plane.current_freq != self.freq:
+            plane.current_freq = self.freq
+            self.events.append(('note', self.freq))
@@ -0,0 +1,161 @@
+import math
+
+import numpy as np
+
+
+"""
+均勻網格空間雜湊：格子大小與偵測半徑相同，範圍查詢只需檢查鄰近的格子。
+網格只記錄「索引 → 所在格子」，座標由呼叫端 (例如 EntityStore) 提供：
+查詢時傳入 centers_of(indices) -> (xs, ys)，只對候選索引計算精確距離。
+物件每幀左移時只有跨格的索引需要搬動。
+"""
+
+
+class SpatialHashGrid:
+    def __init__(self, cell_size, capacity=256):
+        self.cell_size = cell_size
+        self._cells = {}  # (cell_x, cell_y) -> set(索引)
+        self._cell_x = np.zeros(capacity, dtype=np.int64)
+        self._cell_y = np.zeros(capacity, dtype=np.int64)
+        self.count = 0
+
+    def _ensure_capacity(self, size):
+        if size <= len(self._cell_x):
+            return
+        capacity = max(size, len(self._cell_x) * 2)
+        for name in ('_cell_x', '_cell_y'):
+            new = np.zeros(capacity, dtype=np.int64)
+            new[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, new)
+
+    def cell_of(self, x, y):
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def clear(self):
+        self._cells.clear()
+        self.count = 0
+
+    # --- 增量維護 ---
+    def insert(self, index, x, y):
+        # 索引必須連續新增 (index == count)，與 EntityStore 的配置方式一致
+        self._ensure_capacity(index + 1)
+        key = self.cell_of(x, y)
+        self._cell_x[index], self._cell_y[index] = key
+        self._cells.setdefault(key, set()).add(index)
+        self.count = max(self.count, index + 1)
+
+    def _discard(self, index, key):
+        bucket = self._cells.get(key)
+        if bucket is not None:
+            bucket.discard(index)
+            if not bucket:
+                del self._cells[key]
+
+    def swap_remove(self, index):
+        # 配合 swap-and-pop：移除 index，並把最後一個索引改名為 index
+        last = self.count - 1
+        self._discard(index, (int(self._cell_x[index]), int(self._cell_y[index])))
+        if index != last:
+            key = (int(self._cell_x[last]), int(self._cell_y[last]))
+            bucket = self._cells[key]
+            bucket.discard(last)
+            bucket.add(index)
+            self._cell_x[index] = self._cell_x[last]
+            self._cell_y[index] = self._cell_y[last]
+        self.count = last
+
+    def update(self, xs, ys, indices=None):
+        # xs, ys 為所有 (或 indices 指定的) 物件目前的中心座標；只搬動跨格的索引
+        if indices is None:
+            indices = np.arange(self.count)
+            new_x = xs[:self.count] // self.cell_size
+            new_y = ys[:self.count] // self.cell_size
+        else:
+            new_x = xs // self.cell_size
+            new_y = ys // self.cell_size
+        old_x = self._cell_x[indices]
+        old_y = self._cell_y[indices]
+        changed = np.flatnonzero((new_x != old_x) | (new_y != old_y))
+        if len(changed) == 0:
+            return 0
+        cells = self._cells
+        for j, ox, oy, nx, ny in zip(indices[changed].tolist(), old_x[changed].tolist(), old_y[changed].tolist(),
+                                     new_x[changed].tolist(), new_y[changed].tolist()):
+            self._discard(j, (ox, oy))
+            cells.setdefault((nx, ny), set()).add(j)
+        self._cell_x[indices[changed]] = new_x[changed]
+        self._cell_y[indices[changed]] = new_y[changed]
+        return len(changed)
+
+    # --- 查詢 ---
+    def _gather(self, keys):
+        cells = self._cells
+        found = [cells[k] for k in keys if k in cells]
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.fromiter((i for bucket in found for i in bucket), dtype=np.int64)
+
+    def candidates_in_rect(self, left, top, right, bottom):
+        # 回傳與矩形重疊之格子內的所有索引 (尚未做精確判斷)
+        x0, y0 = self.cell_of(left, top)
+        x1, y1 = self.cell_of(right, bottom)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(self._cells):
+            keys = [k for k in self._cells if x0 <= k[0] <= x1 and y0 <= k[1] <= y1]
+        else:
+            keys = [(cx, cy) for cx in range(x0, x1 + 1) for cy in range(y0, y1 + 1)]
+        return self._gather(keys)
+
+    def query_radius(self, center, radius, centers_of):
+        cx, cy = center
+        candidates = self.candidates_in_rect(cx - radius, cy - radius, cx + radius, cy + radius)
+        if len(candidates) == 0:
+            return candidates
+        xs, ys = centers_of(candidates)
+        dx = xs - cx
+        dy = ys - cy
+        return np.sort(candidates[dx * dx + dy * dy <= radius * radius])
+
+    def query_band(self, top, bottom, centers_of):
+        # 垂直帶狀查詢：中心 y 介於 [top, bottom] 的所有物件
+        y0 = int(top // self.cell_size)
+        y1 = int(bottom // self.cell_size)
+        candidates = self._gather([k for k in self._cells if y0 <= k[1] <= y1])
+        if len(candidates) == 0:
+            return candidates
+        _, ys = centers_of(candidates)
+        return np.sort(candidates[(ys >= top) & (ys <= bottom)])
+
+    def nearest(self, center, centers_of, mask=None, max_radius=None):
+        # 由近到遠逐圈擴大搜尋；mask 為布林陣列，可用來只找特定種類 (例如貓頭鷹)
+        if not self._cells:
+            return None
+        cx, cy = center
+        ccx, ccy = self.cell_of(cx, cy)
+        if max_radius is None:
+            xs_cells = [k[0] for k in self._cells]
+            ys_cells = [k[1] for k in self._cells]
+            max_ring = max(abs(ccx - min(xs_cells)), abs(ccx - max(xs_cells)),
+                           abs(ccy - min(ys_cells)), abs(ccy - max(ys_cells)))
+        else:
+            max_ring = int(math.ceil(max_radius / self.cell_size))
+
+        best, best_d2 = None, None
+        for ring in range(max_ring + 1):
+            keys = [(ccx + dx, ccy + dy)
+                    for dx in range(-ring, ring + 1) for dy in range(-ring, ring + 1)
+                    if max(abs(dx), abs(dy)) == ring]
+            candidates = self._gather(keys)
+            if mask is not None and len(candidates):
+                candidates = candidates[mask[candidates]]
+            if len(candidates):
+                xs, ys = centers_of(candidates)
+                d2 = (xs - cx) ** 2 + (ys - cy) ** 2
+                j = int(np.argmin(d2))
+                if best_d2 is None or d2[j] < best_d2:
+                    best, best_d2 = int(candidates[j]), int(d2[j])
+            # 已找到的距離小於下一圈可能的最短距離時即可停止
+            if best_d2 is not None and best_d2 <= (ring * self.cell_size) ** 2:
+                break
+        if best is not None and max_radius is not None and best_d2 > max_radius * max_radius:
+            return None
+        return best
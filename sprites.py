@@ -0,0 +1,32 @@
+import pygame
+
+
+"""
+預先旋轉的精靈快取：飛機傾斜角度永遠是 -max_angle..max_angle 之間的整數，
+建立時一次產生所有角度的圖 (已轉成顯示格式) 以及對應的中心偏移量，
+繪製時只需查表再 blit。smooth=True 時改用 rotozoom，品質較好但只在建立時花時間。
+"""
+
+
+class RotatedSpriteCache:
+    def __init__(self, base_image, max_angle, smooth=False):
+        self.max_angle = max_angle
+        self.smooth = smooth
+        self._frames = []  # index = angle + max_angle -> (surface, (offset_x, offset_y))
+        for angle in range(-max_angle, max_angle + 1):
+            if smooth:
+                image = pygame.transform.rotozoom(base_image, angle, 1.0)
+            else:
+                image = pygame.transform.rotate(base_image, angle)
+            image = image.convert_alpha()
+            # 與 get_rect(center=...) 相同的左上角偏移
+            w, h = image.get_size()
+            self._frames.append((image, (-(w // 2), -(h // 2))))
+
+    def get(self, angle):
+        angle = max(-self.max_angle, min(self.max_angle, int(round(angle))))
+        return self._frames[angle + self.max_angle]
+
+    def blit(self, surface, angle, center):
+        image, (ox, oy) = self.get(angle)
+        return surface.blit(image, (center[0] + ox, center[1] + oy))
@@ -0,0 +1,150 @@
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import pygame
+
+
+"""
+啟動流程工具：
+- StartupProfile 記錄從 simple.py 開始執行到各個里程碑 (import、視窗、第一幀...) 的時間，
+  以及背景工作每一項花的時間，--startup-profile 時印出，用來追蹤各版本的 time-to-first-frame。
+  較重的模組 (音訊、貼圖後端、重播...) 在用到的函數裡才 import，以 importing() 記下第一次 import 的耗時。
+- BackgroundLoader 在背景執行緒依序執行載入工作 (解碼 GIF、預先合成音效...)，
+  主執行緒只讀 progress / current 畫載入畫面，不必等待。
+- LoadingScreen 畫載入進度條。
+"""
+
+
+class StartupProfile:
+    def __init__(self, t0=None, enabled=False):
+        self.t0 = time.perf_counter() if t0 is None else t0
+        self.enabled = enabled
+        self.marks = []   # [(里程碑, 距離開始的秒數)]
+        self.tasks = []   # [(背景工作, 耗時秒數)]
+        self.imports = [] # [(延後 import 的模組, 耗時秒數)]
+        self._lock = threading.Lock()
+
+    def mark(self, label, now=None):
+        now = time.perf_counter() if now is None else now
+        self.marks.append((label, now - self.t0))
+
+    def add_task(self, label, seconds):
+        with self._lock:
+            self.tasks.append((label, seconds))
+
+    @contextmanager
+    def importing(self, label):
+        # 包住函數裡的 import；只記第一次 (之後模組已在 sys.modules，幾乎不花時間)
+        start = time.perf_counter()
+        yield
+        seconds = time.perf_counter() - start
+        with self._lock:
+            if all(name != label for name, _ in self.imports):
+                self.imports.append((label, seconds))
+
+    def elapsed(self, label):
+        for name, at in self.marks:
+            if name == label:
+                return at
+        return None
+
+    def as_dict(self):
+        return {
+            'marks_ms': {label: at * 1000.0 for label, at in self.marks},
+            'tasks_ms': {label: seconds * 1000.0 for label, seconds in self.tasks},
+            'imports_ms': {label: seconds * 1000.0 for label, seconds in self.imports},
+        }
+
+    def report(self, file=None):
+        file = file or sys.stdout
+        print("startup profile (ms since simple.py started):", file=file)
+        previous = 0.0
+        for label, at in self.marks:
+            print(f"  {label:24s} {at * 1000.0:8.1f}  (+{(at - previous) * 1000.0:7.1f})", file=file)
+            previous = at
+        if self.tasks:
+            print("background tasks:", file=file)
+            for label, seconds in self.tasks:
+                print(f"  {label:24s} {seconds * 1000.0:8.1f}", file=file)
+        if self.imports:
+            print("deferred imports:", file=file)
+            for label, seconds in self.imports:
+                print(f"  {label:24s} {seconds * 1000.0:8.1f}", file=file)
+
+
+class BackgroundLoader:
+    def __init__(self, tasks, profile=None):
+        # tasks: [(名稱, 權重, 函數)]，權重只用來估計進度條比例
+        self.tasks = list(tasks)
+        self.profile = profile
+        self.total_weight = sum(weight for _, weight, _ in self.tasks) or 1
+        self.done_weight = 0
+        self.current = None
+        self.error = None
+        self._thread = None
+        self._finished = False
+
+    @property
+    def progress(self):
+        return min(1.0, self.done_weight / self.total_weight)
+
+    @property
+    def done(self):
+        return self._finished
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name='asset-loader', daemon=True)
+        self._thread.start()
+        return self
+
+    def run(self):
+        # 也可以直接在目前的執行緒呼叫 (例如 benchmark 等不需要載入畫面的情況)
+        try:
+            for label, weight, fn in self.tasks:
+                self.current = label
+                start = time.perf_counter()
+                fn()
+                if self.profile is not None:
+                    self.profile.add_task(label, time.perf_counter() - start)
+                self.done_weight += weight
+        except Exception as e:
+            self.error = e
+        finally:
+            self.current = None
+            self._finished = True
+
+    def result(self):
+        # 等待完成；背景工作發生的錯誤在主執行緒重新拋出
+        if self._thread is not None:
+            self._thread.join()
+        if self.error is not None:
+            raise self.error
+
+
+class LoadingScreen:
+    def __init__(self, screen, font, title="Loading...", color=(255, 255, 255), bar_color=(0, 150, 255), background=(0, 0, 0),
+                 present=None):
+        # present：畫完後顯示的方式，預設 pygame.display.flip
+        self.screen = screen
+        self.present = present or pygame.display.flip
+        self.font = font
+        self.title = font.render(title, True, color)
+        self.color = color
+        self.bar_color = bar_color
+        self.background = background
+        width, height = screen.get_size()
+        self.bar_rect = pygame.Rect(width // 4, height // 2, width // 2, 16)
+
+    def draw(self, progress, label=None):
+        screen = self.screen
+        screen.fill(self.background)
+        bar = self.bar_rect
+        screen.blit(self.title, self.title.get_rect(midbottom=(bar.centerx, bar.top - 12)))
+        pygame.draw.rect(screen, self.bar_color, (bar.x, bar.y, int(bar.width * progress), bar.height))
+        pygame.draw.rect(screen, self.color, bar, 1)
+        if label:
+            text = self.font.render(label, True, self.color)
+            screen.blit(text, text.get_rect(midtop=(bar.centerx, bar.bottom + 12)))
+        self.present()
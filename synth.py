@@ -0,0 +1,131 @@
+import math
+
+import numpy as np
+
+
+"""
+波表合成引擎：每個音色、每個八度各一張限頻 (band-limited) 波表，
+播放音符時只需一次向量化的查表，寫入預先配置好的 int16 立體聲緩衝區。
+"""
+
+TABLE_BITS = 12
+TABLE_SIZE = 1 << TABLE_BITS          # 每張波表 4096 個取樣點
+FRAC_BITS = 16                        # 相位累加器的小數位元數 (定點數)
+LOWEST_FREQ = 16.0                    # 第 0 個八度的起點 (約 C0)
+NUM_OCTAVES = 11
+
+
+# --- 音色定義：輸入諧波編號陣列 (1, 2, 3...)，回傳各諧波振幅 ---
+def _additive_partials(n):
+    # 與原本 generate_sound 相同的音色：第 n 諧波振幅為 1/n
+    return 1.0 / n
+
+def _square_partials(n):
+    return np.where(n % 2 == 1, 1.0 / n, 0.0)
+
+def _triangle_partials(n):
+    sign = np.where((n // 2) % 2 == 0, 1.0, -1.0)
+    return np.where(n % 2 == 1, sign / (n * n), 0.0)
+
+TIMBRES = {
+    'additive': _additive_partials,
+    'square': _square_partials,
+    'triangle': _triangle_partials,
+}
+
+def register_timbre(name, partials_fn):
+    TIMBRES[name] = partials_fn
+
+
+class WavetableSynth:
+    def __init__(self, sample_rate=44100, table_bits=TABLE_BITS):
+        self.sample_rate = sample_rate
+        self.table_size = 1 << table_bits
+        self.table_mask = self.table_size - 1
+        self._phase = np.arange(self.table_size) / self.table_size
+        self._tables = {}  # (timbre, harmonics, octave) -> float32 波表
+        self._capacity = 0
+        self._grow(sample_rate)  # 預先配置 1 秒的緩衝區
+
+    def _grow(self, num_samples):
+        self._capacity = num_samples
+        self._ramp = np.arange(num_samples, dtype=np.int64)
+        self._acc = np.empty(num_samples, dtype=np.int64)
+        self._mono = np.empty(num_samples, dtype=np.float32)
+        self._stereo = np.empty((num_samples, 2), dtype=np.int16)
+
+    def octave_of(self, freq):
+        octave = int(math.floor(math.log2(max(freq, LOWEST_FREQ) / LOWEST_FREQ)))
+        return min(octave, NUM_OCTAVES - 1)
+
+    def table(self, timbre='additive', harmonics=7, octave=0):
+        key = (timbre, harmonics, octave)
+        table = self._tables.get(key)
+        if table is None:
+            table = self._build_table(timbre, harmonics, octave)
+            self._tables[key] = table
+        return table
+
+    def _build_table(self, timbre, harmonics, octave):
+        # 以該八度最高頻率計算不超過奈奎斯特頻率的最大諧波數
+        top_freq = LOWEST_FREQ * 2 ** (octave + 1)
+        max_harmonic = max(1, min(harmonics, int((self.sample_rate / 2) // top_freq)))
+        n = np.arange(1, max_harmonic + 1, dtype=np.float64)
+        amps = np.asarray(TIMBRES[timbre](n), dtype=np.float64)
+        waveform = amps @ np.sin(2 * np.pi * np.outer(n, self._phase))
+        max_amp = np.max(np.abs(waveform))
+        if max_amp > 0:
+            waveform /= max_amp
+        return waveform.astype(np.float32)
+
+    def _phase_indices(self, freq, num_samples):
+        # 定點相位累加：index = (i * step) >> FRAC_BITS，再取波表長度的餘數
+        step = int(round(freq * self.table_size * (1 << FRAC_BITS) / self.sample_rate))
+        acc = self._acc[:num_samples]
+        np.multiply(self._ramp[:num_samples], step, out=acc)
+        np.right_shift(acc, FRAC_BITS, out=acc)
+        np.bitwise_and(acc, self.table_mask, out=acc)
+        return acc
+
+    def render(self, freq, duration=1.0, volume=0.2, harmonics=7, timbre='additive'):
+        # 回傳的是內部共用緩衝區的視圖，下次呼叫 render 前有效 (make_sound 會自行複製)
+        num_samples = int(self.sample_rate * duration)
+        if num_samples > self._capacity:
+            self._grow(num_samples)
+
+        table = self.table(timbre, harmonics, self.octave_of(freq))
+        mono = self._mono[:num_samples]
+        stereo = self._stereo[:num_samples]
+        np.take(table, self._phase_indices(freq, num_samples), out=mono)
+        mono *= 32767 * volume
+        np.copyto(stereo[:, 0], mono, casting='unsafe')
+        stereo[:, 1] = stereo[:, 0]
+        return stereo
+
+    def render_drum(self, duration=0.5, freq=100, decay=5.0, noise_level=0.2, rng=None):
+        # 與原本 generate_drum 相同：指數衰減的正弦波加上白噪音
+        rng = rng if rng is not None else np.random.default_rng()
+        num_samples = int(self.sample_rate * duration)
+        if num_samples > self._capacity:
+            self._grow(num_samples)
+
+        t = self._ramp[:num_samples] / self.sample_rate
+        envelope = np.exp(-decay * t)
+        sine = self.table('additive', 1, 0)
+        wave = sine[self._phase_indices(freq, num_samples)] + (rng.random(num_samples) * 2 - 1) * noise_level
+        wave *= envelope
+        stereo = self._stereo[:num_samples]
+        np.copyto(stereo[:, 0], np.clip(wave, -1.0, 1.0) * 32767, casting='unsafe')
+        stereo[:, 1] = stereo[:, 0]
+        return stereo
+
+
+# --- 依取樣率共用的引擎實例 ---
+_engines = {}
+
+def get_synth(sample_rate=44100):
+    engine = _engines.get(sample_rate)
+    if engine is None:
+        engine = WavetableSynth(sample_rate)
+        _engines[sample_rate] = engine
+    return engine
@@ -0,0 +1,43 @@
+import random
+
+import numpy as np
+import pytest
+
+from simulation import HELD_INPUTS, INPUT_JUMP_UP, INPUT_JUMP_DOWN, INPUT_DRUM, INPUT_MUSIC_MODE, INPUT_RESTART
+
+
+"""
+測試共用的工具：可重現的輸入序列，以及比較兩個模擬的完整狀態 (GameSimulation.snapshot)。
+"""
+
+TRIGGERS = (INPUT_JUMP_UP, INPUT_JUMP_DOWN, INPUT_DRUM, INPUT_MUSIC_MODE, INPUT_RESTART)
+
+
+def scripted_inputs(ticks, seed=0):
+    # 按鍵狀態每 30 tick 換一次，偶爾加上單次觸發的按鍵 (包含結束畫面的 RESTART)
+    rng = random.Random(seed)
+    inputs = []
+    held = 0
+    for tick in range(ticks):
+        if tick % 30 == 0:
+            held = rng.getrandbits(3) & HELD_INPUTS
+        triggered = rng.choice(TRIGGERS) if rng.random() < 0.05 else 0
+        inputs.append(held | triggered)
+    return inputs
+
+
+@pytest.fixture
+def inputs():
+    return scripted_inputs(3000)
+
+
+@pytest.fixture
+def assert_same_state():
+    def check(a, b):
+        meta_a, arrays_a = a.snapshot()
+        meta_b, arrays_b = b.snapshot()
+        assert meta_a == meta_b
+        assert arrays_a.keys() == arrays_b.keys()
+        for name in arrays_a:
+            np.testing.assert_array_equal(arrays_a[name], arrays_b[name], err_msg=name)
+    return check
@@ -0,0 +1,81 @@
+import time
+import wave
+
+import numpy as np
+import pytest
+
+import audio_engine
+from audio_engine import AudioEngine, FileSink, NullSink, open_output
+
+BLOCK = 256
+
+
+def wait_for_frames(engine, frames, timeout=5.0):
+    deadline = time.perf_counter() + timeout
+    while engine.frame < frames and time.perf_counter() < deadline:
+        time.sleep(0.001)
+    return engine.frame
+
+
+def test_render_plays_the_scheduled_note():
+    engine = AudioEngine(44100, block_size=BLOCK)
+    assert not engine.render(BLOCK * 4).any()
+    engine.note_on(440.0)
+    out = engine.render(44100 // 10)
+    assert out.shape == (44100 // 10, 2)
+    assert np.abs(out).max() > 0.01
+    assert np.abs(out).max() <= 1.0
+    assert engine.frame == BLOCK * 4 + 44100 // 10
+
+
+def test_null_sink_pulls_blocks_until_closed():
+    engine = AudioEngine(44100, block_size=BLOCK)
+    sink = NullSink(engine, realtime=False).start()
+    try:
+        assert wait_for_frames(engine, BLOCK * 32) >= BLOCK * 32
+    finally:
+        sink.close()
+    frames = engine.frame
+    assert frames % BLOCK == 0
+    assert engine.callbacks == frames // BLOCK
+    time.sleep(0.01)
+    assert engine.frame == frames
+
+
+def test_file_sink_writes_a_wav(tmp_path):
+    path = str(tmp_path / 'out.wav')
+    engine = AudioEngine(44100, block_size=BLOCK)
+    engine.note_on(440.0)
+    sink = FileSink(engine, path, realtime=False).start()
+    try:
+        wait_for_frames(engine, 44100 // 10)
+    finally:
+        sink.close()
+    with wave.open(path, 'rb') as f:
+        assert f.getnchannels() == 2
+        assert f.getsampwidth() == 2
+        assert f.getframerate() == 44100
+        frames = f.getnframes()
+        pcm = np.frombuffer(f.readframes(frames), dtype='<i2')
+    assert frames == engine.frame
+    assert frames >= 44100 // 10 and frames % BLOCK == 0
+    assert np.abs(pcm).max() > 300
+
+
+def test_open_output_picks_the_sink_from_the_target(tmp_path):
+    engine = AudioEngine(44100, block_size=BLOCK)
+    null = open_output(engine, 'null', realtime=False)
+    null.close()
+    assert type(null) is NullSink
+    engine = AudioEngine(44100, block_size=BLOCK)
+    raw = open_output(engine, str(tmp_path / 'out.pcm'), realtime=False)
+    raw.close()
+    assert isinstance(raw, FileSink)
+    assert (tmp_path / 'out.pcm').stat().st_size == engine.frame * 2 * 2
+
+
+@pytest.mark.skipif(audio_engine.stream_available(), reason='sounddevice is installed')
+def test_stream_without_sounddevice_raises():
+    # simple.init_audio 靠這個例外退回 pygame.mixer
+    with pytest.raises(RuntimeError):
+        open_output(AudioEngine(44100, block_size=BLOCK), 'stream')
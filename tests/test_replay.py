@@ -0,0 +1,65 @@
+import pytest
+
+from replay import InputRecorder, Replay
+from simulation import GameSimulation
+
+from conftest import scripted_inputs
+
+SEED = 2024
+TICKS = 1000
+INTERVAL = 100
+
+
+def direct_run(inputs, ticks):
+    sim = GameSimulation(seed=SEED)
+    for value in inputs[:ticks]:
+        sim.step(value)
+    sim.drain_events()
+    return sim
+
+
+@pytest.fixture(scope='module')
+def recording(tmp_path_factory):
+    path = tmp_path_factory.mktemp('replay') / 'session.mprc'
+    inputs = scripted_inputs(TICKS, seed=7)
+    sim = GameSimulation(seed=SEED)
+    recorder = InputRecorder(str(path), sim, keyframe_interval=INTERVAL)
+    for value in inputs:
+        sim.step(value)
+        sim.drain_events()
+        recorder.record(value)
+    recorder.close()
+    return Replay(str(path)), inputs, sim
+
+
+def test_recording_keeps_every_input_and_keyframe(recording):
+    replay, inputs, _ = recording
+    assert replay.inputs.tolist() == inputs
+    assert replay.end_tick == TICKS
+    assert replay.keyframe_ticks == list(range(0, TICKS + 1, INTERVAL))
+
+
+@pytest.mark.parametrize('tick', [0, 1, 50, INTERVAL, 357, TICKS - 1, TICKS])
+def test_seek_matches_a_direct_run(recording, assert_same_state, tick):
+    replay, inputs, _ = recording
+    sim = replay.new_simulation()
+    assert replay.seek(sim, tick) == tick
+    assert_same_state(sim, direct_run(inputs, tick))
+
+
+def test_seek_backwards_and_forwards(recording, assert_same_state):
+    # 先跳到後面再跳回前面 (還原關鍵幀)，以及在同一區段內往前 (直接模擬)
+    replay, inputs, _ = recording
+    sim = replay.new_simulation()
+    for tick in (900, 357, 380, 120, 999):
+        replay.seek(sim, tick)
+        assert_same_state(sim, direct_run(inputs, tick))
+
+
+def test_fast_forward_reaches_the_recorded_end(recording, assert_same_state):
+    replay, _, live = recording
+    sim = replay.new_simulation()
+    assert replay.fast_forward(sim, TICKS * 2) == TICKS
+    assert replay.next_input(sim) is None
+    sim.drain_events()
+    assert_same_state(sim, live)
@@ -0,0 +1,66 @@
+import os
+import subprocess
+import sys
+
+from simulation import GameSimulation, GAME_STATE, INPUT_RESTART
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(seed, inputs):
+    sim = GameSimulation(seed=seed)
+    events = []
+    for value in inputs:
+        sim.step(value)
+        events.extend(sim.drain_events())
+    return sim, events
+
+
+def test_same_seed_and_inputs_give_the_same_game(inputs, assert_same_state):
+    a, events_a = run(1234, inputs)
+    b, events_b = run(1234, inputs)
+    assert a.tick == len(inputs)
+    assert events_a == events_b
+    assert_same_state(a, b)
+
+
+def test_different_seeds_diverge(inputs):
+    a, _ = run(1, inputs)
+    b, _ = run(2, inputs)
+    assert a.snapshot()[0] != b.snapshot()[0]
+
+
+def test_fixed_step_is_independent_of_frame_grouping(inputs, assert_same_state):
+    # 一幀跑幾個模擬步 (0..5，見 simple.MAX_STEPS_PER_FRAME) 不影響結果
+    a, _ = run(99, inputs)
+    b = GameSimulation(seed=99)
+    i = 0
+    for frame in range(len(inputs)):
+        for _ in range(frame % 6):
+            if i == len(inputs):
+                break
+            b.step(inputs[i])
+            i += 1
+    while i < len(inputs):
+        b.step(inputs[i])
+        i += 1
+    b.drain_events()
+    assert_same_state(a, b)
+
+
+def test_game_reaches_an_end_state_and_restarts():
+    sim = GameSimulation(seed=3)
+    for _ in range(20000):
+        sim.step(0)
+        if sim.state != GAME_STATE['RUNNING']:
+            break
+    assert sim.state in (GAME_STATE['WIN'], GAME_STATE['LOSE'])
+    sim.step(INPUT_RESTART)
+    assert sim.state == GAME_STATE['RUNNING']
+    assert ('reset', None) in sim.drain_events()
+
+
+def test_simulation_does_not_import_pygame():
+    # 無畫面的工具 (balance.py、offline.py、replay.py) 透過 simulation 不應載入 pygame
+    code = "import sys, simulation, replay, balance, offline; sys.exit('pygame' in sys.modules)"
+    assert subprocess.run([sys.executable, '-c', code], cwd=ROOT).returncode == 0
@@ -0,0 +1,235 @@
+import math
+from collections import OrderedDict
+
+import pygame
+
+try:
+    from pygame._sdl2.video import Window, Renderer, Texture
+except ImportError:  # 舊版 pygame 沒有 _sdl2.video
+    Window = Renderer = Texture = None
+
+
+"""
+以 pygame._sdl2.video 的 Renderer/Texture 繪圖的另一個後端 (simple.py --renderer texture|software)。
+TextureScreen 提供 Surface 介面中遊戲用到的那一小部分 (blit、blits、fill、set_clip...)，
+所以 EntityStore.draw、ParallaxBackground、HUD 文字、結束畫面、DirtyRectRenderer 都不必改；
+畫的目標是一張常駐的 render target 貼圖 (canvas)，上一幀的內容會保留，dirty rect 的做法照舊。
+- 每個 Surface 第一次被畫時上傳成 Texture，之後重複使用 (以 Surface 物件為鍵，LRU 淘汰)；
+  精靈與動畫幀載入後就先上傳；內容只改了一部分的 Surface (視差背景的合成圖) 以 refresh() 只更新那一段。
+- 幾乎每幀都換新 Surface 的 HUD 文字不進快取 (否則每幀上傳新貼圖，還會擠掉精靈)：
+  blit_stream() 每個欄位 (key) 一張重複使用的串流貼圖，只更新用到的左上角。
+- 飛機的傾斜在貼上時旋轉 (Texture.draw 的 angle)，不再需要預先旋轉的 Surface；
+  Surface 的 alpha 與 colorkey 也在上傳時變成貼圖的 alpha，貼上時混色。
+- 軌跡直接以 draw_line 畫線段，不再維護一張軟體畫布。
+- accelerated=False (--renderer software) 使用 SDL 的軟體 renderer，沒有 GPU 的機器也能測試。
+"""
+
+MAX_TEXTURES = 1024
+STREAM_MASKS = (0xff0000, 0xff00, 0xff, 0xff000000)  # 串流貼圖的 ARGB8888，Surface 格式不同時先轉換
+BLENDMODE_BLEND = 1  # SDL_BLENDMODE_BLEND
+
+
+def texture_available():
+    return Renderer is not None
+
+
+class TextureScreen:
+    def __init__(self, size, title="pygame", accelerated=True, max_textures=MAX_TEXTURES):
+        # 建立視窗與 renderer；失敗時拋出 pygame.error，呼叫端退回 Surface 繪圖
+        if Renderer is None:
+            raise pygame.error("pygame._sdl2.video is not available")
+        self.size = tuple(size)
+        self.window = Window(title, size=self.size)
+        try:
+            self.renderer = Renderer(self.window, accelerated=1 if accelerated else 0)
+            self.canvas = Texture(self.renderer, self.size, target=True)
+        except RuntimeError as e:  # pygame._sdl2 的錯誤是 RuntimeError，不是 pygame.error
+            self.window.destroy()
+            raise pygame.error(str(e))
+        self.renderer.target = self.canvas
+        self.max_textures = max_textures
+        self._textures = OrderedDict()   # Surface -> Texture
+        self._circles = {}
+        self._streaming = None           # show() 用的貼圖
+        self._streams = {}               # blit_stream() 的 key -> 串流貼圖
+        self._stream_format = pygame.Surface((1, 1), pygame.SRCALPHA, 32)
+        self._clip = pygame.Rect((0, 0), self.size)
+        self.uploads = 0
+        self.evictions = 0
+        self.stream_updates = 0
+        self.fill((0, 0, 0))
+
+    # --- 貼圖快取 ---
+    def texture(self, surface):
+        texture = self._textures.get(surface)
+        if texture is not None:
+            self._textures.move_to_end(surface)
+            return texture
+        texture = Texture.from_surface(self.renderer, surface)
+        self.uploads += 1
+        self._textures[surface] = texture
+        if len(self._textures) > self.max_textures:
+            self._textures.popitem(last=False)
+            self.evictions += 1
+        return texture
+
+    def preload(self, surfaces):
+        for surface in surfaces:
+            self.texture(surface)
+
+    def forget(self, surface):
+        # Surface 的內容改了時呼叫，下次畫時重新上傳
+        self._textures.pop(surface, None)
+
+    def refresh(self, surface, rect):
+        # Surface 只有 rect 內改了時呼叫：已上傳的貼圖只更新這一段 (還沒上傳的等第一次畫時整張上傳)
+        texture = self._textures.get(surface)
+        if texture is not None:
+            rect = surface.get_rect().clip(rect)
+            texture.update(surface.subsurface(rect), rect)
+
+    # --- Surface 介面 ---
+    def get_size(self):
+        return self.size
+
+    def get_width(self):
+        return self.size[0]
+
+    def get_height(self):
+        return self.size[1]
+
+    def get_rect(self, **kwargs):
+        rect = pygame.Rect((0, 0), self.size)
+        for name, value in kwargs.items():
+            setattr(rect, name, value)
+        return rect
+
+    def get_clip(self):
+        return self._clip.copy()
+
+    def set_clip(self, rect=None):
+        screen = pygame.Rect((0, 0), self.size)
+        self._clip = screen if rect is None else screen.clip(rect)
+
+    def _placed(self, surface, dest, area):
+        # 裁切後的 (來源矩形, 畫面矩形)；完全在 clip 外時來源矩形為 None
+        x, y = dest[0], dest[1]
+        src = pygame.Rect(area) if area is not None else surface.get_rect()
+        drawn = pygame.Rect(x, y, src.w, src.h).clip(self._clip)
+        if drawn.w <= 0 or drawn.h <= 0:
+            return None, pygame.Rect(x, y, 0, 0)
+        return pygame.Rect(src.x + drawn.x - x, src.y + drawn.y - y, drawn.w, drawn.h), drawn
+
+    def blit(self, surface, dest, area=None, special_flags=0):
+        # 與 Surface.blit 相同：回傳裁切後實際畫到的矩形
+        src, drawn = self._placed(surface, dest, area)
+        if src is not None:
+            self.texture(surface).draw(srcrect=src, dstrect=drawn)
+        return drawn
+
+    def blits(self, blit_sequence, doreturn=1):
+        blit = self.blit
+        rects = [blit(*item) for item in blit_sequence]
+        return rects if doreturn else None
+
+    def fill(self, color, rect=None, special_flags=0):
+        # 與 Surface.fill 相同，直接取代 (不混色)
+        drawn = self._clip.copy() if rect is None else pygame.Rect(rect).clip(self._clip)
+        if drawn.w > 0 and drawn.h > 0:
+            renderer = self.renderer
+            renderer.draw_color = pygame.Color(color)
+            renderer.fill_rect(drawn)
+        return drawn
+
+    # --- 只有貼圖後端才有的畫法 ---
+    def blit_stream(self, key, surface, dest):
+        # 與 blit 相同，但 surface 上傳到 key 專用的串流貼圖 (不夠大時才重建)，不進貼圖快取
+        src, drawn = self._placed(surface, dest, None)
+        if src is None:
+            return drawn
+        w, h = surface.get_size()
+        texture = self._streams.get(key)
+        if texture is None or texture.width < w or texture.height < h:
+            if texture is not None:
+                w, h = max(w, texture.width), max(h, texture.height)
+            texture = Texture(self.renderer, (w, h), streaming=True)
+            texture.blend_mode = BLENDMODE_BLEND
+            self._streams[key] = texture
+        if surface.get_bitsize() != 32 or surface.get_masks() != STREAM_MASKS:
+            surface = surface.convert_alpha(self._stream_format)
+        texture.update(surface, surface.get_rect())
+        self.stream_updates += 1
+        texture.draw(srcrect=src, dstrect=drawn)
+        return drawn
+
+    def blit_rotated(self, surface, center, angle):
+        # angle 與 pygame.transform.rotate 相同 (逆時針為正)；回傳旋轉後的外框
+        w, h = surface.get_size()
+        dest = pygame.Rect(0, 0, w, h)
+        dest.center = center
+        self.texture(surface).draw(dstrect=dest, angle=-angle)
+        rad = math.radians(angle)
+        c, s = abs(math.cos(rad)), abs(math.sin(rad))
+        bounds = pygame.Rect(0, 0, int(w * c + h * s) + 1, int(w * s + h * c) + 1)
+        bounds.center = center
+        return bounds.clip(self._clip)
+
+    def circle(self, color, center, radius, width=0):
+        # 圓只畫一次到 Surface 再上傳，之後每幀只貼圖
+        key = (tuple(color), radius, width)
+        surface = self._circles.get(key)
+        if surface is None:
+            surface = pygame.Surface((2 * radius + 1, 2 * radius + 1), pygame.SRCALPHA)
+            pygame.draw.circle(surface, color, (radius, radius), radius, width)
+            self._circles[key] = surface
+        return self.blit(surface, (center[0] - radius, center[1] - radius))
+
+    def lines(self, color, points, width=1):
+        # 與 pygame.draw.lines(closed=False) 相近：寬度以平行的 1 像素線段組成 (較平的線上下錯開，較陡的左右錯開)
+        if len(points) < 2:
+            return None
+        renderer = self.renderer
+        renderer.draw_color = pygame.Color(color)
+        offsets = range(-((width - 1) // 2), width // 2 + 1)
+        draw_line = renderer.draw_line
+        x0, y0 = points[0]
+        for x1, y1 in points[1:]:
+            if abs(x1 - x0) >= abs(y1 - y0):
+                for d in offsets:
+                    draw_line((x0, y0 + d), (x1, y1 + d))
+            else:
+                for d in offsets:
+                    draw_line((x0 + d, y0), (x1 + d, y1))
+            x0, y0 = x1, y1
+        xs = [p[0] for p in points]
+        ys = [p[1] for p in points]
+        pad = width // 2 + 1
+        return pygame.Rect(min(xs) - pad, min(ys) - pad, max(xs) - min(xs) + 2 * pad, max(ys) - min(ys) + 2 * pad).clip(self._clip)
+
+    # --- 顯示 ---
+    def update(self, rects=None):
+        # DirtyRectRenderer 的 update：把整張 canvas 貼到視窗 (對 GPU 來說整張貼與部分貼差不多)
+        renderer = self.renderer
+        renderer.target = None
+        self.canvas.draw()
+        renderer.present()
+        renderer.target = self.canvas
+
+    def show(self, surface):
+        # 直接顯示一張 Surface (載入畫面用)；同一張串流貼圖重複更新，不每次建立新的
+        if self._streaming is None or self._streaming.width != surface.get_width() or self._streaming.height != surface.get_height():
+            self._streaming = Texture(self.renderer, surface.get_size(), streaming=True)
+        self._streaming.update(surface)
+        renderer = self.renderer
+        renderer.target = None
+        self._streaming.draw()
+        renderer.present()
+        renderer.target = self.canvas
+
+    def to_surface(self):
+        # 目前 canvas 的內容 (測試與截圖用)
+        return self.renderer.to_surface()
+
+    def stats(self):
+        return {'textures': len(self._textures), 'uploads': self.uploads, 'evictions': self.evictions,
+                'streams': len(self._streams), 'stream_updates': self.stream_updates}
@@ -0,0 +1,100 @@
+from collections import OrderedDict
+
+import pygame
+
+
+"""
+音色快取：以 (freq, duration, harmonics, volume) 為鍵，保存已合成好的 pygame.Sound，
+避免每次換音高都重新合成。超過記憶體上限時依 LRU 淘汰最久未使用的音色。
+"""
+
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024  # 約 16MB，足夠容納數十個 1 秒的立體聲音色
+
+
+def _sound_nbytes(sound):
+    # 依混音器格式估算 Sound 佔用的位元組數 (避免 get_raw() 複製整個緩衝區)
+    mixer_init = pygame.mixer.get_init()
+    if mixer_init is None:
+        return 0
+    frequency, size, channels = mixer_init
+    return int(round(sound.get_length() * frequency)) * channels * (abs(size) // 8)
+
+
+class ToneCache:
+    def __init__(self, factory, max_bytes=DEFAULT_MAX_BYTES, freq_digits=3):
+        self.factory = factory  # 例如 generate_sound(freq, duration=..., volume=..., harmonics=...)
+        self.max_bytes = max_bytes
+        self.freq_digits = freq_digits  # 頻率取到小數點後幾位作為鍵，吸收浮點誤差
+        self._entries = OrderedDict()   # key -> (sound, nbytes)
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _key(self, freq, duration, harmonics, volume):
+        return (round(float(freq), self.freq_digits), float(duration), int(harmonics), float(volume))
+
+    def get(self, freq, duration=1.0, harmonics=7, volume=0.2):
+        key = self._key(freq, duration, harmonics, volume)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+        self.misses += 1
+        return self._insert(key, freq, duration, harmonics, volume)
+
+    def _insert(self, key, freq, duration, harmonics, volume):
+        sound = self.factory(freq, duration=duration, volume=volume, harmonics=harmonics)
+        nbytes = _sound_nbytes(sound)
+        self._entries[key] = (sound, nbytes)
+        self.current_bytes += nbytes
+        self._evict()
+        return sound
+
+    def _evict(self):
+        # 至少保留最新的一筆，即使它本身就超過上限
+        while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+            _, (_, nbytes) = self._entries.popitem(last=False)
+            self.current_bytes -= nbytes
+            self.evictions += 1
+
+    def prewarm(self, freqs, duration=1.0, harmonics=7, volume=0.2, limit=None):
+        # 預先合成尚未快取的音色；limit 限制本次最多合成幾個，方便在遊戲迴圈中分批預熱
+        built = 0
+        for freq in freqs:
+            if limit is not None and built >= limit:
+                break
+            key = self._key(freq, duration, harmonics, volume)
+            if key in self._entries:
+                continue
+            self._insert(key, freq, duration, harmonics, volume)
+            built += 1
+        return built
+
+    def clear(self):
+        # 統計也一起歸零，之後的 stats() 只反映 clear 之後的使用情況
+        self._entries.clear()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, key):
+        return self._key(*key) in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
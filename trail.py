@@ -0,0 +1,87 @@
+import numpy as np
+
+
+"""
+音樂軌跡：固定容量的環形 NumPy 緩衝區。
+每幀的左移不再逐點相減，而是記錄「加入時的 x + 已捲動量」，目前 x 由全域捲動量推算。
+這個模組只有資料，不 import pygame (無畫面的模擬也用它)；畫軌跡的 TrailRenderer 在 render.py。
+"""
+
+
+class MusicTrail:
+    def __init__(self, capacity=256, scroll_per_frame=5):
+        self.capacity = capacity
+        self.scroll_per_frame = scroll_per_frame
+        self._x = np.zeros(capacity, dtype=np.int64)  # 加入時的 x + 當時的累計捲動量
+        self._y = np.zeros(capacity, dtype=np.int64)
+        self.clear()
+
+    def clear(self):
+        self.start = 0          # 最舊一點在環形緩衝區中的位置
+        self.count = 0
+        self.frame = 0          # 已捲動的幀數
+        self.total_appended = 0  # 累計加入的點數 (單調遞增，供繪製端判斷新點)
+        self.last_expired_y = None  # 最近一個移除的點，畫布上連到它的線段還會停留幾幀
+
+    def __len__(self):
+        return self.count
+
+    # --- 快照 (錄影關鍵幀用)：點依舊到新存放，還原後從緩衝區開頭排起 ---
+    def snapshot(self):
+        idx = (self.start + np.arange(self.count)) % self.capacity
+        meta = {'frame': self.frame, 'total_appended': self.total_appended, 'last_expired_y': self.last_expired_y}
+        return meta, {'x': self._x[idx].copy(), 'y': self._y[idx].copy()}
+
+    def restore(self, meta, arrays):
+        n = len(arrays['x'])
+        self.start = 0
+        self.count = n
+        self._x[:n] = arrays['x']
+        self._y[:n] = arrays['y']
+        self.frame = meta['frame']
+        self.total_appended = meta['total_appended']
+        self.last_expired_y = meta['last_expired_y']
+
+    @property
+    def offset(self):
+        return self.frame * self.scroll_per_frame
+
+    def append(self, x, y):
+        if self.count == self.capacity:
+            # 已滿時覆寫最舊的點
+            self.start = (self.start + 1) % self.capacity
+            self.count -= 1
+        i = (self.start + self.count) % self.capacity
+        self._x[i] = x + self.offset
+        self._y[i] = y
+        self.count += 1
+        self.total_appended += 1
+
+    def advance(self, frames=1):
+        # 等同於原本每點 point[0] -= 5，並移除 x <= 0 的點 (舊的點一定在前面)
+        self.frame += frames
+        offset = self.offset
+        while self.count and self._x[self.start] - offset <= 0:
+            self.last_expired_y = int(self._y[self.start])
+            self.start = (self.start + 1) % self.capacity
+            self.count -= 1
+
+    def y_range(self):
+        # 所有點 (含剛移除、線段仍在畫面上的點) 的世界 y 範圍
+        if self.count == 0:
+            return None
+        idx = (self.start + np.arange(self.count)) % self.capacity
+        ys = self._y[idx]
+        lo, hi = int(ys.min()), int(ys.max())
+        if self.last_expired_y is not None:
+            lo, hi = min(lo, self.last_expired_y), max(hi, self.last_expired_y)
+        return lo, hi
+
+    def points(self, last=None):
+        # 回傳 (k, 2) 的目前螢幕 x 與世界 y，由舊到新；last 只取最新的幾個點
+        k = self.count if last is None else min(last, self.count)
+        idx = (self.start + self.count - k + np.arange(k)) % self.capacity
+        pts = np.empty((k, 2), dtype=np.int64)
+        pts[:, 0] = self._x[idx] - self.offset
+        pts[:, 1] = self._y[idx]
+        return pts
@@ -0,0 +1,230 @@
+import time
+
+import numpy as np
+import pygame
+
+
+"""
+遊戲中的頻譜圖 (spectrogram) 條：顯示「實際正在播放的聲音」，而不只是 HUD 上的 MIDI/頻率文字。
+- SampleTap：混音輸出的環形緩衝區。串流混音器 (audio_engine.AudioEngine.tap) 每個區塊寫入一次；
+  只有音訊執行緒寫入，寫完資料後才增加 written，主執行緒讀取時不需要鎖。
+- LoopFeeder：pygame.mixer 模式拿不到混音結果，改依實際經過時間把目前循環播放的音色緩衝區寫進 tap
+  (只有主旋律，鼓聲不計)。
+- Spectrogram：每 hop 個取樣取最近 fft_size 個取樣、乘上 Hann 窗做 numpy.fft.rfft，
+  功率依對數頻率分成 height 個頻帶，轉成 dB 後寫成 8-bit 調色盤圖的一行。
+  圖是環狀的 (每個 hop 寫一行，畫的時候分兩段 blit，與 background.ParallaxLayer 相同)，
+  所有暫存陣列與 Surface 都預先配置；有新的行時以 surfarray.blit_array 整張複製 (256x64 位元組)，
+  再轉到一張顯示格式的 Surface (8-bit 圖直接半透明 blit 慢將近十倍)，所以要在視窗開好後才建立。
+  畫面卡頓或暫停後落後太多時直接跳到最新，每幀最多算 MAX_HOPS_PER_FRAME 次 FFT。
+"""
+
+FFT_SIZE = 2048
+HOP_SIZE = 512                # 44.1kHz 時約 86 行/秒
+RING_SIZE = 1 << 15           # tap 約保留 0.74 秒
+STRIP_SIZE = (256, 64)        # 寬 = 保留幾個 hop (約 3 秒)，高 = 頻帶數
+FREQ_RANGE = (40.0, 16000.0)   # 涵蓋遊戲的音域 (飛機在最上方時是 MIDI 127，約 12.5kHz)
+DB_RANGE = (-80.0, -10.0)     # 0 dB = 滿刻度的正弦波
+MAX_HOPS_PER_FRAME = 8
+STRIP_ALPHA = 220
+
+# 調色盤：由暗到亮的幾個錨點之間線性內插
+PALETTE_STOPS = (
+    (0.0, (8, 8, 24)),
+    (0.35, (70, 20, 110)),
+    (0.6, (190, 50, 90)),
+    (0.8, (250, 140, 40)),
+    (1.0, (255, 250, 190)),
+)
+
+
+def make_palette(stops=PALETTE_STOPS):
+    position = np.linspace(0.0, 1.0, 256)
+    xs = [x for x, _ in stops]
+    channels = [np.interp(position, xs, [color[c] for _, color in stops]) for c in range(3)]
+    return [tuple(int(round(channel[i])) for channel in channels) for i in range(256)]
+
+
+class SampleTap:
+    def __init__(self, capacity=RING_SIZE):
+        self.capacity = capacity
+        self.buffer = np.zeros(capacity, dtype=np.float32)
+        self.written = 0   # 累計寫入的取樣數 (與 AudioEngine.frame 同步)
+
+    def write(self, block):
+        # 音訊執行緒呼叫；block 為單聲道
+        capacity = self.capacity
+        n = len(block)
+        if n > capacity:
+            self.written += n - capacity
+            block = block[n - capacity:]
+            n = capacity
+        start = self.written % capacity
+        first = min(n, capacity - start)
+        self.buffer[start:start + first] = block[:first]
+        if first < n:
+            self.buffer[:n - first] = block[first:]
+        self.written += n
+
+    def read(self, end, out):
+        # 把取樣 [end - len(out), end) 複製到 out；還沒寫到或已經 (可能正在) 被覆寫時回傳 False
+        n = len(out)
+        capacity = self.capacity
+        if end > self.written or end - n < self.written - capacity // 2:
+            return False
+        start = (end - n) % capacity
+        first = min(n, capacity - start)
+        out[:first] = self.buffer[start:start + first]
+        if first < n:
+            out[first:] = self.buffer[:n - first]
+        return True
+
+
+class LoopFeeder:
+    def __init__(self, tap, sample_rate, chunk=1024, clock=time.perf_counter):
+        self.tap = tap
+        self.sample_rate = sample_rate
+        self.clock = clock
+        self.sound = None
+        self._loop = None    # 目前音色的 int16 緩衝區 (第一聲道的 view，不複製)
+        self._pos = 0
+        self._gain = 0.0
+        self._chunk = np.zeros(chunk, dtype=np.float32)
+        self._start = clock()
+        self._fed = 0        # 從 _start 起已寫入的取樣數
+
+    def play(self, sound):
+        # 與 sound.play(loops=-1) 同時呼叫
+        samples = pygame.sndarray.samples(sound)
+        self.sound = sound
+        self._loop = samples[:, 0] if samples.ndim > 1 else samples
+        self._pos = 0
+        self._gain = sound.get_volume() / 32768.0
+
+    def advance(self):
+        # 每幀呼叫：把上次到現在應該播出的取樣寫進 tap
+        due = int((self.clock() - self._start) * self.sample_rate) - self._fed
+        self._fed += due
+        due = min(due, self.tap.capacity // 4)  # 很久沒呼叫時只補最近的一段
+        chunk = self._chunk
+        playing = self.sound is not None and self.sound.get_num_channels() > 0
+        while due > 0:
+            n = min(due, len(chunk))
+            if playing:
+                loop = self._loop
+                n = min(n, len(loop) - self._pos)
+                np.multiply(loop[self._pos:self._pos + n], self._gain, out=chunk[:n])
+                self._pos = (self._pos + n) % len(loop)
+            else:
+                chunk[:n] = 0.0
+            self.tap.write(chunk[:n])
+            due -= n
+
+
+class Spectrogram:
+    def __init__(self, tap, sample_rate, size=STRIP_SIZE, fft_size=FFT_SIZE, hop=HOP_SIZE,
+                 freq_range=FREQ_RANGE, db_range=DB_RANGE, alpha=STRIP_ALPHA):
+        self.tap = tap
+        self.size = size
+        self.fft_size = fft_size
+        self.hop = hop
+        width, height = size
+        bins = fft_size // 2 + 1
+        window = np.hanning(fft_size)
+        self._window = window
+        # 功率正規化：滿刻度的正弦波約為 0 dB
+        self._scale = (2.0 / window.sum()) ** 2
+        self._db_low = db_range[0]
+        self._db_gain = 255.0 / (db_range[1] - db_range[0])
+        # 對數頻率的頻帶邊界 (以 FFT bin 為單位)，由高到低排列，對應圖的第 0 列 (最上面) 到最後一列
+        edges = np.geomspace(freq_range[0], freq_range[1], height + 1) * fft_size / sample_rate
+        low = np.clip(np.floor(edges[:-1]).astype(np.int64), 0, bins - 1)
+        high = np.clip(np.maximum(np.ceil(edges[1:]).astype(np.int64), low + 1), 1, bins)
+        self._low = low[::-1].copy()
+        self._high = high[::-1].copy()
+        self._count = (self._high - self._low).astype(np.float64)
+        # 暫存陣列：每次分析只有 rfft 本身會配置輸出
+        self._frame = np.zeros(fft_size, dtype=np.float32)
+        self._windowed = np.empty(fft_size, dtype=np.float64)
+        self._magnitude = np.empty(bins, dtype=np.float64)
+        self._cumulative = np.zeros(bins + 1, dtype=np.float64)
+        self._band = np.empty(height, dtype=np.float64)
+        self._band_low = np.empty(height, dtype=np.float64)
+        self.image = np.zeros(size, dtype=np.uint8)   # surfarray 的 (x, y) 排列
+        self._indexed = pygame.Surface(size, 0, 8)
+        self._indexed.set_palette(make_palette())
+        self.surface = pygame.Surface(size).convert()  # 實際畫到畫面上的那一張
+        self.surface.set_alpha(alpha)
+        self._refresh()
+        self.column = 0      # 下一行要寫在 image 的哪一行
+        self.next_end = None # 下一個 hop 的結束取樣
+        self.hops = 0
+        self.skipped = 0
+
+    def reset(self):
+        self.image.fill(0)
+        self._refresh()
+        self.next_end = None
+
+    def _refresh(self):
+        pygame.surfarray.blit_array(self._indexed, self.image)
+        self.surface.blit(self._indexed, (0, 0))
+
+    def _analyze(self, column):
+        np.multiply(self._frame, self._window, out=self._windowed)
+        np.abs(np.fft.rfft(self._windowed), out=self._magnitude)
+        power = self._magnitude
+        np.square(power, out=power)
+        np.cumsum(power, out=self._cumulative[1:])
+        band = self._band
+        # 頻帶平均功率 = (累積和[high] - 累積和[low]) / bin 數
+        np.take(self._cumulative, self._high, out=band)
+        np.take(self._cumulative, self._low, out=self._band_low)
+        band -= self._band_low
+        band /= self._count
+        band *= self._scale
+        band += 1e-12
+        np.log10(band, out=band)
+        band *= 10.0
+        band -= self._db_low
+        band *= self._db_gain
+        np.clip(band, 0.0, 255.0, out=band)
+        np.copyto(column, band, casting='unsafe')
+
+    def update(self):
+        # 每幀呼叫：處理 tap 中新增的完整 hop；回傳新增的行數 (0 表示圖沒有變)
+        written = self.tap.written
+        hop = self.hop
+        if self.next_end is None:
+            self.next_end = written - written % hop + hop
+        behind = (written - self.next_end) // hop + 1
+        if behind > MAX_HOPS_PER_FRAME:
+            self.skipped += behind - MAX_HOPS_PER_FRAME
+            self.next_end += (behind - MAX_HOPS_PER_FRAME) * hop
+        width = self.size[0]
+        added = 0
+        while self.next_end <= written:
+            column = self.image[self.column]
+            if self.tap.read(self.next_end, self._frame):
+                self._analyze(column)
+            else:
+                column.fill(0)
+            self.column = (self.column + 1) % width
+            self.next_end += hop
+            added += 1
+        if added:
+            self.hops += added
+            self._refresh()
+        return added
+
+    def draw(self, screen, topleft):
+        # 最舊的一行在左邊：先畫 column 之後的部分，再畫繞回的前段；回傳畫到的矩形
+        x, y = topleft
+        width, height = self.size
+        first = width - self.column
+        rect = screen.blit(self.surface, (x, y), (self.column, 0, first, height))
+        if self.column:
+            rect = rect.union(screen.blit(self.surface, (x + first, y), (0, 0, self.column, height)))
+        return rect
+
+    def stats(self):
+        return {'hops': self.hops, 'skipped': self.skipped}